@@ -1,59 +1,209 @@
+import asyncio
 import json
-from typing import Any, Dict, Optional
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Type, TypeVar
 
 from agent.config import Settings
+from agent.ai.memo import ResponseMemo, canonical_hash
 from agent.ai.parser import (
     ArbAnalysis,
-        RiskAssessment,
-            ExecutionDecision,
-                parse_arb_analysis,
-                    parse_risk_assessment,
-                        parse_execution_decision,
-                        )
-                        from agent.utils.logger import get_logger
-
-                        log = get_logger(__name__)
-
-                        class AIClient:
-                            def __init__(self, settings: Settings):
-                                    self.settings = settings
-
-                                        def _load_prompt(self, name: str) -> str:
-                                                path = f"agent/ai/prompts/{name}.txt"
-                                                        with open(path, "r", encoding="utf-8") as f:
-                                                                    return f.read()
-
-                                                                        # The following methods are intentionally stubbed for provider-agnostic development.
-                                                                            # Replace with real API calls to OpenAI/Anthropic/local LLM.
-                                                                                def _call_ai(self, system_prompt: str, user_input: str) -> str:
-                                                                                        provider = self.settings.AI_PROVIDER.lower()
-                                                                                                log.debug("ai.call", provider=provider)
-
-                                                                                                        # STUB: Echo back a minimal expected JSON by prompt type
-                                                                                                                if "Arbitrage Analysis" in system_prompt:
-                                                                                                                            return json.dumps({"opportunity_id": "stub-1", "paths": [], "confidence": 0.0})
-                                                                                                                                    if "Risk Assessment" in system_prompt:
-                                                                                                                                                return json.dumps({"opportunity_id": "stub-1", "risk_score": 1.0, "risks": ["stub"], "recommendation": "skip"})
-                                                                                                                                                        if "Execution Decision" in system_prompt:
-                                                                                                                                                                    return json.dumps({"opportunity_id": "stub-1", "execute": False, "reason": "stub", "max_gas_gwei": 0})
-
-                                                                                                                                                                            return "{}"
-
-                                                                                                                                                                                def analyze_arbitrage(self, market_snapshot: Dict[str, Any]) -> ArbAnalysis:
-                                                                                                                                                                                        system = self._load_prompt("arb_analysis")
-                                                                                                                                                                                                user = json.dumps(market_snapshot)
-                                                                                                                                                                                                        raw = self._call_ai(system, user)
-                                                                                                                                                                                                                return parse_arb_analysis(raw)
-
-                                                                                                                                                                                                                    def assess_risk(self, analysis: Dict[str, Any]) -> RiskAssessment:
-                                                                                                                                                                                                                            system = self._load_prompt("risk_assessment")
-                                                                                                                                                                                                                                    user = json.dumps(analysis)
-                                                                                                                                                                                                                                            raw = self._call_ai(system, user)
-                                                                                                                                                                                                                                                    return parse_risk_assessment(raw)
-
-                                                                                                                                                                                                                                                        def decide_execution(self, risk: Dict[str, Any]) -> ExecutionDecision:
-                                                                                                                                                                                                                                                                system = self._load_prompt("execution_decision")
-                                                                                                                                                                                                                                                                        user = json.dumps(risk)
-                                                                                                                                                                                                                                                                                raw = self._call_ai(system, user)
-                                                                                                                                                                                                                                                                                        return parse_execution_decision(raw)
-                                                                                                                                                                                                                                                                                        
\ No newline at end of file
+    RiskAssessment,
+    ExecutionDecision,
+    RiskDecision,
+    parse_batch,
+    parse_arb_analysis,
+    parse_risk_assessment,
+    parse_execution_decision,
+    parse_risk_decision,
+)
+from agent.ai.providers import AIProvider, build_provider
+from agent.ai.streaming import Verdict, consume_stream, decision_verdict, risk_decision_verdict, risk_verdict
+from agent.utils.logger import get_logger
+from agent.utils.tracing import span
+
+log = get_logger(__name__)
+
+PROMPTS_DIR = os.path.join(os.path.dirname(__file__), "prompts")
+PROMPT_NAMES = ("arb_analysis", "risk_assessment", "execution_decision", "risk_decision", "batch")
+
+T = TypeVar("T")
+
+class AIClient:
+    def __init__(self, settings: Settings, provider: Optional[AIProvider] = None):
+        self.settings = settings
+        self.provider = provider or build_provider(settings)
+        # Prompts are read once; the hot path never touches the filesystem
+        self._prompts: Dict[str, str] = {name: self._read_prompt(name) for name in PROMPT_NAMES}
+        # Identical inputs (same snapshot, same block) are answered from memory
+        self.memo = ResponseMemo(maxsize=settings.AI_MEMO_SIZE, ttl=settings.AI_MEMO_TTL_SECONDS)
+        # Prompts whose answer can be decided before the model finishes (streaming mode only)
+        threshold = settings.AI_STREAM_ABORT_RISK_SCORE
+        self._verdicts: Dict[str, Tuple[Verdict, Type[Any]]] = {
+            "execution_decision": (decision_verdict, ExecutionDecision),
+            "risk_assessment": (risk_verdict(threshold), RiskAssessment),
+            "risk_decision": (risk_decision_verdict(threshold), RiskDecision),
+        }
+
+    def _read_prompt(self, name: str) -> str:
+        with open(os.path.join(PROMPTS_DIR, f"{name}.txt"), "r", encoding="utf-8") as f:
+            return f.read()
+
+    def _load_prompt(self, name: str) -> str:
+        if name not in self._prompts:
+            self._prompts[name] = self._read_prompt(name)
+        return self._prompts[name]
+
+    def _memo_key(self, prompt: str, payload: Dict[str, Any]) -> Tuple[str, str, str, str]:
+        return (prompt, self.provider.name, self.provider.model, canonical_hash(payload))
+
+    async def _ask(
+        self,
+        prompt: str,
+        payload: Dict[str, Any],
+        parse: Callable[[str], T],
+        timeout: Optional[float] = None,
+    ) -> T:
+        key = self._memo_key(prompt, payload)
+        cached = self.memo.get(key)
+        if cached is not None:
+            log.debug("ai.memo_hit", prompt=prompt)
+            return cached
+
+        log.debug("ai.call", provider=self.provider.name, prompt=prompt)
+        with span(prompt, kind="ai", provider=self.provider.name):
+            result = await asyncio.wait_for(
+                self._complete(prompt, json.dumps(payload), parse),
+                timeout=timeout if timeout is not None else self.settings.AI_TIMEOUT_SECONDS,
+            )
+        self.memo.put(key, result)
+        return result
+
+    async def _complete(self, prompt: str, user_input: str, parse: Callable[[str], T]) -> T:
+        system_prompt = self._load_prompt(prompt)
+        verdict = self._verdicts.get(prompt)
+        if not self.settings.AI_STREAMING or verdict is None:
+            return parse(await self.provider.complete(system_prompt, user_input))
+
+        check, model = verdict
+        text, early = await consume_stream(self.provider.stream(system_prompt, user_input), check)
+        if early is None:
+            return parse(text)
+        log.debug("ai.stream_abort", prompt=prompt, chars=len(text))
+        return model.model_validate(early)
+
+    async def _ask_batch(
+        self,
+        prompt: str,
+        payloads: List[Dict[str, Any]],
+        model: Type[T],
+        timeout: Optional[float] = None,
+    ) -> List[Optional[T]]:
+        """
+        Answers many inputs with one call per AI_BATCH_SIZE chunk. Results are aligned with
+        `payloads`; an item the model omitted or got wrong, or whose chunk failed, is None.
+        Items share the memo with the single-item calls, and identical inputs are sent once.
+        """
+        keys = [self._memo_key(prompt, p) for p in payloads]
+        results: List[Optional[T]] = [self.memo.get(k) for k in keys]
+
+        # Stable ids: the input hash, so a retried or reordered batch keeps its ids
+        waiting: Dict[str, List[int]] = {}
+        items: List[Dict[str, Any]] = []
+        for i, key in enumerate(keys):
+            if results[i] is not None:
+                continue
+            item_id = key[3][:16]
+            if item_id not in waiting:
+                waiting[item_id] = []
+                items.append({"id": item_id, "input": payloads[i]})
+            waiting[item_id].append(i)
+        if not items:
+            return results
+
+        system_prompt = self._load_prompt("batch") + self._load_prompt(prompt)
+        size = max(1, self.settings.AI_BATCH_SIZE)
+        chunks = [items[i:i + size] for i in range(0, len(items), size)]
+        timeout = timeout if timeout is not None else self.settings.AI_TIMEOUT_SECONDS
+
+        async def ask(chunk: List[Dict[str, Any]]) -> Dict[str, Any]:
+            raw = await self.provider.complete(system_prompt, json.dumps({"items": chunk}))
+            return parse_batch(raw, model)
+
+        log.debug("ai.batch_call", provider=self.provider.name, prompt=prompt, items=len(items), calls=len(chunks))
+        with span(prompt, kind="ai", provider=self.provider.name, items=len(items)):
+            # A chunk that errors, times out or comes back unparseable only loses its own items
+            answers = await asyncio.gather(
+                *(asyncio.wait_for(ask(c), timeout=timeout) for c in chunks), return_exceptions=True
+            )
+
+        parsed: Dict[str, Any] = {}
+        for chunk, answer in zip(chunks, answers):
+            if isinstance(answer, BaseException):
+                log.warning("ai.batch_chunk_failed", prompt=prompt, items=len(chunk), msg=str(answer) or type(answer).__name__)
+                continue
+            parsed.update(answer)
+        missing = 0
+        for item_id, indexes in waiting.items():
+            result = parsed.get(item_id)
+            if result is None or isinstance(result, Exception):
+                missing += 1
+                continue
+            self.memo.put(keys[indexes[0]], result)
+            for i in indexes:
+                results[i] = result
+        if missing:
+            log.warning("ai.batch_partial", prompt=prompt, missing=missing, total=len(items))
+        return results
+
+    async def close(self) -> None:
+        await self.provider.close()
+
+    async def analyze_arbitrage_async(self, market_snapshot: Dict[str, Any], timeout: Optional[float] = None) -> ArbAnalysis:
+        return await self._ask("arb_analysis", market_snapshot, parse_arb_analysis, timeout)
+
+    async def assess_risk_async(self, analysis: Dict[str, Any], timeout: Optional[float] = None) -> RiskAssessment:
+        return await self._ask("risk_assessment", analysis, parse_risk_assessment, timeout)
+
+    async def decide_execution_async(self, risk: Dict[str, Any], timeout: Optional[float] = None) -> ExecutionDecision:
+        return await self._ask("execution_decision", risk, parse_execution_decision, timeout)
+
+    async def assess_and_decide_async(self, analysis: Dict[str, Any], timeout: Optional[float] = None) -> RiskDecision:
+        """Risk assessment and execution decision in one round trip."""
+        return await self._ask("risk_decision", analysis, parse_risk_decision, timeout)
+
+    async def analyze_arbitrage_batch(
+        self, snapshots: List[Dict[str, Any]], timeout: Optional[float] = None
+    ) -> List[Optional[ArbAnalysis]]:
+        return await self._ask_batch("arb_analysis", snapshots, ArbAnalysis, timeout)
+
+    async def assess_risk_batch(
+        self, analyses: List[Dict[str, Any]], timeout: Optional[float] = None
+    ) -> List[Optional[RiskAssessment]]:
+        return await self._ask_batch("risk_assessment", analyses, RiskAssessment, timeout)
+
+    async def decide_execution_batch(
+        self, risks: List[Dict[str, Any]], timeout: Optional[float] = None
+    ) -> List[Optional[ExecutionDecision]]:
+        return await self._ask_batch("execution_decision", risks, ExecutionDecision, timeout)
+
+    async def assess_and_decide_batch(
+        self, analyses: List[Dict[str, Any]], timeout: Optional[float] = None
+    ) -> List[Optional[RiskDecision]]:
+        return await self._ask_batch("risk_decision", analyses, RiskDecision, timeout)
+
+    async def _then_close(self, aw: Awaitable[T]) -> T:
+        try:
+            return await aw
+        finally:
+            # The HTTP session belongs to this call's loop; close it before asyncio.run drops the loop
+            await self.provider.close()
+
+    # Blocking wrappers for scripts and tests; never call these from inside the event loop
+    def analyze_arbitrage(self, market_snapshot: Dict[str, Any]) -> ArbAnalysis:
+        return asyncio.run(self._then_close(self.analyze_arbitrage_async(market_snapshot)))
+
+    def assess_risk(self, analysis: Dict[str, Any]) -> RiskAssessment:
+        return asyncio.run(self._then_close(self.assess_risk_async(analysis)))
+
+    def decide_execution(self, risk: Dict[str, Any]) -> ExecutionDecision:
+        return asyncio.run(self._then_close(self.decide_execution_async(risk)))
@@ -0,0 +1,42 @@
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+
+def canonical_hash(obj: Any) -> str:
+    """sha256 of the canonical JSON form (sorted keys, no whitespace): equal states hash equal."""
+    blob = json.dumps(obj, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+class ResponseMemo:
+    """LRU cache whose entries also expire `ttl` seconds after insertion."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 12.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._data)
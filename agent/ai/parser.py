@@ -1,54 +1,82 @@
 import json
 from pydantic import BaseModel, Field, ValidationError
-from typing import List, Any, Dict
+from typing import List, Any, Dict, Type, TypeVar, Union
+
+M = TypeVar("M", bound=BaseModel)
 
 class ArbPath(BaseModel):
     dex_sequence: List[str] = Field(default_factory=list)
-        assets: List[str] = Field(default_factory=list)
-            amounts: List[str] = Field(default_factory=list)
-                expected_profit_usd: float = 0.0
-
-                class ArbAnalysis(BaseModel):
-                    opportunity_id: str
-                        paths: List[ArbPath] = Field(default_factory=list)
-                            confidence: float = 0.0
-
-                            class RiskAssessment(BaseModel):
-                                opportunity_id: str
-                                    risk_score: float
-                                        risks: List[str] = Field(default_factory=list)
-                                            recommendation: str
-
-                                            class ExecutionDecision(BaseModel):
-                                                opportunity_id: str
-                                                    execute: bool
-                                                        reason: str = ""
-                                                            max_gas_gwei: float | None = None
-
-                                                            def _parse_json(raw: str) -> Dict[str, Any]:
-                                                                try:
-                                                                        return json.loads(raw)
-                                                                            except Exception as e:
-                                                                                    raise ValueError(f"AI returned invalid JSON: {e}")
-
-                                                                                    def parse_arb_analysis(raw: str) -> ArbAnalysis:
-                                                                                        data = _parse_json(raw)
-                                                                                            try:
-                                                                                                    return ArbAnalysis(**data)
-                                                                                                        except ValidationError as e:
-                                                                                                                raise ValueError(f"Invalid ArbAnalysis schema: {e}")
-
-                                                                                                                def parse_risk_assessment(raw: str) -> RiskAssessment:
-                                                                                                                    data = _parse_json(raw)
-                                                                                                                        try:
-                                                                                                                                return RiskAssessment(**data)
-                                                                                                                                    except ValidationError as e:
-                                                                                                                                            raise ValueError(f"Invalid RiskAssessment schema: {e}")
-
-                                                                                                                                            def parse_execution_decision(raw: str) -> ExecutionDecision:
-                                                                                                                                                data = _parse_json(raw)
-                                                                                                                                                    try:
-                                                                                                                                                            return ExecutionDecision(**data)
-                                                                                                                                                                except ValidationError as e:
-                                                                                                                                                                        raise ValueError(f"Invalid ExecutionDecision schema: {e}")
-                                                                                                                                                
\ No newline at end of file
+    assets: List[str] = Field(default_factory=list)
+    amounts: List[str] = Field(default_factory=list)
+    expected_profit_usd: float = 0.0
+
+class ArbAnalysis(BaseModel):
+    opportunity_id: str
+    paths: List[ArbPath] = Field(default_factory=list)
+    confidence: float = 0.0
+
+class RiskAssessment(BaseModel):
+    opportunity_id: str
+    risk_score: float
+    risks: List[str] = Field(default_factory=list)
+    recommendation: str
+
+class ExecutionDecision(BaseModel):
+    opportunity_id: str
+    execute: bool
+    reason: str = ""
+    max_gas_gwei: float | None = None
+
+class RiskDecision(ExecutionDecision):
+    """Risk assessment and execution decision from a single model call."""
+    risk_score: float = 1.0
+    risks: List[str] = Field(default_factory=list)
+    recommendation: str = "review"
+
+def _parse_json(raw: str) -> Dict[str, Any]:
+    try:
+        return json.loads(raw)
+    except Exception as e:
+        raise ValueError(f"AI returned invalid JSON: {e}")
+
+def _validate_json(model: Type[M], raw: Union[str, bytes]) -> M:
+    # One pass from the raw text straight into the model, no intermediate dict
+    try:
+        return model.model_validate_json(raw)
+    except ValidationError as e:
+        if any(err["type"] == "json_invalid" for err in e.errors()):
+            raise ValueError(f"AI returned invalid JSON: {e}")
+        raise ValueError(f"Invalid {model.__name__} schema: {e}")
+
+def parse_arb_analysis(raw: Union[str, bytes]) -> ArbAnalysis:
+    return _validate_json(ArbAnalysis, raw)
+
+def parse_risk_assessment(raw: Union[str, bytes]) -> RiskAssessment:
+    return _validate_json(RiskAssessment, raw)
+
+def parse_execution_decision(raw: Union[str, bytes]) -> ExecutionDecision:
+    return _validate_json(ExecutionDecision, raw)
+
+def parse_risk_decision(raw: Union[str, bytes]) -> RiskDecision:
+    return _validate_json(RiskDecision, raw)
+
+def parse_batch(raw: str, model: Type[M]) -> Dict[str, Union[M, ValueError]]:
+    """
+    Parses a batch response ({"results": [{"id": ..., "result": {...}}, ...]} or the bare
+    array) into {id: model}. Items that fail validation map to a ValueError instead of
+    failing the whole batch; items the model left out are simply absent.
+    """
+    data = _parse_json(raw)
+    if isinstance(data, dict):
+        data = data.get("results")
+    if not isinstance(data, list):
+        raise ValueError("AI batch response is not a list of results")
+    out: Dict[str, Union[M, ValueError]] = {}
+    for item in data:
+        if not isinstance(item, dict) or "id" not in item:
+            continue
+        try:
+            out[str(item["id"])] = model.model_validate(item.get("result") or {})
+        except (ValidationError, TypeError) as e:
+            out[str(item["id"])] = ValueError(f"Invalid {model.__name__} schema: {e}")
+    return out
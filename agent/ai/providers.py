@@ -0,0 +1,224 @@
+import asyncio
+import json
+from typing import Any, AsyncIterator, Dict, Optional
+import aiohttp
+from agent.config import Settings
+from agent.utils.logger import get_logger
+
+log = get_logger(__name__)
+
+class AIProvider:
+    """A chat model reachable over HTTP. complete() returns the model's text output."""
+
+    name = "base"
+    model = ""
+
+    async def complete(self, system_prompt: str, user_input: str) -> str:
+        raise NotImplementedError
+
+    async def stream(self, system_prompt: str, user_input: str) -> AsyncIterator[str]:
+        """Text chunks as the model generates them; closing the iterator abandons the request."""
+        yield await self.complete(system_prompt, user_input)
+
+    async def close(self) -> None:
+        pass
+
+class StubProvider(AIProvider):
+    """Offline stand-in: echoes back a minimal valid JSON by prompt type."""
+
+    name = "stub"
+    model = "stub"
+
+    async def complete(self, system_prompt: str, user_input: str) -> str:
+        if system_prompt.startswith("System: Batch"):
+            task = system_prompt.split("Task:", 1)[-1]
+            items = json.loads(user_input).get("items", [])
+            return json.dumps({"results": [
+                {"id": item["id"], "result": json.loads(await self.complete(task, json.dumps(item["input"])))}
+                for item in items
+            ]})
+        if "Arbitrage Analysis" in system_prompt:
+            return json.dumps({"opportunity_id": "stub-1", "paths": [], "confidence": 0.0})
+        if "Risk and Execution Decision" in system_prompt:
+            return json.dumps({
+                "opportunity_id": "stub-1", "risk_score": 1.0, "risks": ["stub"], "recommendation": "skip",
+                "execute": False, "reason": "stub", "max_gas_gwei": 0,
+            })
+        if "Risk Assessment" in system_prompt:
+            return json.dumps({"opportunity_id": "stub-1", "risk_score": 1.0, "risks": ["stub"], "recommendation": "skip"})
+        if "Execution Decision" in system_prompt:
+            return json.dumps({"opportunity_id": "stub-1", "execute": False, "reason": "stub", "max_gas_gwei": 0})
+        return "{}"
+
+class _PooledHTTPProvider(AIProvider):
+    """Shared keep-alive aiohttp session, recreated if used from a different event loop."""
+
+    def __init__(self, base_url: str, model: str, max_connections: int = 16):
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.max_connections = max_connections
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _headers(self) -> Dict[str, str]:
+        return {}
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            if self._session is not None and not self._session.closed:
+                self._abandon(self._session, self._loop)
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=120),
+                headers={"Content-Type": "application/json", **self._headers()},
+            )
+            self._loop = loop
+        return self._session
+
+    def _abandon(self, session: aiohttp.ClientSession, loop: Optional[asyncio.AbstractEventLoop]) -> None:
+        """Closes a session left on another loop; it can only be closed from the loop that owns it."""
+        if loop is not None and loop.is_running() and not loop.is_closed():
+            asyncio.run_coroutine_threadsafe(session.close(), loop)
+        else:
+            # Its loop is gone: whoever ran it should have awaited close() before it ended
+            log.warning("ai.session_leaked", provider=self.name)
+
+    async def _post_json(self, path: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        async with self._get_session().post(self.base_url + path, json=body) as resp:
+            if resp.status >= 400:
+                text = await resp.text()
+                raise RuntimeError(f"{self.name} HTTP {resp.status}: {text[:300]}")
+            return await resp.json(content_type=None)
+
+    async def _stream_sse(self, path: str, body: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        """Yields the JSON payload of each server-sent `data:` line until [DONE] or EOF."""
+        resp = await self._get_session().post(self.base_url + path, json=body)
+        finished = False
+        try:
+            if resp.status >= 400:
+                text = await resp.text()
+                raise RuntimeError(f"{self.name} HTTP {resp.status}: {text[:300]}")
+            async for line in resp.content:
+                line = line.strip()
+                if not line.startswith(b"data:"):
+                    continue
+                data = line[5:].strip()
+                if data == b"[DONE]":
+                    break
+                yield json.loads(data)
+            finished = True
+        finally:
+            if finished:
+                resp.release()
+            else:
+                # Dropping the connection is what stops the server generating
+                resp.close()
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+class OpenAICompatibleProvider(_PooledHTTPProvider):
+    """POST {base_url}/chat/completions with JSON-object output (OpenAI, vLLM, llama.cpp, ...)."""
+
+    name = "openai"
+
+    def __init__(self, api_key: Optional[str], model: str, base_url: str = "https://api.openai.com/v1", max_connections: int = 16):
+        super().__init__(base_url, model, max_connections)
+        self.api_key = api_key
+
+    def _headers(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+
+    async def complete(self, system_prompt: str, user_input: str) -> str:
+        data = await self._post_json("/chat/completions", {
+            "model": self.model,
+            "temperature": 0,
+            "response_format": {"type": "json_object"},
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_input},
+            ],
+        })
+        return data["choices"][0]["message"]["content"]
+
+    async def stream(self, system_prompt: str, user_input: str) -> AsyncIterator[str]:
+        events = self._stream_sse("/chat/completions", {
+            "model": self.model,
+            "temperature": 0,
+            "stream": True,
+            "response_format": {"type": "json_object"},
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_input},
+            ],
+        })
+        try:
+            async for event in events:
+                for choice in event.get("choices", []):
+                    text = (choice.get("delta") or {}).get("content")
+                    if text:
+                        yield text
+        finally:
+            await events.aclose()
+
+class AnthropicProvider(_PooledHTTPProvider):
+    """POST {base_url}/v1/messages (Anthropic Messages API)."""
+
+    name = "anthropic"
+
+    def __init__(self, api_key: Optional[str], model: str, base_url: str = "https://api.anthropic.com", max_connections: int = 16, max_tokens: int = 1024):
+        super().__init__(base_url, model, max_connections)
+        self.api_key = api_key
+        self.max_tokens = max_tokens
+
+    def _headers(self) -> Dict[str, str]:
+        headers = {"anthropic-version": "2023-06-01"}
+        if self.api_key:
+            headers["x-api-key"] = self.api_key
+        return headers
+
+    async def complete(self, system_prompt: str, user_input: str) -> str:
+        data = await self._post_json("/v1/messages", {
+            "model": self.model,
+            "max_tokens": self.max_tokens,
+            "temperature": 0,
+            "system": system_prompt,
+            "messages": [{"role": "user", "content": user_input}],
+        })
+        return "".join(block.get("text", "") for block in data.get("content", []) if block.get("type") == "text")
+
+    async def stream(self, system_prompt: str, user_input: str) -> AsyncIterator[str]:
+        events = self._stream_sse("/v1/messages", {
+            "model": self.model,
+            "max_tokens": self.max_tokens,
+            "temperature": 0,
+            "stream": True,
+            "system": system_prompt,
+            "messages": [{"role": "user", "content": user_input}],
+        })
+        try:
+            async for event in events:
+                if event.get("type") == "content_block_delta" and event["delta"].get("type") == "text_delta":
+                    yield event["delta"]["text"]
+        finally:
+            await events.aclose()
+
+def build_provider(settings: Settings) -> AIProvider:
+    provider = settings.AI_PROVIDER.lower()
+    configured = bool(settings.AI_API_KEY or settings.AI_BASE_URL)
+    if provider == "openai" and configured:
+        return OpenAICompatibleProvider(
+            settings.AI_API_KEY, settings.OPENAI_MODEL,
+            base_url=settings.AI_BASE_URL or "https://api.openai.com/v1",
+            max_connections=settings.AI_MAX_CONNECTIONS,
+        )
+    if provider == "anthropic" and configured:
+        return AnthropicProvider(
+            settings.AI_API_KEY, settings.ANTHROPIC_MODEL,
+            base_url=settings.AI_BASE_URL or "https://api.anthropic.com",
+            max_connections=settings.AI_MAX_CONNECTIONS,
+        )
+    if provider in ("openai", "anthropic"):
+        log.warning("ai.provider_unconfigured", provider=provider, msg="no AI_API_KEY/AI_BASE_URL; using stub")
+    return StubProvider()
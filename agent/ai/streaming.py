@@ -0,0 +1,81 @@
+import re
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Tuple
+from pydantic_core import from_json
+
+# A number at the very end of the text may still grow digits, a fraction or an exponent
+_TRAILING_NUMBER = re.compile(r"-?[0-9.][0-9.eE+-]*\s*$")
+
+# Given the fields parsed so far, returns the complete result if it is already decided
+Verdict = Callable[[Dict[str, Any]], Optional[Dict[str, Any]]]
+
+def parse_partial(text: str) -> Dict[str, Any]:
+    """
+    Best-effort parse of an incomplete JSON object. Unterminated strings and literals are
+    dropped, and so is a number not yet followed by `,`, `]` or `}`, so every value present
+    is final.
+    """
+    start = text.find("{")
+    if start < 0:
+        return {}
+    body = _TRAILING_NUMBER.sub("", text[start:])
+    try:
+        data = from_json(body, allow_partial=True)
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+def _is_number(v: Any) -> bool:
+    return isinstance(v, (int, float)) and not isinstance(v, bool)
+
+def decision_verdict(partial: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    if partial.get("execute") is not False:
+        return None
+    return {
+        "opportunity_id": partial.get("opportunity_id", ""),
+        "execute": False,
+        "reason": partial.get("reason", "declined (stream aborted)"),
+    }
+
+def risk_verdict(threshold: float) -> Verdict:
+    def verdict(partial: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        score = partial.get("risk_score")
+        # parse_partial only yields terminated numbers, so crossing the threshold is final
+        too_risky = _is_number(score) and score >= threshold
+        if not too_risky and partial.get("recommendation") != "skip":
+            return None
+        return {
+            "opportunity_id": partial.get("opportunity_id", ""),
+            "risk_score": score if _is_number(score) else 1.0,
+            "risks": partial.get("risks", []),
+            "recommendation": "skip",
+        }
+    return verdict
+
+def risk_decision_verdict(threshold: float) -> Verdict:
+    risk = risk_verdict(threshold)
+
+    def verdict(partial: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        declined = decision_verdict(partial)
+        too_risky = risk(partial)
+        if declined is None and too_risky is None:
+            return None
+        return {**(too_risky or {}), **(declined or {}), "execute": False, "recommendation": "skip"}
+    return verdict
+
+async def consume_stream(chunks: AsyncIterator[str], verdict: Verdict) -> Tuple[str, Optional[Dict[str, Any]]]:
+    """
+    Reads text chunks until the stream ends or `verdict` decides. Returns (text, early):
+    `early` is the decided result, in which case the stream is closed without draining it.
+    """
+    text = ""
+    try:
+        async for chunk in chunks:
+            text += chunk
+            early = verdict(parse_partial(text))
+            if early is not None:
+                return text, early
+        return text, None
+    finally:
+        aclose = getattr(chunks, "aclose", None)
+        if aclose is not None:
+            await aclose()
@@ -9,11 +9,37 @@ class Settings(BaseSettings):
     AI_API_KEY: str | None = None
     OPENAI_MODEL: str = "gpt-4o-mini"
     ANTHROPIC_MODEL: str = "claude-3-5-sonnet-20240620"
+    # Override the provider endpoint (e.g. a local OpenAI-compatible server)
+    AI_BASE_URL: str | None = None
+    # Per-call deadline for a model response
+    AI_TIMEOUT_SECONDS: float = 8.0
+    AI_MAX_CONNECTIONS: int = 16
+    # Memoized responses for identical inputs (entries expire after roughly one block)
+    AI_MEMO_SIZE: int = 1024
+    AI_MEMO_TTL_SECONDS: float = 12.0
+    # Stream responses and stop generation once the outcome is known (execute=false, high risk)
+    AI_STREAMING: bool = True
+    AI_STREAM_ABORT_RISK_SCORE: float = 0.8
+    # Inputs packed into one model call by the AIClient *_batch methods (the per-opportunity
+    # pipeline does not call them; they serve callers that hold many inputs at once)
+    AI_BATCH_SIZE: int = 16
 
     # Chain
     CHAIN_ID: int = 1
     RPC_HTTP_URL: str
     RPC_WS_URL: str | None = None
+    # Extra comma-separated HTTP endpoints; with more than one the agent ranks and hedges across them
+    MULTI_RPC_HTTP_URLS: str = ""
+    # A request is duplicated to the next-best endpoint once it exceeds this latency percentile
+    RPC_HEDGE_PERCENTILE: float = 90.0
+    # Coalesce concurrent reads into JSON-RPC batch arrays (falls back if the node rejects them)
+    RPC_BATCHING: bool = True
+    # Extra time to wait for more requests before sending a batch (0 = same event-loop turn)
+    RPC_BATCH_WINDOW_MS: float = 0.0
+    # Append every JSON-RPC answer to this file (.gz to compress), or serve answers from one
+    # recorded earlier with no node at all (see RPCTape)
+    RPC_RECORD_FILE: str | None = None
+    RPC_REPLAY_FILE: str | None = None
 
     # Wallet
     PRIVATE_KEY: str
@@ -27,6 +53,10 @@ class Settings(BaseSettings):
     # Gas
     GAS_PRIORITY_GWEI: float = 2.0
     MAX_FEE_MULTIPLIER: float = 1.2
+    # Use this percentile of recent priority fees instead of GAS_PRIORITY_GWEI (None = fixed tip)
+    GAS_PRIORITY_PERCENTILE: float | None = None
+    # Blocks of priority-fee history kept by the gas oracle
+    GAS_ORACLE_WINDOW_BLOCKS: int = 20
 
     # Trading/backstops
     # Approximate Aave V3 simple flash-loan premium (in basis points)
@@ -35,6 +65,14 @@ class Settings(BaseSettings):
     DEFAULT_SLIPPAGE_BPS: int = 50
     # Default flash-loan amount in wei used when AI doesn't supply one
     DEFAULT_FLASHLOAN_AMOUNT_WEI: int = 10**18
+    # Upper bound on optimizer-sized flash loans in wei (None = limited only by pool depth)
+    MAX_FLASHLOAN_AMOUNT_WEI: int | None = None
+
+    # Local quoting
+    # Uniswap V2-style swap fee (in basis points) applied to cached pair reserves
+    V2_FEE_BPS: int = 30
+    # Verify local V2 quotes against router getAmountsOut (costs one eth_call per hop)
+    V2_QUOTE_CROSS_CHECK: bool = False
 
     # Contracts and addresses
     # AIFlashLoanExecutor deployed address (must be set before executing)
@@ -44,6 +82,53 @@ class Settings(BaseSettings):
     # DEX Routers (mainnet defaults)
     UNISWAP_V2_ROUTER: str = "0x7a250d5630B4cF539739dF2C5dAcb4c659F2488D"
     SUSHISWAP_V2_ROUTER: str = "0xd9e1cE17f2641f24aE83637ab66a2cca9C378B9F"
+    # Multicall3 (same address on all major EVM chains)
+    MULTICALL3_ADDRESS: str = "0xcA11bde05977b3631167028862bE2a173976CA11"
+
+    # Pool state mirror
+    # Comma-separated tokenA:tokenB pairs whose V2 pools are mirrored on both routers
+    WATCH_V2_PAIRS: str = ""
+    # Comma-separated V3 pool addresses mirrored from Swap/Mint/Burn logs
+    WATCH_V3_POOLS: str = ""
+    # eth_getLogs polling interval when no RPC_WS_URL is configured (or WS fails)
+    LOG_POLL_INTERVAL_SECONDS: float = 1.0
+
+    # Pipeline
+    # Opportunities evaluated concurrently, submissions included (nonces are allocated locally)
+    MAX_CONCURRENT_EVALUATIONS: int = 8
+    # Deterministic gates; a candidate reaches the AI stages only if it passes all of them
+    # Simulated net profit (after premium and gas) must exceed this
+    MIN_NET_PROFIT_WEI: int = 0
+    # Each mirrored pair must hold at least this much of the borrowed token (0 = off)
+    MIN_POOL_LIQUIDITY_WEI: int = 0
+    # Comma-separated token addresses a cycle may touch (empty = any)
+    TOKEN_ALLOWLIST: str = ""
+    # Skip when the expected gas price exceeds this (None = no ceiling)
+    MAX_GAS_PRICE_GWEI: float | None = None
+    # Ask the model for paths when the graph search found no supported cycle
+    AI_PATH_DISCOVERY: bool = True
+    # Risk/decision stages: sequential (decision sees risk), concurrent, or combined (one call)
+    AI_DECISION_MODE: str = "sequential"
+
+    # Control
+    # Flag file toggled by the frontend panel; absent means enabled
+    AGENT_ENABLE_FILE: str = "run/agent_enabled.flag"
+
+    # Metrics
+    # Serve Prometheus metrics at http://METRICS_BIND:METRICS_PORT/metrics (None = off)
+    METRICS_PORT: int | None = None
+    METRICS_BIND: str = "127.0.0.1"
+
+    # Tracing
+    # Fraction of opportunities traced span-by-span (0 = off; 0.1 = every 10th)
+    TRACE_SAMPLE_RATE: float = 0.0
+    TRACE_FILE: str = "run/traces.jsonl"
+    TRACE_MAX_BYTES: int = 50 * 2**20
+    TRACE_BACKUPS: int = 3
 
     # Logging
     LOG_LEVEL: str = "INFO"
+    # Keep a fraction of high-frequency events, e.g. "arb.simulation=0.1,ai.analysis=0.1"
+    LOG_SAMPLE: str = ""
+    # Cap events per second, e.g. "arb.gate_rejected=20"
+    LOG_RATE_LIMIT: str = ""
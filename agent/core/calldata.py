@@ -0,0 +1,133 @@
+from functools import lru_cache
+from typing import Dict, Sequence
+from eth_utils import function_signature_to_4byte_selector
+from web3 import Web3
+
+# Hand-laid ABI encoders for the calls on the opportunity -> signed-tx path. Selectors and
+# static layouts are computed once; each call writes words straight into a reusable buffer
+# instead of going through web3 Contract/encode_abi.
+
+_MAX_UINT256 = (1 << 256) - 1
+
+V2_SWAP_EXACT_TOKENS_SELECTOR = function_signature_to_4byte_selector(
+    "swapExactTokensForTokens(uint256,uint256,address[],address,uint256)"
+)
+V3_EXACT_INPUT_SINGLE_SELECTOR = function_signature_to_4byte_selector(
+    "exactInputSingle((address,address,uint24,address,uint256,uint256,uint256,uint160))"
+)
+EXECUTE_FLASH_LOAN_SELECTOR = function_signature_to_4byte_selector("executeFlashLoan(address,uint256,bytes)")
+
+# Byte offsets of the variable uint256 slots (selector included)
+V2_SWAP_AMOUNT_IN_OFFSET = 4
+V2_SWAP_AMOUNT_OUT_MIN_OFFSET = 4 + 32
+V2_SWAP_DEADLINE_OFFSET = 4 + 4 * 32
+V3_EXACT_INPUT_DEADLINE_OFFSET = 4 + 4 * 32
+V3_EXACT_INPUT_AMOUNT_IN_OFFSET = 4 + 5 * 32
+V3_EXACT_INPUT_AMOUNT_OUT_MIN_OFFSET = 4 + 6 * 32
+
+def checked_address(address: str) -> str:
+    """
+    Checksummed form of an address. Mixed-case input must already carry a valid EIP-55
+    checksum (as Contract.encode_abi required); all-lower / all-upper input is converted.
+    """
+    body = address[2:] if address[:2] in ("0x", "0X") else address
+    if body != body.lower() and body != body.upper() and not Web3.is_checksum_address(address):
+        raise ValueError(f"{address} has an invalid EIP-55 checksum")
+    return Web3.to_checksum_address(address)
+
+@lru_cache(maxsize=4096)
+def address_word(address: str) -> bytes:
+    """Checksum-validates an address once and returns it as a left-padded 32-byte word."""
+    return bytes(12) + bytes.fromhex(checked_address(address)[2:])
+
+def write_uint(buf: bytearray, offset: int, value: int) -> None:
+    if not 0 <= value <= _MAX_UINT256:
+        raise ValueError(f"uint256 out of range: {value}")
+    buf[offset:offset + 32] = value.to_bytes(32, "big")
+
+class V2SwapEncoder:
+    """swapExactTokensForTokens calldata for one router; buffers are kept per path length."""
+
+    def __init__(self, router: str):
+        self.router = checked_address(router)
+        self._buffers: Dict[int, bytearray] = {}
+
+    def _buffer(self, hops: int) -> bytearray:
+        buf = self._buffers.get(hops)
+        if buf is None:
+            buf = bytearray(4 + 6 * 32 + 32 * hops)
+            buf[0:4] = V2_SWAP_EXACT_TOKENS_SELECTOR
+            write_uint(buf, 4 + 2 * 32, 5 * 32)  # offset of path
+            write_uint(buf, 4 + 5 * 32, hops)
+            self._buffers[hops] = buf
+        return buf
+
+    def encode(self, amount_in: int, amount_out_min: int, path: Sequence[str], recipient: str, deadline: int) -> bytes:
+        buf = self._buffer(len(path))
+        write_uint(buf, V2_SWAP_AMOUNT_IN_OFFSET, amount_in)
+        write_uint(buf, V2_SWAP_AMOUNT_OUT_MIN_OFFSET, amount_out_min)
+        buf[4 + 3 * 32:4 + 4 * 32] = address_word(recipient)
+        write_uint(buf, V2_SWAP_DEADLINE_OFFSET, deadline)
+        pos = 4 + 6 * 32
+        for token in path:
+            buf[pos:pos + 32] = address_word(token)
+            pos += 32
+        return bytes(buf)
+
+class V3ExactInputSingleEncoder:
+    """SwapRouter.exactInputSingle calldata for one router (static tuple, fixed 260 bytes)."""
+
+    def __init__(self, router: str):
+        self.router = checked_address(router)
+        self._buf = bytearray(4 + 8 * 32)
+        self._buf[0:4] = V3_EXACT_INPUT_SINGLE_SELECTOR
+
+    def encode(
+        self,
+        token_in: str,
+        token_out: str,
+        fee: int,
+        recipient: str,
+        deadline: int,
+        amount_in: int,
+        amount_out_min: int,
+        sqrt_price_limit_x96: int = 0,
+    ) -> bytes:
+        if not 0 <= fee < 1 << 24:
+            raise ValueError(f"uint24 out of range: {fee}")
+        if not 0 <= sqrt_price_limit_x96 < 1 << 160:
+            raise ValueError(f"uint160 out of range: {sqrt_price_limit_x96}")
+        buf = self._buf
+        buf[4:36] = address_word(token_in)
+        buf[36:68] = address_word(token_out)
+        write_uint(buf, 4 + 2 * 32, fee)
+        buf[4 + 3 * 32:4 + 4 * 32] = address_word(recipient)
+        write_uint(buf, V3_EXACT_INPUT_DEADLINE_OFFSET, deadline)
+        write_uint(buf, V3_EXACT_INPUT_AMOUNT_IN_OFFSET, amount_in)
+        write_uint(buf, V3_EXACT_INPUT_AMOUNT_OUT_MIN_OFFSET, amount_out_min)
+        write_uint(buf, 4 + 7 * 32, sqrt_price_limit_x96)
+        return bytes(buf)
+
+class ExecuteFlashLoanEncoder:
+    """AIFlashLoanExecutor.executeFlashLoan(address,uint256,bytes) calldata."""
+
+    def __init__(self, executor: str):
+        self.executor = checked_address(executor)
+        self._head = bytearray(4 + 4 * 32)
+        self._head[0:4] = EXECUTE_FLASH_LOAN_SELECTOR
+        write_uint(self._head, 4 + 2 * 32, 3 * 32)  # offset of params
+
+    def encode(self, asset: str, amount: int, params: bytes) -> bytes:
+        head = self._head
+        head[4:36] = address_word(asset)
+        write_uint(head, 36, amount)
+        write_uint(head, 4 + 3 * 32, len(params))
+        return bytes(head) + bytes(params) + bytes(-len(params) % 32)
+
+@lru_cache(maxsize=64)
+def v2_swap_encoder(router: str) -> V2SwapEncoder:
+    return V2SwapEncoder(router)
+
+@lru_cache(maxsize=64)
+def v3_exact_input_single_encoder(router: str) -> V3ExactInputSingleEncoder:
+    return V3ExactInputSingleEncoder(router)
@@ -1,26 +1,124 @@
-from typing import Dict, Any
-from web3 import Web3
+from typing import Dict, Any, Optional
+from web3 import AsyncWeb3, Web3
 from eth_account import Account
 from agent.config import Settings
 from agent.core.state import AgentState
+from agent.core.transaction_builder import build_transaction_async
+from agent.utils.gas_estimator import GasOracle
 from agent.utils.logger import get_logger
+from agent.utils.tracing import annotate, stage
+from agent.utils.middleware import TxMiddleware, is_nonce_too_low
 
 log = get_logger(__name__)
 
+def _tx_summary(tx: Dict[str, Any]) -> Dict[str, Any]:
+    # The calldata can be kilobytes; log what identifies the transaction instead
+    data = tx.get("data") or b""
+    return {
+        "to": tx.get("to"),
+        "nonce": tx.get("nonce"),
+        "gas": tx.get("gas"),
+        "max_fee": tx.get("maxFeePerGas", tx.get("gasPrice")),
+        "data_len": len(data) if isinstance(data, (bytes, bytearray)) else (len(data) - 2) // 2,
+    }
+
 class TransactionExecutor:
-    def __init__(self, w3: Web3, settings: Settings, state: AgentState):
-            self.w3 = w3
-                    self.settings = settings
-                            self.state = state
-                                    self._account = Account.from_key(settings.PRIVATE_KEY)
-
-                                        def sign_and_send(self, tx: Dict[str, Any]) -> str:
-                                                if self.settings.DRY_RUN:
-                                                            log.info("tx.dry_run", tx=tx)
-                                                                        return "0x" + "0" * 64
-
-                                                                                stx = self._account.sign_transaction(tx)
-                                                                                        tx_hash = self.w3.eth.send_raw_transaction(stx.rawTransaction)
-                                                                                                log.info("tx.sent", tx_hash=tx_hash.hex())
-                                                                                                        return tx_hash.hex()
-                                                
\ No newline at end of file
+    def __init__(
+        self,
+        w3: Web3,
+        settings: Settings,
+        state: AgentState,
+        aw3: Optional[AsyncWeb3] = None,
+        gas_oracle: Optional[GasOracle] = None,
+    ):
+        self.w3 = w3
+        self.aw3 = aw3
+        self.gas_oracle = gas_oracle
+        self.settings = settings
+        self.state = state
+        self._account = Account.from_key(settings.PRIVATE_KEY)
+        # Nonces are allocated locally and atomically, so concurrent submitters never collide
+        self.nonces = TxMiddleware(settings.PUBLIC_ADDRESS)
+
+    def sign_and_send(self, tx: Dict[str, Any]) -> str:
+        if self.settings.DRY_RUN:
+            log.info("tx.dry_run", **_tx_summary(tx))
+            return "0x" + "0" * 64
+
+        with stage("sign"):
+            stx = self._account.sign_transaction(tx)
+        with stage("send"):
+            tx_hash = self.w3.eth.send_raw_transaction(stx.rawTransaction)
+        annotate(tx_hash=tx_hash.hex(), nonce=tx.get("nonce"))
+        log.info("tx.sent", tx_hash=tx_hash.hex())
+        return tx_hash.hex()
+
+    async def submit_async(
+        self,
+        tx_template: Dict[str, Any],
+        max_gas_gwei: Optional[float] = None,
+        replaces: Optional[str] = None,
+    ) -> str:
+        """
+        Build, sign and send with a locally allocated nonce. Requires aw3. Pass the hash of
+        an in-flight transaction as `replaces` to reuse its nonce (e.g. a fee bump).
+        On "nonce too low" the manager is reconciled with the node and the send retried once.
+        """
+        for attempt in (0, 1):
+            reused = self.nonces.nonce_for(replaces) if replaces else None
+            if replaces and reused is None:
+                raise ValueError(f"{replaces} is not in flight; nothing to replace")
+            nonce = reused if reused is not None else await self.nonces.allocate(self.aw3)
+            try:
+                with stage("build_tx"):
+                    tx = await build_transaction_async(
+                        self.aw3, self.settings, tx_template, nonce=nonce, max_gas_gwei=max_gas_gwei,
+                        gas_oracle=self.gas_oracle,
+                    )
+                if self.settings.DRY_RUN:
+                    log.info("tx.dry_run", **_tx_summary(tx))
+                    self.nonces.release(nonce)
+                    return "0x" + "0" * 64
+
+                with stage("sign"):
+                    stx = self._account.sign_transaction(tx)
+                with stage("send"):
+                    tx_hash = (await self.aw3.eth.send_raw_transaction(stx.rawTransaction)).hex()
+            except Exception as e:
+                if reused is None:
+                    self.nonces.release(nonce)
+                if attempt == 0 and is_nonce_too_low(e):
+                    log.warning("tx.nonce_too_low", nonce=nonce)
+                    await self.nonces.reconcile(self.aw3)
+                    continue
+                raise
+            self.nonces.mark_sent(nonce, tx_hash)
+            annotate(tx_hash=tx_hash, nonce=nonce)
+            log.info("tx.sent", tx_hash=tx_hash, nonce=nonce)
+            return tx_hash
+
+    async def on_head(self, block_number: int) -> None:
+        """
+        Per new head: mined nonces leave the in-flight set, and a nonce whose send failed
+        while a later one was broadcast is filled with a zero-value self-transfer, so the
+        later transactions are not held behind it until the next opportunity. Requires aw3.
+        """
+        if not self.nonces.in_flight:
+            return
+        await self.nonces.reconcile(self.aw3)
+        for nonce in await self.nonces.claim_gaps():
+            await self._fill_gap(nonce, block_number)
+
+    async def _fill_gap(self, nonce: int, block_number: int) -> None:
+        filler = {"to": self.settings.PUBLIC_ADDRESS, "value": 0, "gas": 21_000}
+        try:
+            tx = await build_transaction_async(self.aw3, self.settings, filler, nonce=nonce, gas_oracle=self.gas_oracle)
+            stx = self._account.sign_transaction(tx)
+            tx_hash = (await self.aw3.eth.send_raw_transaction(stx.rawTransaction)).hex()
+        except Exception as e:
+            # Handed back: the next allocation (or the next head) takes it first
+            self.nonces.release(nonce)
+            log.warning("tx.gap_fill_failed", nonce=nonce, block=block_number, msg=str(e))
+            return
+        self.nonces.mark_sent(nonce, tx_hash)
+        log.warning("tx.gap_filled", nonce=nonce, block=block_number, tx_hash=tx_hash)
@@ -1,61 +1,130 @@
 from __future__ import annotations
 
-from typing import Iterable, Mapping, Any, List, Tuple
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Mapping, Any, List, Optional, Tuple
 from hexbytes import HexBytes
 from eth_abi import encode as abi_encode
+from agent.core.calldata import write_uint
 
 
 def _to_bytes(data: Any) -> bytes:
     if data is None:
-            return b""
-                if isinstance(data, bytes):
-                        return data
-                            if isinstance(data, bytearray):
-                                    return bytes(data)
-                                        if isinstance(data, str):
-                                                s = data
-                                                        if s.startswith("0x") or s.startswith("0X"):
-                                                                    return bytes.fromhex(s[2:])
-                                                                            # treat as utf-8 if not hex
-                                                                                    return s.encode("utf-8")
-                                                                                        raise TypeError(f"Unsupported bytes-like type: {type(data)}")
-
-
-                                                                                        def encode_flash_params(
-                                                                                            *,
-                                                                                                min_profit: int,
-                                                                                                    beneficiary: str,
-                                                                                                        approvals: Iterable[Mapping[str, Any]] | None = None,
-                                                                                                            calls: Iterable[Mapping[str, Any]] | None = None,
-                                                                                                            ) -> HexBytes:
-                                                                                                                """
-                                                                                                                    Encodes AIFlashLoanExecutor.FlashParams to ABI-encoded bytes.
-
-                                                                                                                        FlashParams solidity layout:
-                                                                                                                            tuple(
-                                                                                                                                  uint256 minProfit,
-                                                                                                                                        address beneficiary,
-                                                                                                                                              tuple(address token, address spender, uint256 amount)[] approvals,
-                                                                                                                                                    tuple(address target, uint256 value, bytes data)[] calls
-                                                                                                                                                        )
-                                                                                                                                                            """
-                                                                                                                                                                approvals_list: List[Tuple[str, str, int]] = []
-                                                                                                                                                                    for a in (approvals or []):
-                                                                                                                                                                            approvals_list.append(
-                                                                                                                                                                                        (a["token"], a["spender"], int(a["amount"]))
-                                                                                                                                                                                                )
-
-                                                                                                                                                                                                    calls_list: List[Tuple[str, int, bytes]] = []
-                                                                                                                                                                                                        for c in (calls or []):
-                                                                                                                                                                                                                calls_list.append(
-                                                                                                                                                                                                                            (
-                                                                                                                                                                                                                                            c["target"],
-                                                                                                                                                                                                                                                            int(c.get("value", 0)),
-                                                                                                                                                                                                                                                                            _to_bytes(c.get("data", b"")),
-                                                                                                                                                                                                                                                                                        )
-                                                                                                                                                                                                                                                                                                )
-
-                                                                                                                                                                                                                                                                                                    types = ["(uint256,address,(address,address,uint256)[],(address,uint256,bytes)[])"]
-                                                                                                                                                                                                                                                                                                        values = [(int(min_profit), beneficiary, approvals_list, calls_list)]
-                                                                                                                                                                                                                                                                                                            return HexBytes(abi_encode(types, values))
-                                                                                                                                                                            
\ No newline at end of file
+        return b""
+    if isinstance(data, bytes):
+        return data
+    if isinstance(data, bytearray):
+        return bytes(data)
+    if isinstance(data, str):
+        s = data
+        if s.startswith("0x") or s.startswith("0X"):
+            return bytes.fromhex(s[2:])
+        # treat as utf-8 if not hex
+        return s.encode("utf-8")
+    raise TypeError(f"Unsupported bytes-like type: {type(data)}")
+
+
+def encode_flash_params(
+    *,
+    min_profit: int,
+    beneficiary: str,
+    approvals: Iterable[Mapping[str, Any]] | None = None,
+    calls: Iterable[Mapping[str, Any]] | None = None,
+) -> HexBytes:
+    """
+    Encodes AIFlashLoanExecutor.FlashParams to ABI-encoded bytes.
+
+    FlashParams solidity layout:
+    tuple(
+      uint256 minProfit,
+      address beneficiary,
+      tuple(address token, address spender, uint256 amount)[] approvals,
+      tuple(address target, uint256 value, bytes data)[] calls
+    )
+    """
+    approvals_list: List[Tuple[str, str, int]] = []
+    for a in (approvals or []):
+        approvals_list.append(
+            (a["token"], a["spender"], int(a["amount"]))
+        )
+
+    calls_list: List[Tuple[str, int, bytes]] = []
+    for c in (calls or []):
+        calls_list.append(
+            (
+                c["target"],
+                int(c.get("value", 0)),
+                _to_bytes(c.get("data", b"")),
+            )
+        )
+
+    types = ["(uint256,address,(address,address,uint256)[],(address,uint256,bytes)[])"]
+    values = [(int(min_profit), beneficiary, approvals_list, calls_list)]
+    return HexBytes(abi_encode(types, values))
+
+
+def _word(buf: bytes, offset: int) -> int:
+    return int.from_bytes(buf[offset:offset + 32], "big")
+
+
+@dataclass
+class FlashParamsTemplate:
+    """
+    FlashParams encoded once for a fixed route shape, with the byte offsets of its variable
+    uint256 slots recorded by name. render() patches a copy instead of re-running eth_abi.
+
+    A name may map to several offsets (e.g. a deadline shared by every router call).
+    """
+    encoded: bytes
+    slots: Dict[str, List[int]] = field(default_factory=dict)
+
+    @classmethod
+    def from_shape(
+        cls,
+        *,
+        beneficiary: str,
+        approvals: Iterable[Mapping[str, Any]] | None = None,
+        calls: Iterable[Mapping[str, Any]] | None = None,
+        approval_slots: Optional[Mapping[int, str]] = None,
+        call_slots: Optional[Mapping[int, Mapping[str, int]]] = None,
+    ) -> "FlashParamsTemplate":
+        """
+        approval_slots maps approval index -> slot name for its amount; call_slots maps call
+        index -> {slot name: byte offset within that call's data}. minProfit is always the
+        "min_profit" slot. Placeholder values in approvals/calls are overwritten on render.
+        """
+        approvals = list(approvals or [])
+        calls = list(calls or [])
+        encoded = bytes(encode_flash_params(min_profit=0, beneficiary=beneficiary, approvals=approvals, calls=calls))
+
+        # Walk the ABI layout: [offset to tuple][minProfit, beneficiary, approvals*, calls*]...
+        t = _word(encoded, 0)
+        tmpl = cls(encoded)
+        tmpl._add("min_profit", t)
+        approvals_at = t + _word(encoded, t + 64)
+        calls_at = t + _word(encoded, t + 96)
+
+        for i, name in (approval_slots or {}).items():
+            # (token, spender, amount) tuples are static: 3 words each after the length
+            tmpl._add(name, approvals_at + 32 + 96 * i + 64)
+
+        heads = calls_at + 32
+        for i, local in (call_slots or {}).items():
+            # (target, value, bytes data) is dynamic: head holds an offset per element
+            elem = heads + _word(encoded, heads + 32 * i)
+            data_at = elem + _word(encoded, elem + 64) + 32
+            for name, offset in local.items():
+                tmpl._add(name, data_at + offset)
+        return tmpl
+
+    def _add(self, name: str, offset: int) -> None:
+        self.slots.setdefault(name, []).append(offset)
+
+    def render(self, **values: int) -> bytes:
+        missing = self.slots.keys() - values.keys()
+        if missing:
+            raise KeyError(f"FlashParams template slots not provided: {sorted(missing)}")
+        buf = bytearray(self.encoded)
+        for name, value in values.items():
+            for offset in self.slots[name]:
+                write_uint(buf, offset, int(value))
+        return bytes(buf)
@@ -4,18 +4,18 @@ from typing import Dict, Any
 
 def build_aave_v2_flashloan_call(
     lending_pool: str,
-        asset: str,
-            amount_wei: int,
-                receiver: str,
-                    params: bytes = b"",
-                    ) -> Dict[str, Any]:
-                        """
-                            Return a transaction dict or calldata to initiate a flash loan.
-                                You must implement the correct interface and calldata encoding.
-                                    """
-                                        # TODO: Implement actual ABI encoding using the LendingPool interface
-                                            return {
-                                                    "to": lending_pool,
-                                                            "data": "0x",  # placeholder
-                                                                    "value": 0,
-                                                                        }
+    asset: str,
+    amount_wei: int,
+    receiver: str,
+    params: bytes = b"",
+) -> Dict[str, Any]:
+    """
+    Return a transaction dict or calldata to initiate a flash loan.
+    You must implement the correct interface and calldata encoding.
+    """
+    # TODO: Implement actual ABI encoding using the LendingPool interface
+    return {
+        "to": lending_pool,
+        "data": "0x",  # placeholder
+        "value": 0,
+    }
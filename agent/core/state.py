@@ -6,6 +6,5 @@ from agent.config import Settings
 @dataclass
 class AgentState:
     w3: Web3
-        settings: Settings
-            metadata: Dict[str, Any] = field(default_factory=dict)
-    
\ No newline at end of file
+    settings: Settings
+    metadata: Dict[str, Any] = field(default_factory=dict)
@@ -6,6 +6,11 @@ UNISWAP_V2_ROUTER_ABI = [
         "inputs":[{"name":"amountIn","type":"uint256"},{"name":"path","type":"address[]"}],
         "outputs":[{"name":"amounts","type":"uint256[]"}]
     },
+    {
+        "type":"function","name":"factory","stateMutability":"view",
+        "inputs":[],
+        "outputs":[{"name":"","type":"address"}]
+    },
     {
         "type":"function","name":"swapExactTokensForTokens","stateMutability":"nonpayable",
         "inputs":[
@@ -52,3 +57,34 @@ UNISWAP_V3_SWAP_ROUTER_ABI = [
         "outputs":[{"name":"amountOut","type":"uint256"}]
     }
 ]
+
+# Uniswap V2 factory/pair reads used to seed the local quoting engine
+UNISWAP_V2_FACTORY_ABI = [
+    {
+        "type":"function","name":"getPair","stateMutability":"view",
+        "inputs":[{"name":"tokenA","type":"address"},{"name":"tokenB","type":"address"}],
+        "outputs":[{"name":"pair","type":"address"}]
+    }
+]
+
+UNISWAP_V2_PAIR_ABI = [
+    {
+        "type":"function","name":"token0","stateMutability":"view",
+        "inputs":[],
+        "outputs":[{"name":"","type":"address"}]
+    },
+    {
+        "type":"function","name":"token1","stateMutability":"view",
+        "inputs":[],
+        "outputs":[{"name":"","type":"address"}]
+    },
+    {
+        "type":"function","name":"getReserves","stateMutability":"view",
+        "inputs":[],
+        "outputs":[
+            {"name":"reserve0","type":"uint112"},
+            {"name":"reserve1","type":"uint112"},
+            {"name":"blockTimestampLast","type":"uint32"}
+        ]
+    }
+]
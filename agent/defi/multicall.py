@@ -0,0 +1,183 @@
+from dataclasses import dataclass, field
+from typing import Any, Callable, List, Optional, Sequence
+from eth_abi import decode as abi_decode, encode as abi_encode
+from eth_utils import function_signature_to_4byte_selector
+from web3 import Web3
+from web3.types import BlockIdentifier
+
+# Multicall3 is deployed at the same address on every major EVM chain
+MULTICALL3_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
+
+_AGGREGATE3 = function_signature_to_4byte_selector("aggregate3((address,bool,bytes)[])")
+_GET_BLOCK_NUMBER = function_signature_to_4byte_selector("getBlockNumber()")
+
+@dataclass
+class Call:
+    target: str
+    data: bytes
+    output_types: List[str]
+    allow_failure: bool = True
+    # Optional post-processing of the decoded tuple (e.g. unwrap a single value)
+    transform: Optional[Callable[[tuple], Any]] = None
+
+@dataclass
+class CallResult:
+    success: bool
+    value: Any = None
+    raw: bytes = b""
+
+@dataclass
+class BatchResult:
+    block_number: int
+    results: List[CallResult] = field(default_factory=list)
+
+    def __getitem__(self, i: int) -> CallResult:
+        return self.results[i]
+
+    def __len__(self) -> int:
+        return len(self.results)
+
+def _single(values: tuple) -> Any:
+    return values[0]
+
+def encode_call(signature: str, arg_types: Sequence[str] = (), args: Sequence[Any] = ()) -> bytes:
+    """ABI-encodes a call by its canonical signature, e.g. 'balanceOf(address)'."""
+    data = function_signature_to_4byte_selector(signature)
+    if arg_types:
+        data += abi_encode(list(arg_types), list(args))
+    return data
+
+class MulticallBatch:
+    """
+    Collects view calls and executes them through Multicall3.aggregate3 in a single eth_call.
+
+    Each call tolerates failure independently: a revert or undecodable return yields
+    CallResult(success=False) at its position instead of failing the batch. Results
+    come back with the block number the batch was evaluated at so callers can pin
+    follow-up reads to the same state.
+    """
+
+    def __init__(self, w3: Web3, address: str = MULTICALL3_ADDRESS, max_calls_per_request: int = 500):
+        self.w3 = w3
+        self.address = Web3.to_checksum_address(address)
+        self.max_calls_per_request = max_calls_per_request
+        self.calls: List[Call] = []
+
+    def __len__(self) -> int:
+        return len(self.calls)
+
+    def add(
+        self,
+        target: str,
+        signature: str,
+        arg_types: Sequence[str] = (),
+        args: Sequence[Any] = (),
+        output_types: Sequence[str] = (),
+        allow_failure: bool = True,
+        transform: Optional[Callable[[tuple], Any]] = None,
+    ) -> int:
+        """Queues a call and returns its index in the result list."""
+        self.calls.append(
+            Call(
+                target=Web3.to_checksum_address(target),
+                data=encode_call(signature, arg_types, args),
+                output_types=list(output_types),
+                allow_failure=allow_failure,
+                transform=transform,
+            )
+        )
+        return len(self.calls) - 1
+
+    # Convenience builders for the reads on the quote/simulate path
+
+    def add_v2_get_amounts_out(self, router: str, amount_in: int, path: List[str]) -> int:
+        return self.add(
+            router,
+            "getAmountsOut(uint256,address[])",
+            ["uint256", "address[]"],
+            [int(amount_in), [Web3.to_checksum_address(p) for p in path]],
+            ["uint256[]"],
+            transform=lambda v: list(v[0]),
+        )
+
+    def add_v2_get_reserves(self, pair: str) -> int:
+        return self.add(pair, "getReserves()", output_types=["uint112", "uint112", "uint32"])
+
+    def add_v3_quote_exact_input_single(
+        self, quoter: str, token_in: str, token_out: str, fee: int, amount_in: int
+    ) -> int:
+        return self.add(
+            quoter,
+            "quoteExactInputSingle(address,address,uint24,uint256,uint160)",
+            ["address", "address", "uint24", "uint256", "uint160"],
+            [Web3.to_checksum_address(token_in), Web3.to_checksum_address(token_out), int(fee), int(amount_in), 0],
+            ["uint256"],
+            transform=_single,
+        )
+
+    def add_balance_of(self, token: str, owner: str) -> int:
+        return self.add(
+            token, "balanceOf(address)", ["address"], [Web3.to_checksum_address(owner)], ["uint256"], transform=_single
+        )
+
+    def add_allowance(self, token: str, owner: str, spender: str) -> int:
+        return self.add(
+            token,
+            "allowance(address,address)",
+            ["address", "address"],
+            [Web3.to_checksum_address(owner), Web3.to_checksum_address(spender)],
+            ["uint256"],
+            transform=_single,
+        )
+
+    def add_owner(self, target: str) -> int:
+        return self.add(target, "owner()", output_types=["address"], transform=_single)
+
+    def add_paused(self, target: str) -> int:
+        return self.add(target, "paused()", output_types=["bool"], transform=_single)
+
+    def add_basefee(self) -> int:
+        return self.add(self.address, "getBasefee()", output_types=["uint256"], transform=_single)
+
+    def _aggregate3(self, calls: List[Call], block_identifier: BlockIdentifier) -> tuple:
+        # getBlockNumber() is prepended so every chunk reports the block it ran against
+        head = (self.address, False, _GET_BLOCK_NUMBER)
+        payload = [head] + [(c.target, c.allow_failure, c.data) for c in calls]
+        data = _AGGREGATE3 + abi_encode(["(address,bool,bytes)[]"], [payload])
+        raw = self.w3.eth.call({"to": self.address, "data": data}, block_identifier)
+        (returned,) = abi_decode(["(bool,bytes)[]"], bytes(raw))
+        block_number = abi_decode(["uint256"], returned[0][1])[0]
+        return block_number, returned[1:]
+
+    def execute(self, block_identifier: BlockIdentifier = "latest") -> BatchResult:
+        """
+        Runs all queued calls. Large batches are split into chunks of max_calls_per_request;
+        when block_identifier is not a fixed number, later chunks are pinned to the block
+        number reported by the first one.
+        """
+        out = BatchResult(block_number=-1)
+        if not self.calls:
+            return out
+        block = block_identifier
+        for start in range(0, len(self.calls), self.max_calls_per_request):
+            chunk = self.calls[start:start + self.max_calls_per_request]
+            block_number, returned = self._aggregate3(chunk, block)
+            if out.block_number < 0:
+                out.block_number = int(block_number)
+                block = out.block_number
+            for call, (ok, ret) in zip(chunk, returned):
+                out.results.append(_decode_result(call, ok, bytes(ret)))
+        return out
+
+def _decode_result(call: Call, ok: bool, ret: bytes) -> CallResult:
+    if not ok:
+        return CallResult(success=False, raw=ret)
+    if not call.output_types:
+        return CallResult(success=True, value=None, raw=ret)
+    try:
+        values = abi_decode(call.output_types, ret)
+    except Exception:
+        # Empty or malformed returndata (e.g. call to an EOA) counts as a failed call
+        return CallResult(success=False, raw=ret)
+    value = call.transform(values) if call.transform else values
+    return CallResult(success=True, value=value, raw=ret)
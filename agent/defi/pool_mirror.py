@@ -0,0 +1,355 @@
+import asyncio
+from collections import OrderedDict
+from dataclasses import dataclass, field, fields
+from typing import Any, AsyncGenerator, Dict, Iterable, List, Optional, Set, Tuple
+from eth_abi import decode as abi_decode
+from hexbytes import HexBytes
+from web3 import AsyncWeb3, Web3, WebsocketProviderV2
+from agent.config import Settings
+from agent.defi.uniswap_v2 import V2QuoteEngine
+from agent.defi.uniswap_v3 import V3Pool, load_v3_pool
+from agent.utils.logger import get_logger
+
+log = get_logger(__name__)
+
+SYNC_TOPIC = Web3.keccak(text="Sync(uint112,uint112)")
+V3_SWAP_TOPIC = Web3.keccak(text="Swap(address,address,int256,int256,uint160,uint128,int24)")
+V3_MINT_TOPIC = Web3.keccak(text="Mint(address,address,int24,int24,uint128,uint256,uint256)")
+V3_BURN_TOPIC = Web3.keccak(text="Burn(address,int24,int24,uint128,uint256,uint256)")
+POOL_TOPICS = [SYNC_TOPIC, V3_SWAP_TOPIC, V3_MINT_TOPIC, V3_BURN_TOPIC]
+
+@dataclass
+class PoolDelta:
+    """Pools whose state changed since the previous delta."""
+    block_number: int
+    changed: Set[str] = field(default_factory=set)
+    # Set when a reorg was handled: state was rolled back to this block before re-applying
+    rolled_back_to: Optional[int] = None
+
+@dataclass
+class _BlockJournal:
+    block_hash: Optional[bytes]
+    seen: Set[int] = field(default_factory=set)
+    # Undo records in application order; replayed in reverse on rollback
+    undo: List[Tuple[Any, ...]] = field(default_factory=list)
+
+@dataclass
+class _PollRead:
+    """What one poll read from the node, before any of it is applied."""
+    head: int
+    head_hash: bytes
+    logs: List[Dict[str, Any]] = field(default_factory=list)
+    rolled_back_to: Optional[int] = None
+    # Deep reorg only: fresh V2 reserves and V3 pools at `head`
+    reserves: Optional[Dict[str, Tuple[int, int]]] = None
+    v3: Optional[Dict[str, V3Pool]] = None
+
+def _int24_topic(topic: bytes) -> int:
+    return abi_decode(["int24"], bytes(topic))[0]
+
+def _hash(value: Any) -> Optional[bytes]:
+    return bytes(HexBytes(value)) if value is not None else None
+
+class PoolStateMirror:
+    """
+    In-memory mirror of Uniswap V2 reserves and V3 price/liquidity/tick state.
+
+    State lives in the shared V2QuoteEngine (V2 pairs) and in V3Pool objects, and is
+    advanced incrementally from Sync and Swap/Mint/Burn logs. Every applied log
+    records an undo entry in a per-block journal, so a reorg (a `removed` log from the
+    WS feed, or a block hash mismatch seen while polling) rolls state back to the last
+    common block before the replacement logs are applied. Journals older than
+    `reorg_depth` blocks are discarded.
+    """
+
+    def __init__(
+        self,
+        w3: Web3,
+        settings: Settings,
+        v2: V2QuoteEngine,
+        reorg_depth: int = 64,
+        poll_interval: float = 1.0,
+        coalesce_window: float = 0.05,
+    ):
+        self.w3 = w3
+        self.settings = settings
+        self.v2 = v2
+        self.v3: Dict[str, V3Pool] = {}
+        self.reorg_depth = reorg_depth
+        self.poll_interval = poll_interval
+        self.coalesce_window = coalesce_window
+        self.last_block = -1
+        self._journal: "OrderedDict[int, _BlockJournal]" = OrderedDict()
+
+    # Registry
+
+    def track_v3_pool(self, pool: V3Pool) -> None:
+        self.v3[pool.address.lower()] = pool
+
+    def addresses(self) -> List[str]:
+        v2 = [p.address for p in self.v2.pairs()]
+        return [Web3.to_checksum_address(a) for a in v2 + [p.address for p in self.v3.values()]]
+
+    def log_filter(self) -> Dict[str, Any]:
+        return {"address": self.addresses(), "topics": [[HexBytes(t).hex() for t in POOL_TOPICS]]}
+
+    # Applying logs
+
+    def _journal_for(self, block_number: int, block_hash: Optional[bytes]) -> _BlockJournal:
+        j = self._journal.get(block_number)
+        if j is None:
+            j = _BlockJournal(block_hash=block_hash)
+            self._journal[block_number] = j
+            while len(self._journal) > self.reorg_depth:
+                self._journal.popitem(last=False)
+        elif j.block_hash is None:
+            j.block_hash = block_hash
+        return j
+
+    def _apply_log(self, entry: Dict[str, Any], journal: _BlockJournal) -> Optional[str]:
+        address = str(entry["address"]).lower()
+        topics = [bytes(HexBytes(t)) for t in entry.get("topics", [])]
+        if not topics:
+            return None
+        data = bytes(HexBytes(entry.get("data", b"")))
+        topic0 = topics[0]
+
+        if topic0 == SYNC_TOPIC:
+            pair = self.v2.pair_at(address)
+            if pair is None:
+                return None
+            reserve0, reserve1 = abi_decode(["uint112", "uint112"], data)
+            journal.undo.append(("v2", address, pair.reserve0, pair.reserve1))
+            self.v2.update_reserves(address, reserve0, reserve1)
+            return address
+
+        pool = self.v3.get(address)
+        if pool is None:
+            return None
+        if topic0 == V3_SWAP_TOPIC:
+            _, _, sqrt_price_x96, liquidity, tick = abi_decode(
+                ["int256", "int256", "uint160", "uint128", "int24"], data
+            )
+            journal.undo.append(("v3swap", address, pool.sqrt_price_x96, pool.liquidity, pool.tick))
+            pool.apply_swap(sqrt_price_x96, liquidity, tick)
+        elif topic0 in (V3_MINT_TOPIC, V3_BURN_TOPIC):
+            tick_lower, tick_upper = _int24_topic(topics[2]), _int24_topic(topics[3])
+            if topic0 == V3_MINT_TOPIC:
+                _, amount, _, _ = abi_decode(["address", "uint128", "uint256", "uint256"], data)
+                delta = int(amount)
+            else:
+                amount, _, _ = abi_decode(["uint128", "uint256", "uint256"], data)
+                delta = -int(amount)
+            if delta == 0:
+                return None
+            journal.undo.append(("v3liq", address, tick_lower, tick_upper, delta))
+            pool.apply_liquidity(tick_lower, tick_upper, delta)
+        else:
+            return None
+        return address
+
+    def rollback_to(self, block_number: int) -> Set[str]:
+        """Reverts every applied block above block_number. Returns the pools touched."""
+        touched: Set[str] = set()
+        while self._journal:
+            n = next(reversed(self._journal))
+            if n <= block_number:
+                break
+            j = self._journal.pop(n)
+            for rec in reversed(j.undo):
+                kind, address = rec[0], rec[1]
+                if kind == "v2":
+                    self.v2.update_reserves(address, rec[2], rec[3])
+                elif kind == "v3swap":
+                    self.v3[address].apply_swap(rec[2], rec[3], rec[4])
+                elif kind == "v3liq":
+                    self.v3[address].apply_liquidity(rec[2], rec[3], -rec[4])
+                touched.add(address)
+        self.last_block = min(self.last_block, block_number)
+        log.warning("mirror.rollback", to_block=block_number, pools=len(touched))
+        return touched
+
+    def apply_logs(self, logs: Iterable[Dict[str, Any]]) -> PoolDelta:
+        """Applies logs in (block, logIndex) order, rolling back on removed/conflicting blocks."""
+        ordered = sorted(logs, key=lambda e: (int(e["blockNumber"]), int(e.get("logIndex", 0))))
+        delta = PoolDelta(block_number=self.last_block)
+        for entry in ordered:
+            n = int(entry["blockNumber"])
+            block_hash = _hash(entry.get("blockHash"))
+
+            if entry.get("removed"):
+                if n in self._journal:
+                    delta.changed |= self.rollback_to(n - 1)
+                    delta.rolled_back_to = n - 1
+                continue
+
+            known = self._journal.get(n)
+            if known is not None and known.block_hash and block_hash and known.block_hash != block_hash:
+                delta.changed |= self.rollback_to(n - 1)
+                delta.rolled_back_to = n - 1
+                known = None
+            journal = known or self._journal_for(n, block_hash)
+
+            log_index = int(entry.get("logIndex", 0))
+            if log_index in journal.seen:
+                continue
+            journal.seen.add(log_index)
+
+            address = self._apply_log(entry, journal)
+            if address:
+                delta.changed.add(address)
+            self.last_block = max(self.last_block, n)
+        delta.block_number = self.last_block
+        return delta
+
+    # Log sources
+
+    def _find_common_block(self) -> Optional[int]:
+        """Walks the journal back to the newest block whose hash still matches the chain."""
+        for n in reversed(list(self._journal.keys())):
+            j = self._journal[n]
+            if j.block_hash is None:
+                continue
+            if bytes(self.w3.eth.get_block(n)["hash"]) == j.block_hash:
+                return n
+        return None
+
+    def _read_poll(self) -> Optional[_PollRead]:
+        """
+        The RPC half of a poll: head, reorg check and logs. Reads the journal but writes no
+        pool state, so it can run off the event loop while quotes are being read.
+        """
+        if not self.addresses():
+            return None
+        latest = self.w3.eth.get_block("latest")
+        read = _PollRead(head=int(latest["number"]), head_hash=bytes(latest["hash"]))
+        last_block = self.last_block
+
+        if last_block >= 0 and last_block in self._journal:
+            j = self._journal[last_block]
+            if j.block_hash is not None:
+                current = latest if read.head == last_block else self.w3.eth.get_block(last_block)
+                if bytes(current["hash"]) != j.block_hash:
+                    common = self._find_common_block()
+                    read.rolled_back_to = common if common is not None else last_block - self.reorg_depth
+                    last_block = read.rolled_back_to
+                    if common is None:
+                        # Reorg deeper than the journal: journaled undo is not enough, re-read every pool
+                        multicall = self.settings.MULTICALL3_ADDRESS
+                        _, read.reserves = self.v2.read_reserves(self.w3, read.head, multicall)
+                        read.v3 = {
+                            address: load_v3_pool(self.w3, pool.address, block_identifier=read.head,
+                                                  multicall_address=multicall)
+                            for address, pool in self.v3.items()
+                        }
+
+        from_block = last_block + 1 if last_block >= 0 else read.head
+        if from_block > read.head and read.rolled_back_to is None:
+            return None
+        if from_block <= read.head:
+            read.logs = self.w3.eth.get_logs(dict(self.log_filter(), fromBlock=from_block, toBlock=read.head))
+        return read
+
+    def _apply_poll(self, read: Optional[_PollRead]) -> Optional[PoolDelta]:
+        """The state half of a poll; runs where pool state is read (the event loop)."""
+        if read is None:
+            return None
+        touched: Set[str] = set()
+        if read.rolled_back_to is not None:
+            touched = self.rollback_to(read.rolled_back_to)
+            for address, (reserve0, reserve1) in (read.reserves or {}).items():
+                self.v2.update_reserves(address, reserve0, reserve1)
+                touched.add(address.lower())
+            for address, fresh in (read.v3 or {}).items():
+                # In place: the cycle graph holds the pool object
+                pool = self.v3[address]
+                for f in fields(V3Pool):
+                    setattr(pool, f.name, getattr(fresh, f.name))
+                touched.add(address)
+        delta = self.apply_logs(read.logs)
+        # Anchor the head hash so the next poll can detect a reorg even on blocks without logs
+        self._journal_for(read.head, read.head_hash)
+        self.last_block = read.head
+        delta.block_number = read.head
+        delta.changed |= touched
+        if read.rolled_back_to is not None:
+            delta.rolled_back_to = read.rolled_back_to
+        return delta if delta.changed or delta.rolled_back_to is not None else None
+
+    def poll(self) -> Optional[PoolDelta]:
+        """One eth_getLogs round over (last_block, latest]. Returns None when nothing changed."""
+        return self._apply_poll(self._read_poll())
+
+    async def _poll_stream(self) -> AsyncGenerator[PoolDelta, None]:
+        while True:
+            try:
+                # Only the RPCs leave the loop; applying them stays here, with the quote readers
+                delta = self._apply_poll(await asyncio.to_thread(self._read_poll))
+            except Exception as e:
+                log.warning("mirror.poll_error", msg=str(e))
+                delta = None
+            if delta is not None:
+                yield delta
+            await asyncio.sleep(self.poll_interval)
+
+    async def _ws_stream(self, ws_url: str) -> AsyncGenerator[PoolDelta, None]:
+        queue: asyncio.Queue = asyncio.Queue()
+
+        async def reader(ws: AsyncWeb3) -> None:
+            async for msg in ws.ws.process_subscriptions():
+                await queue.put(msg["result"])
+
+        async with AsyncWeb3.persistent_websocket(WebsocketProviderV2(ws_url)) as ws:
+            await ws.eth.subscribe("logs", self.log_filter())
+            log.info("mirror.ws_subscribed", pools=len(self.addresses()))
+            task = asyncio.create_task(reader(ws))
+            try:
+                while True:
+                    if task.done():
+                        task.result()
+                    batch = [await queue.get()]
+                    # Coalesce logs arriving together (typically one block) into a single delta
+                    await asyncio.sleep(self.coalesce_window)
+                    while not queue.empty():
+                        batch.append(queue.get_nowait())
+                    delta = self.apply_logs(batch)
+                    if delta.changed:
+                        yield delta
+            finally:
+                task.cancel()
+
+    async def stream(self) -> AsyncGenerator[PoolDelta, None]:
+        """Yields pool-change deltas from the WS log subscription, falling back to HTTP polling."""
+        ws_url = self.settings.RPC_WS_URL
+        if ws_url and (self.settings.RPC_RECORD_FILE or self.settings.RPC_REPLAY_FILE):
+            # Subscription pushes bypass the RPC tape: poll so every log is recorded / replayed
+            log.info("mirror.ws_skipped", reason="rpc_tape")
+            ws_url = None
+        if ws_url and self.addresses():
+            try:
+                async for delta in self._ws_stream(ws_url):
+                    yield delta
+            except Exception as e:
+                log.warning("mirror.ws_fallback", msg=str(e))
+        async for delta in self._poll_stream():
+            yield delta
+
+    def snapshot(self, addresses: Iterable[str]) -> List[Dict[str, Any]]:
+        """JSON-friendly view of the given pools for downstream stages."""
+        out: List[Dict[str, Any]] = []
+        for a in addresses:
+            pair = self.v2.pair_at(a)
+            if pair is not None:
+                out.append({
+                    "type": "v2", "address": pair.address, "token0": pair.token0, "token1": pair.token1,
+                    "reserve0": pair.reserve0, "reserve1": pair.reserve1, "fee_bps": pair.fee_bps,
+                })
+                continue
+            pool = self.v3.get(a.lower())
+            if pool is not None:
+                out.append({
+                    "type": "v3", "address": pool.address, "token0": pool.token0, "token1": pool.token1,
+                    "fee": pool.fee, "sqrt_price_x96": pool.sqrt_price_x96, "liquidity": pool.liquidity,
+                    "tick": pool.tick,
+                })
+        return out
@@ -0,0 +1,85 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+from web3.types import BlockIdentifier
+from agent.utils.logger import get_logger
+
+log = get_logger(__name__)
+
+class BlockReadCache:
+    """
+    Results of view calls keyed by the block they were read at.
+
+    While a head is set, reads go through `block_identifier` so every cached value is the
+    state at that exact block; advancing to a new head (or a reorg at the same height)
+    drops everything. Concurrent async reads of the same key share one in-flight request.
+    """
+
+    def __init__(self):
+        self.block_number: Optional[int] = None
+        self._values: Dict[Hashable, Any] = {}
+        self._pending: Dict[Hashable, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def block_identifier(self) -> BlockIdentifier:
+        return self.block_number if self.block_number is not None else "latest"
+
+    def advance(self, block_number: int, reorg: bool = False) -> None:
+        if block_number == self.block_number and not reorg:
+            return
+        self.block_number = block_number
+        self._values.clear()
+        # In-flight reads were issued against the old head; let them finish uncached
+        self._pending = {}
+
+    def get(self, key: Hashable, read: Callable[[BlockIdentifier], Any]) -> Any:
+        if self.block_number is not None and key in self._values:
+            self.hits += 1
+            return self._values[key]
+        self.misses += 1
+        block = self.block_number
+        value = read(self.block_identifier)
+        if block is not None and block == self.block_number:
+            self._values[key] = value
+        return value
+
+    async def get_async(self, key: Hashable, read: Callable[[BlockIdentifier], Awaitable[Any]]) -> Any:
+        if self.block_number is None:
+            self.misses += 1
+            return await read("latest")
+        if key in self._values:
+            self.hits += 1
+            return self._values[key]
+        pending = self._pending.get(key)
+        if pending is not None:
+            self.hits += 1
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if asyncio.current_task().cancelling() or not pending.cancelled():
+                    raise
+                # The first reader was cancelled, not us: read for ourselves
+                return await self.get_async(key, read)
+
+        self.misses += 1
+        block, pending_map = self.block_number, self._pending
+        fut = asyncio.get_running_loop().create_future()
+        pending_map[key] = fut
+        try:
+            value = await read(block)
+        except Exception as e:
+            fut.set_exception(e)
+            # Waiters see the error; mark it retrieved so an unobserved future does not warn
+            fut.exception()
+            raise
+        else:
+            fut.set_result(value)
+            if block == self.block_number:
+                self._values[key] = value
+            return value
+        finally:
+            pending_map.pop(key, None)
+            if not fut.done():
+                # Cancelled (or otherwise unwound) before an answer: release the waiters
+                fut.cancel()
@@ -1,13 +1,254 @@
-from typing import List, Tuple
-from web3 import Web3
-from agent.defi.abis import UNISWAP_V2_ROUTER_ABI
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from web3 import AsyncWeb3, Web3
+from web3.types import BlockIdentifier
+from agent.core.calldata import v2_swap_encoder
+from agent.defi.abis import UNISWAP_V2_FACTORY_ABI, UNISWAP_V2_PAIR_ABI, UNISWAP_V2_ROUTER_ABI
+from agent.defi.multicall import MULTICALL3_ADDRESS, MulticallBatch
+from agent.defi.read_cache import BlockReadCache
+from agent.utils.logger import get_logger
+
+log = get_logger(__name__)
+
+# Uniswap V2 and Sushiswap both charge 0.30% (997/1000)
+DEFAULT_V2_FEE_BPS = 30
 
 def v2_router(w3: Web3, address: str):
     return w3.eth.contract(address=Web3.to_checksum_address(address), abi=UNISWAP_V2_ROUTER_ABI)
 
-def quote_v2_get_amounts_out(w3: Web3, router: str, amount_in: int, path: List[str]) -> List[int]:
+def v2_factory(w3: Web3, address: str):
+    return w3.eth.contract(address=Web3.to_checksum_address(address), abi=UNISWAP_V2_FACTORY_ABI)
+
+def v2_pair(w3: Web3, address: str):
+    return w3.eth.contract(address=Web3.to_checksum_address(address), abi=UNISWAP_V2_PAIR_ABI)
+
+def quote_v2_get_amounts_out(
+    w3: Web3, router: str, amount_in: int, path: List[str], block_identifier: BlockIdentifier = "latest"
+) -> List[int]:
     c = v2_router(w3, router)
-    return c.functions.getAmountsOut(amount_in, path).call()
+    return c.functions.getAmountsOut(amount_in, path).call(block_identifier=block_identifier)
+
+async def quote_v2_get_amounts_out_async(
+    w3: AsyncWeb3, router: str, amount_in: int, path: List[str], block_identifier: BlockIdentifier = "latest"
+) -> List[int]:
+    c = v2_router(w3, router)
+    return await c.functions.getAmountsOut(amount_in, path).call(block_identifier=block_identifier)
+
+def _amounts_out_key(router: str, amount_in: int, path: List[str]) -> tuple:
+    return ("getAmountsOut", router.lower(), int(amount_in), tuple(p.lower() for p in path))
+
+def get_amount_out(amount_in: int, reserve_in: int, reserve_out: int, fee_bps: int = DEFAULT_V2_FEE_BPS) -> int:
+    """
+    UniswapV2Library.getAmountOut with the fee expressed in basis points.
+    Integer-exact: fee_bps=30 yields the same result as the 997/1000 router math.
+    """
+    if amount_in <= 0:
+        raise ValueError("UniswapV2: INSUFFICIENT_INPUT_AMOUNT")
+    if reserve_in <= 0 or reserve_out <= 0:
+        raise ValueError("UniswapV2: INSUFFICIENT_LIQUIDITY")
+    amount_in_with_fee = amount_in * (10_000 - fee_bps)
+    numerator = amount_in_with_fee * reserve_out
+    denominator = reserve_in * 10_000 + amount_in_with_fee
+    return numerator // denominator
+
+@dataclass
+class V2Pair:
+    address: str
+    token0: str
+    token1: str
+    reserve0: int
+    reserve1: int
+    fee_bps: int = DEFAULT_V2_FEE_BPS
+
+    def reserves_for(self, token_in: str) -> Tuple[int, int]:
+        """Returns (reserve_in, reserve_out) for a swap starting from token_in."""
+        t = token_in.lower()
+        if t == self.token0.lower():
+            return self.reserve0, self.reserve1
+        if t == self.token1.lower():
+            return self.reserve1, self.reserve0
+        raise ValueError(f"Token {token_in} is not in pair {self.address}")
+
+    def amount_out(self, amount_in: int, token_in: str) -> int:
+        reserve_in, reserve_out = self.reserves_for(token_in)
+        return get_amount_out(amount_in, reserve_in, reserve_out, self.fee_bps)
+
+def _pair_key(router: str, token_a: str, token_b: str) -> Tuple[str, str, str]:
+    a, b = token_a.lower(), token_b.lower()
+    return (router.lower(), a, b) if a < b else (router.lower(), b, a)
+
+class V2QuoteEngine:
+    """
+    In-process Uniswap V2 quoting from cached pair reserves.
+
+    Pairs are keyed by (router, token pair) so the same token pair on different DEXes
+    quotes independently. `quote` has the signature of `quote_v2_get_amounts_out` and
+    falls back to the router eth_call when a hop's reserves are not cached. With
+    cross_check enabled, locally computed quotes are also verified against the router
+    and the on-chain result wins on mismatch. Router reads go through `read_cache`
+    (when set) so repeated quotes within a block cost one eth_call.
+    """
+
+    def __init__(
+        self,
+        default_fee_bps: int = DEFAULT_V2_FEE_BPS,
+        router_fees: Optional[Dict[str, int]] = None,
+        cross_check: bool = False,
+        read_cache: Optional[BlockReadCache] = None,
+    ):
+        self.default_fee_bps = default_fee_bps
+        self.read_cache = read_cache
+        self.router_fees = {k.lower(): int(v) for k, v in (router_fees or {}).items()}
+        self.cross_check = cross_check
+        self._pairs: Dict[Tuple[str, str, str], V2Pair] = {}
+        self._by_address: Dict[str, V2Pair] = {}
+        self._factories: Dict[str, str] = {}
+
+    def fee_for(self, router: str) -> int:
+        return self.router_fees.get(router.lower(), self.default_fee_bps)
+
+    def upsert_pair(self, router: str, pair: V2Pair) -> None:
+        self._pairs[_pair_key(router, pair.token0, pair.token1)] = pair
+        self._by_address[pair.address.lower()] = pair
+
+    def get_pair(self, router: str, token_a: str, token_b: str) -> Optional[V2Pair]:
+        return self._pairs.get(_pair_key(router, token_a, token_b))
+
+    def pairs(self) -> List[V2Pair]:
+        return list(self._by_address.values())
+
+    def pairs_by_router(self) -> List[Tuple[str, V2Pair]]:
+        return [(key[0], pair) for key, pair in self._pairs.items()]
+
+    def pair_at(self, address: str) -> Optional[V2Pair]:
+        return self._by_address.get(address.lower())
+
+    def update_reserves(self, pair_address: str, reserve0: int, reserve1: int) -> bool:
+        """Applies new reserves (e.g. from a Sync event). Returns False for unknown pairs."""
+        pair = self._by_address.get(pair_address.lower())
+        if pair is None:
+            return False
+        pair.reserve0 = int(reserve0)
+        pair.reserve1 = int(reserve1)
+        return True
+
+    def has_path(self, router: str, path: List[str]) -> bool:
+        return all(self.get_pair(router, path[i], path[i + 1]) is not None for i in range(len(path) - 1))
+
+    def get_amounts_out(self, router: str, amount_in: int, path: List[str]) -> List[int]:
+        """Local equivalent of Router02.getAmountsOut. Raises KeyError if a hop is not cached."""
+        if len(path) < 2:
+            raise ValueError("UniswapV2: INVALID_PATH")
+        amounts = [int(amount_in)]
+        for i in range(len(path) - 1):
+            pair = self.get_pair(router, path[i], path[i + 1])
+            if pair is None:
+                raise KeyError(f"No cached V2 pair for {path[i]}/{path[i + 1]} on {router}")
+            amounts.append(pair.amount_out(amounts[-1], path[i]))
+        return amounts
+
+    def _router_quote(self, w3: Web3, router: str, amount_in: int, path: List[str]) -> List[int]:
+        if self.read_cache is None:
+            return quote_v2_get_amounts_out(w3, router, amount_in, path)
+        return self.read_cache.get(
+            _amounts_out_key(router, amount_in, path),
+            lambda block: quote_v2_get_amounts_out(w3, router, amount_in, path, block),
+        )
+
+    async def _router_quote_async(self, w3: AsyncWeb3, router: str, amount_in: int, path: List[str]) -> List[int]:
+        if self.read_cache is None:
+            return await quote_v2_get_amounts_out_async(w3, router, amount_in, path)
+        return await self.read_cache.get_async(
+            _amounts_out_key(router, amount_in, path),
+            lambda block: quote_v2_get_amounts_out_async(w3, router, amount_in, path, block),
+        )
+
+    def quote(self, w3: Web3, router: str, amount_in: int, path: List[str]) -> List[int]:
+        if not self.has_path(router, path):
+            return self._router_quote(w3, router, amount_in, path)
+        amounts = self.get_amounts_out(router, amount_in, path)
+        if self.cross_check:
+            onchain = list(self._router_quote(w3, router, amount_in, path))
+            if onchain != amounts:
+                log.warning("v2.quote_mismatch", router=router, path=path, local=amounts, onchain=onchain)
+                return onchain
+        return amounts
+
+    async def quote_async(self, w3: AsyncWeb3, router: str, amount_in: int, path: List[str]) -> List[int]:
+        if not self.has_path(router, path):
+            return await self._router_quote_async(w3, router, amount_in, path)
+        amounts = self.get_amounts_out(router, amount_in, path)
+        if self.cross_check:
+            onchain = list(await self._router_quote_async(w3, router, amount_in, path))
+            if onchain != amounts:
+                log.warning("v2.quote_mismatch", router=router, path=path, local=amounts, onchain=onchain)
+                return onchain
+        return amounts
+
+    def read_reserves(
+        self,
+        w3: Web3,
+        block_identifier: BlockIdentifier = "latest",
+        multicall_address: str = MULTICALL3_ADDRESS,
+    ) -> Tuple[int, Dict[str, Tuple[int, int]]]:
+        """
+        getReserves for every cached pair in one Multicall3 request, without applying them:
+        (block number, {pair address: (reserve0, reserve1)}). Pairs whose call fails are left out.
+        """
+        pairs = self.pairs()
+        if not pairs:
+            return -1, {}
+        batch = MulticallBatch(w3, address=multicall_address)
+        for pair in pairs:
+            batch.add_v2_get_reserves(pair.address)
+        res = batch.execute(block_identifier)
+        reserves = {
+            pair.address: (int(r.value[0]), int(r.value[1])) for pair, r in zip(pairs, res.results) if r.success
+        }
+        return res.block_number, reserves
+
+    def refresh_reserves(
+        self,
+        w3: Web3,
+        block_identifier: BlockIdentifier = "latest",
+        multicall_address: str = MULTICALL3_ADDRESS,
+    ) -> int:
+        """
+        Re-reads getReserves for every cached pair in one Multicall3 request.
+        Returns the block number the reserves were read at. Pairs whose call fails keep
+        their previous reserves.
+        """
+        block_number, reserves = self.read_reserves(w3, block_identifier, multicall_address)
+        for address, (reserve0, reserve1) in reserves.items():
+            self.update_reserves(address, reserve0, reserve1)
+        return block_number
+
+    def load_pair(self, w3: Web3, router: str, token_a: str, token_b: str) -> Optional[V2Pair]:
+        """Reads pair address, token order and reserves on-chain and caches them."""
+        r = router.lower()
+        factory = self._factories.get(r)
+        if factory is None:
+            factory = v2_router(w3, router).functions.factory().call()
+            self._factories[r] = factory
+        address = v2_factory(w3, factory).functions.getPair(
+            Web3.to_checksum_address(token_a), Web3.to_checksum_address(token_b)
+        ).call()
+        if int(address, 16) == 0:
+            return None
+        c = v2_pair(w3, address)
+        token0 = c.functions.token0().call()
+        token1 = c.functions.token1().call()
+        reserve0, reserve1, _ = c.functions.getReserves().call()
+        pair = V2Pair(
+            address=address,
+            token0=token0,
+            token1=token1,
+            reserve0=int(reserve0),
+            reserve1=int(reserve1),
+            fee_bps=self.fee_for(router),
+        )
+        self.upsert_pair(router, pair)
+        return pair
 
 def encode_v2_swap_exact_tokens_for_tokens(
     w3: Web3,
@@ -18,8 +259,5 @@ def encode_v2_swap_exact_tokens_for_tokens(
     recipient: str,
     deadline: int
 ) -> bytes:
-    c = v2_router(w3, router)
-    return c.encode_abi(
-        fn_name="swapExactTokensForTokens",
-        args=[amount_in, amount_out_min, path, Web3.to_checksum_address(recipient), deadline],
-    )
+    # Precompiled encoder; w3 is unused but kept for call-site compatibility
+    return v2_swap_encoder(router).encode(amount_in, amount_out_min, path, recipient, deadline)
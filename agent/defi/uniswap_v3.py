@@ -1,5 +1,11 @@
-from web3 import Web3
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from web3 import AsyncWeb3, Web3
+from web3.types import BlockIdentifier
+from agent.core.calldata import v3_exact_input_single_encoder
 from agent.defi.abis import UNISWAP_V3_QUOTER_ABI, UNISWAP_V3_SWAP_ROUTER_ABI
+from agent.defi.multicall import MULTICALL3_ADDRESS, MulticallBatch
+from agent.defi.read_cache import BlockReadCache
 
 def v3_quoter(w3: Web3, address: str):
     return w3.eth.contract(address=Web3.to_checksum_address(address), abi=UNISWAP_V3_QUOTER_ABI)
@@ -7,8 +13,326 @@ def v3_quoter(w3: Web3, address: str):
 def v3_swap_router(w3: Web3, address: str):
     return w3.eth.contract(address=Web3.to_checksum_address(address), abi=UNISWAP_V3_SWAP_ROUTER_ABI)
 
+# Integer-exact ports of the v3-core libraries used by UniswapV3Pool.swap
+
+Q96 = 1 << 96
+MAX_UINT256 = (1 << 256) - 1
+MIN_TICK = -887272
+MAX_TICK = 887272
+MIN_SQRT_RATIO = 4295128739
+MAX_SQRT_RATIO = 1461446703485210103287273052203988822378723970342
+FEE_TICK_SPACING = {100: 1, 500: 10, 3000: 60, 10000: 200}
+
+_TICK_RATIOS = (
+    (0x2, 0xfff97272373d413259a46990580e213a),
+    (0x4, 0xfff2e50f5f656932ef12357cf3c7fdcc),
+    (0x8, 0xffe5caca7e10e4e61c3624eaa0941cd0),
+    (0x10, 0xffcb9843d60f6159c9db58835c926644),
+    (0x20, 0xff973b41fa98c081472e6896dfb254c0),
+    (0x40, 0xff2ea16466c96a3843ec78b326b52861),
+    (0x80, 0xfe5dee046a99a2a811c461f1969c3053),
+    (0x100, 0xfcbe86c7900a88aedcffc83b479aa3a4),
+    (0x200, 0xf987a7253ac413176f2b074cf7815e54),
+    (0x400, 0xf3392b0822b70005940c7a398e4b70f3),
+    (0x800, 0xe7159475a2c29b7443b29c7fa6e889d9),
+    (0x1000, 0xd097f3bdfd2022b8845ad8f792aa5825),
+    (0x2000, 0xa9f746462d870fdf8a65dc1f90e061e5),
+    (0x4000, 0x70d869a156d2a1b890bb3df62baf32f7),
+    (0x8000, 0x31be135f97d08fd981231505542fcfa6),
+    (0x10000, 0x9aa508b5b7a84e1c677de54f3e99bc9),
+    (0x20000, 0x5d6af8dedb81196699c329225ee604),
+    (0x40000, 0x2216e584f5fa1ea926041bedfe98),
+    (0x80000, 0x48a170391f7dc42444e8fa2),
+)
+
+class V3StateIncomplete(Exception):
+    """The swap would reach ticks outside the cached bitmap words; use the Quoter instead."""
+
+def _mul_div_rounding_up(a: int, b: int, d: int) -> int:
+    return -(-(a * b) // d)
+
+def _div_rounding_up(a: int, b: int) -> int:
+    return -(-a // b)
+
+def get_sqrt_ratio_at_tick(tick: int) -> int:
+    """TickMath.getSqrtRatioAtTick."""
+    abs_tick = abs(tick)
+    if abs_tick > MAX_TICK:
+        raise ValueError("TickMath: T")
+    ratio = 0xfffcb933bd6fad37aa2d162d1a594001 if abs_tick & 0x1 else 1 << 128
+    for bit, factor in _TICK_RATIOS:
+        if abs_tick & bit:
+            ratio = (ratio * factor) >> 128
+    if tick > 0:
+        ratio = MAX_UINT256 // ratio
+    return (ratio >> 32) + (0 if ratio & 0xFFFFFFFF == 0 else 1)
+
+def get_tick_at_sqrt_ratio(sqrt_price_x96: int) -> int:
+    """TickMath.getTickAtSqrtRatio: greatest tick whose sqrt ratio is <= sqrt_price_x96."""
+    if not MIN_SQRT_RATIO <= sqrt_price_x96 < MAX_SQRT_RATIO:
+        raise ValueError("TickMath: R")
+    lo, hi = MIN_TICK, MAX_TICK
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if get_sqrt_ratio_at_tick(mid) <= sqrt_price_x96:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+def get_amount0_delta(sqrt_a: int, sqrt_b: int, liquidity: int, round_up: bool) -> int:
+    if sqrt_a > sqrt_b:
+        sqrt_a, sqrt_b = sqrt_b, sqrt_a
+    numerator1 = liquidity << 96
+    numerator2 = sqrt_b - sqrt_a
+    if round_up:
+        return _div_rounding_up(_mul_div_rounding_up(numerator1, numerator2, sqrt_b), sqrt_a)
+    return (numerator1 * numerator2 // sqrt_b) // sqrt_a
+
+def get_amount1_delta(sqrt_a: int, sqrt_b: int, liquidity: int, round_up: bool) -> int:
+    if sqrt_a > sqrt_b:
+        sqrt_a, sqrt_b = sqrt_b, sqrt_a
+    if round_up:
+        return _mul_div_rounding_up(liquidity, sqrt_b - sqrt_a, Q96)
+    return liquidity * (sqrt_b - sqrt_a) // Q96
+
+def get_next_sqrt_price_from_input(sqrt_price_x96: int, liquidity: int, amount_in: int, zero_for_one: bool) -> int:
+    """SqrtPriceMath.getNextSqrtPriceFromInput, including its uint256 overflow fallbacks."""
+    if amount_in == 0:
+        return sqrt_price_x96
+    if zero_for_one:
+        numerator1 = liquidity << 96
+        product = amount_in * sqrt_price_x96
+        if product <= MAX_UINT256 and numerator1 + product <= MAX_UINT256:
+            return _mul_div_rounding_up(numerator1, sqrt_price_x96, numerator1 + product)
+        return _div_rounding_up(numerator1, numerator1 // sqrt_price_x96 + amount_in)
+    return sqrt_price_x96 + (amount_in << 96) // liquidity
+
+def compute_swap_step(
+    sqrt_current: int, sqrt_target: int, liquidity: int, amount_remaining: int, fee_pips: int
+) -> Tuple[int, int, int, int]:
+    """SwapMath.computeSwapStep for exact input. Returns (sqrt_next, amount_in, amount_out, fee_amount)."""
+    zero_for_one = sqrt_current >= sqrt_target
+    remaining_less_fee = amount_remaining * (1_000_000 - fee_pips) // 1_000_000
+    if zero_for_one:
+        amount_in = get_amount0_delta(sqrt_target, sqrt_current, liquidity, True)
+    else:
+        amount_in = get_amount1_delta(sqrt_current, sqrt_target, liquidity, True)
+    if remaining_less_fee >= amount_in:
+        sqrt_next = sqrt_target
+    else:
+        sqrt_next = get_next_sqrt_price_from_input(sqrt_current, liquidity, remaining_less_fee, zero_for_one)
+
+    reached = sqrt_next == sqrt_target
+    if zero_for_one:
+        if not reached:
+            amount_in = get_amount0_delta(sqrt_next, sqrt_current, liquidity, True)
+        amount_out = get_amount1_delta(sqrt_next, sqrt_current, liquidity, False)
+    else:
+        if not reached:
+            amount_in = get_amount1_delta(sqrt_current, sqrt_next, liquidity, True)
+        amount_out = get_amount0_delta(sqrt_current, sqrt_next, liquidity, False)
+
+    if not reached:
+        fee_amount = amount_remaining - amount_in
+    else:
+        fee_amount = _mul_div_rounding_up(amount_in, fee_pips, 1_000_000 - fee_pips)
+    return sqrt_next, amount_in, amount_out, fee_amount
+
+def _msb(x: int) -> int:
+    return x.bit_length() - 1
+
+def _lsb(x: int) -> int:
+    return (x & -x).bit_length() - 1
+
+@dataclass
+class V3Pool:
+    """
+    Cached Uniswap V3 pool state, kept current by Swap/Mint/Burn events.
+
+    Holds sqrtPriceX96, in-range liquidity, current tick, the tick bitmap and per-tick
+    liquidityNet, which is everything UniswapV3Pool.swap reads to price an exact-input
+    swap. `bitmap_words` is the inclusive range of bitmap words that were loaded from
+    chain; None means the bitmap is complete (e.g. built from events or in tests).
+    """
+    address: str
+    token0: str
+    token1: str
+    fee: int
+    sqrt_price_x96: int = 0
+    liquidity: int = 0
+    tick: int = 0
+    tick_spacing: int = 0
+    # Per initialized tick: net liquidity change when crossing left-to-right, and gross
+    # liquidity referencing it (a tick stays initialized while gross > 0)
+    liquidity_net: Dict[int, int] = field(default_factory=dict)
+    liquidity_gross: Dict[int, int] = field(default_factory=dict)
+    tick_bitmap: Dict[int, int] = field(default_factory=dict)
+    bitmap_words: Optional[Tuple[int, int]] = None
+
+    def __post_init__(self):
+        if not self.tick_spacing:
+            self.tick_spacing = FEE_TICK_SPACING.get(self.fee, 1)
+        for t in self.liquidity_gross:
+            self._set_bit(t, True)
+
+    def _set_bit(self, tick: int, initialized: bool) -> None:
+        compressed = tick // self.tick_spacing
+        word, bit = compressed >> 8, compressed & 0xFF
+        value = self.tick_bitmap.get(word, 0)
+        value = value | (1 << bit) if initialized else value & ~(1 << bit)
+        if value:
+            self.tick_bitmap[word] = value
+        else:
+            self.tick_bitmap.pop(word, None)
+
+    def set_tick(self, tick: int, liquidity_gross: int, liquidity_net: int) -> None:
+        """Seeds one initialized tick (e.g. from pool.ticks(tick))."""
+        if liquidity_gross > 0:
+            self.liquidity_gross[tick] = liquidity_gross
+            self.liquidity_net[tick] = liquidity_net
+        else:
+            self.liquidity_gross.pop(tick, None)
+            self.liquidity_net.pop(tick, None)
+        self._set_bit(tick, liquidity_gross > 0)
+
+    def apply_swap(self, sqrt_price_x96: int, liquidity: int, tick: int) -> None:
+        self.sqrt_price_x96 = int(sqrt_price_x96)
+        self.liquidity = int(liquidity)
+        self.tick = int(tick)
+
+    def apply_liquidity(self, tick_lower: int, tick_upper: int, delta: int) -> None:
+        """Mint (delta > 0) or Burn (delta < 0) of a position over [tick_lower, tick_upper)."""
+        for t, net_delta in ((tick_lower, delta), (tick_upper, -delta)):
+            gross = self.liquidity_gross.get(t, 0) + delta
+            self.set_tick(t, gross, self.liquidity_net.get(t, 0) + net_delta if gross > 0 else 0)
+        if tick_lower <= self.tick < tick_upper:
+            self.liquidity += delta
+
+    def next_initialized_tick_within_one_word(self, tick: int, lte: bool) -> Tuple[int, bool]:
+        """TickBitmap.nextInitializedTickWithinOneWord."""
+        spacing = self.tick_spacing
+        compressed = tick // spacing
+        if lte:
+            word, bit = compressed >> 8, compressed & 0xFF
+            self._require_word(word)
+            masked = self.tick_bitmap.get(word, 0) & ((1 << bit) - 1 + (1 << bit))
+            if masked:
+                return (compressed - (bit - _msb(masked))) * spacing, True
+            return (compressed - bit) * spacing, False
+        word, bit = (compressed + 1) >> 8, (compressed + 1) & 0xFF
+        self._require_word(word)
+        masked = self.tick_bitmap.get(word, 0) & ~((1 << bit) - 1)
+        if masked:
+            return (compressed + 1 + (_lsb(masked) - bit)) * spacing, True
+        return (compressed + 1 + (255 - bit)) * spacing, False
+
+    def _require_word(self, word: int) -> None:
+        if self.bitmap_words is not None and not self.bitmap_words[0] <= word <= self.bitmap_words[1]:
+            raise V3StateIncomplete(f"bitmap word {word} of {self.address} is not cached")
+
+    def quote_exact_input(self, token_in: str, amount_in: int) -> int:
+        """
+        Output of UniswapV3Pool.swap for an exact input with no price limit (what
+        SwapRouter.exactInputSingle / QuoterV2 return for sqrtPriceLimitX96 = 0).
+        """
+        zero_for_one = token_in.lower() == self.token0.lower()
+        if not zero_for_one and token_in.lower() != self.token1.lower():
+            raise ValueError(f"Token {token_in} is not in pool {self.address}")
+        if amount_in <= 0:
+            raise ValueError("UniswapV3: AS")
+        limit = MIN_SQRT_RATIO + 1 if zero_for_one else MAX_SQRT_RATIO - 1
+
+        remaining = int(amount_in)
+        amount_out = 0
+        sqrt_price = self.sqrt_price_x96
+        tick = self.tick
+        liquidity = self.liquidity
+        while remaining != 0 and sqrt_price != limit:
+            start = sqrt_price
+            tick_next, initialized = self.next_initialized_tick_within_one_word(tick, zero_for_one)
+            tick_next = max(MIN_TICK, min(MAX_TICK, tick_next))
+            sqrt_next_tick = get_sqrt_ratio_at_tick(tick_next)
+            if zero_for_one:
+                target = limit if sqrt_next_tick < limit else sqrt_next_tick
+            else:
+                target = limit if sqrt_next_tick > limit else sqrt_next_tick
+            sqrt_price, step_in, step_out, fee_amount = compute_swap_step(
+                sqrt_price, target, liquidity, remaining, self.fee
+            )
+            remaining -= step_in + fee_amount
+            amount_out += step_out
+            if sqrt_price == sqrt_next_tick:
+                if initialized:
+                    net = self.liquidity_net.get(tick_next, 0)
+                    liquidity += -net if zero_for_one else net
+                tick = tick_next - 1 if zero_for_one else tick_next
+            elif sqrt_price != start:
+                tick = get_tick_at_sqrt_ratio(sqrt_price)
+        return amount_out
+
+def load_v3_pool(
+    w3: Web3,
+    address: str,
+    word_radius: int = 2,
+    block_identifier: BlockIdentifier = "latest",
+    multicall_address: str = MULTICALL3_ADDRESS,
+) -> V3Pool:
+    """
+    Reads slot0/liquidity/config, the bitmap words within word_radius of the current tick
+    and every initialized tick in them, in two Multicall3 requests pinned to one block.
+    """
+    batch = MulticallBatch(w3, address=multicall_address)
+    i_slot0 = batch.add(address, "slot0()", output_types=["uint160", "int24", "uint16", "uint16", "uint16", "uint8", "bool"], allow_failure=False)
+    i_liq = batch.add(address, "liquidity()", output_types=["uint128"], allow_failure=False)
+    i_fee = batch.add(address, "fee()", output_types=["uint24"], allow_failure=False)
+    i_spacing = batch.add(address, "tickSpacing()", output_types=["int24"], allow_failure=False)
+    i_t0 = batch.add(address, "token0()", output_types=["address"], allow_failure=False)
+    i_t1 = batch.add(address, "token1()", output_types=["address"], allow_failure=False)
+    head = batch.execute(block_identifier)
+
+    sqrt_price, tick = head[i_slot0].value[0], head[i_slot0].value[1]
+    spacing = head[i_spacing].value[0]
+    pool = V3Pool(
+        address=Web3.to_checksum_address(address),
+        token0=head[i_t0].value[0],
+        token1=head[i_t1].value[0],
+        fee=head[i_fee].value[0],
+        sqrt_price_x96=sqrt_price,
+        liquidity=head[i_liq].value[0],
+        tick=tick,
+        tick_spacing=spacing,
+    )
+    center = (tick // spacing) >> 8
+    words = list(range(center - word_radius, center + word_radius + 1))
+    pool.bitmap_words = (words[0], words[-1])
+
+    batch = MulticallBatch(w3, address=multicall_address)
+    for word in words:
+        batch.add(address, "tickBitmap(int16)", ["int16"], [word], ["uint256"], allow_failure=False)
+    bitmaps = batch.execute(head.block_number)
+    ticks: List[int] = []
+    for word, r in zip(words, bitmaps.results):
+        value = r.value[0]
+        while value:
+            bit = _lsb(value)
+            ticks.append(((word << 8) + bit) * spacing)
+            value &= value - 1
+    if ticks:
+        batch = MulticallBatch(w3, address=multicall_address)
+        for t in ticks:
+            batch.add(
+                address, "ticks(int24)", ["int24"], [t],
+                ["uint128", "int128", "uint256", "uint256", "int56", "uint160", "uint32", "bool"],
+                allow_failure=False,
+            )
+        for t, r in zip(ticks, batch.execute(head.block_number).results):
+            pool.set_tick(t, r.value[0], r.value[1])
+    return pool
+
 def quote_v3_exact_input_single(
-    w3: Web3, quoter: str, token_in: str, token_out: str, fee: int, amount_in: int
+    w3: Web3, quoter: str, token_in: str, token_out: str, fee: int, amount_in: int,
+    block_identifier: BlockIdentifier = "latest",
 ) -> int:
     c = v3_quoter(w3, quoter)
     return c.functions.quoteExactInputSingle(
@@ -17,7 +341,46 @@ def quote_v3_exact_input_single(
         fee,
         amount_in,
         0
-    ).call()
+    ).call(block_identifier=block_identifier)
+
+async def quote_v3_exact_input_single_async(
+    w3: AsyncWeb3, quoter: str, token_in: str, token_out: str, fee: int, amount_in: int,
+    block_identifier: BlockIdentifier = "latest",
+) -> int:
+    c = v3_quoter(w3, quoter)
+    return await c.functions.quoteExactInputSingle(
+        Web3.to_checksum_address(token_in),
+        Web3.to_checksum_address(token_out),
+        fee,
+        amount_in,
+        0
+    ).call(block_identifier=block_identifier)
+
+def _quoter_key(quoter: str, token_in: str, token_out: str, fee: int, amount_in: int) -> tuple:
+    return ("quoteExactInputSingle", quoter.lower(), token_in.lower(), token_out.lower(), int(fee), int(amount_in))
+
+def quote_v3_exact_input_single_local(
+    w3: Web3,
+    quoter: str,
+    token_in: str,
+    token_out: str,
+    fee: int,
+    amount_in: int,
+    pool: Optional[V3Pool] = None,
+    read_cache: Optional[BlockReadCache] = None,
+) -> int:
+    """Prices from the cached pool when possible; the (block-cached) Quoter eth_call is the fallback."""
+    if pool is not None:
+        try:
+            return pool.quote_exact_input(token_in, amount_in)
+        except V3StateIncomplete:
+            pass
+    if read_cache is None:
+        return quote_v3_exact_input_single(w3, quoter, token_in, token_out, fee, amount_in)
+    return read_cache.get(
+        _quoter_key(quoter, token_in, token_out, fee, amount_in),
+        lambda block: quote_v3_exact_input_single(w3, quoter, token_in, token_out, fee, amount_in, block),
+    )
 
 def encode_v3_exact_input_single(
     w3: Web3,
@@ -31,16 +394,30 @@ def encode_v3_exact_input_single(
     amount_out_min: int,
     sqrt_price_limit_x96: int = 0
 ) -> bytes:
-    c = v3_swap_router(w3, router)
-    params = (
-        Web3.to_checksum_address(token_in),
-        Web3.to_checksum_address(token_out),
-        int(fee),
-        Web3.to_checksum_address(recipient),
-        int(deadline),
-        int(amount_in),
-        int(amount_out_min),
+    # Precompiled encoder; w3 is unused but kept for call-site compatibility
+    return v3_exact_input_single_encoder(router).encode(
+        token_in, token_out, int(fee), recipient, int(deadline), int(amount_in), int(amount_out_min),
         int(sqrt_price_limit_x96),
     )
-    # exactInputSingle((address,address,uint24,address,uint256,uint256,uint256,uint160))
-    return c.encode_abi(fn_name="exactInputSingle", args=[params])
+
+async def quote_v3_exact_input_single_local_async(
+    w3: AsyncWeb3,
+    quoter: str,
+    token_in: str,
+    token_out: str,
+    fee: int,
+    amount_in: int,
+    pool: Optional[V3Pool] = None,
+    read_cache: Optional[BlockReadCache] = None,
+) -> int:
+    if pool is not None:
+        try:
+            return pool.quote_exact_input(token_in, amount_in)
+        except V3StateIncomplete:
+            pass
+    if read_cache is None:
+        return await quote_v3_exact_input_single_async(w3, quoter, token_in, token_out, fee, amount_in)
+    return await read_cache.get_async(
+        _quoter_key(quoter, token_in, token_out, fee, amount_in),
+        lambda block: quote_v3_exact_input_single_async(w3, quoter, token_in, token_out, fee, amount_in, block),
+    )
@@ -1,8 +1,17 @@
 import asyncio
+from typing import Any, Dict, Set
 from agent.config import Settings
-from agent.utils.logger import get_logger
-from agent.utils.web3_client import build_web3
+from agent.utils.gas_estimator import GasOracle
+from agent.utils.logger import configure_logging, get_logger
+from agent.utils.metrics import start_metrics_server
+from agent.utils.tracing import configure_tracing, resume
+from agent.utils.web3_client import build_async_web3, build_web3
+from agent.defi.pool_mirror import PoolStateMirror
+from agent.defi.read_cache import BlockReadCache
+from agent.defi.uniswap_v2 import V2QuoteEngine
+from agent.defi.uniswap_v3 import load_v3_pool
 from agent.strategies.scanner import OpportunityScanner
+from agent.strategies.cycle_finder import CycleFinder, TokenGraph
 from agent.strategies.arbitrator import Arbitrator
 from agent.ai.client import AIClient
 from agent.core.executor import TransactionExecutor
@@ -10,24 +19,91 @@ from agent.core.state import AgentState
 
 log = get_logger(__name__)
 
+def load_watched_pairs(w3, settings: Settings, engine: V2QuoteEngine) -> None:
+    routers = [settings.UNISWAP_V2_ROUTER, settings.SUSHISWAP_V2_ROUTER]
+    for spec in filter(None, (s.strip() for s in settings.WATCH_V2_PAIRS.split(","))):
+        token_a, token_b = spec.split(":")
+        for router in routers:
+            pair = engine.load_pair(w3, router, token_a, token_b)
+            log.info("mirror.pair", router=router, pair=pair.address if pair else None)
+
+def load_watched_v3_pools(w3, settings: Settings, mirror: PoolStateMirror) -> None:
+    # Read at the block the V2 reserves were aligned to, so the mirror starts from one state
+    block = mirror.last_block if mirror.last_block >= 0 else "latest"
+    for address in filter(None, (s.strip() for s in settings.WATCH_V3_POOLS.split(","))):
+        pool = load_v3_pool(w3, address, block_identifier=block, multicall_address=settings.MULTICALL3_ADDRESS)
+        mirror.track_v3_pool(pool)
+        log.info("mirror.v3_pool", pool=pool.address, fee=pool.fee, tick=pool.tick)
+
+async def _evaluate(arbitrator: Arbitrator, opp: Dict[str, Any], slots: asyncio.Semaphore) -> None:
+    try:
+        with resume(opp.get("trace_id")):
+            await arbitrator.evaluate_and_maybe_execute(opp)
+    except Exception as e:
+        log.exception("agent.error", opportunity_id=opp.get("opportunity_id"), msg=str(e))
+    finally:
+        slots.release()
+
 async def main():
     settings = Settings()
+    configure_logging(level=settings.LOG_LEVEL, sample=settings.LOG_SAMPLE, per_second=settings.LOG_RATE_LIMIT)
     log.info("agent.start", version="0.1.0", chain_id=settings.CHAIN_ID, dry_run=settings.DRY_RUN)
 
+    if settings.METRICS_PORT is not None:
+        await start_metrics_server(settings.METRICS_BIND, settings.METRICS_PORT)
+        log.info("metrics.serving", bind=settings.METRICS_BIND, port=settings.METRICS_PORT)
+
     w3 = build_web3(settings)
     state = AgentState(w3=w3, settings=settings)
 
     ai_client = AIClient(settings=settings)
-    executor = TransactionExecutor(w3=w3, settings=settings, state=state)
+    aw3 = build_async_web3(settings)
+    # Per-head fee view; the evaluation path reads it from memory
+    gas_oracle = GasOracle(
+        priority_gwei=settings.GAS_PRIORITY_GWEI,
+        priority_percentile=settings.GAS_PRIORITY_PERCENTILE,
+        window=settings.GAS_ORACLE_WINDOW_BLOCKS,
+    )
+    # Spans are stamped with the head the gas oracle last saw
+    configure_tracing(
+        settings.TRACE_FILE, settings.TRACE_SAMPLE_RATE, settings.TRACE_MAX_BYTES, settings.TRACE_BACKUPS,
+        head=lambda: gas_oracle.block_number,
+    )
+    executor = TransactionExecutor(w3=w3, settings=settings, state=state, aw3=aw3, gas_oracle=gas_oracle)
+    # Nonce bookkeeping follows the head the oracle sees
+    gas_task = asyncio.create_task(
+        gas_oracle.run(aw3, settings.LOG_POLL_INTERVAL_SECONDS, on_head=executor.on_head)
+    )
+
+    # Shared reserve cache: kept current by the mirror, read by simulator and plan builder
+    read_cache = BlockReadCache()
+    quote_engine = V2QuoteEngine(
+        default_fee_bps=settings.V2_FEE_BPS,
+        cross_check=settings.V2_QUOTE_CROSS_CHECK,
+        read_cache=read_cache,
+    )
+    load_watched_pairs(w3, settings, quote_engine)
+    mirror = PoolStateMirror(w3=w3, settings=settings, v2=quote_engine, poll_interval=settings.LOG_POLL_INTERVAL_SECONDS)
+    if quote_engine.pairs():
+        # Align all reserves to one block so the mirror continues from there
+        mirror.last_block = quote_engine.refresh_reserves(w3, "latest", settings.MULTICALL3_ADDRESS)
+    load_watched_v3_pools(w3, settings, mirror)
 
-    scanner = OpportunityScanner(w3=w3, settings=settings)
-    arbitrator = Arbitrator(w3=w3, settings=settings, ai_client=ai_client, executor=executor)
+    cycle_finder = CycleFinder(TokenGraph.from_pools(quote_engine, mirror.v3.values()))
 
+    scanner = OpportunityScanner(
+        w3=w3, settings=settings, mirror=mirror, cycle_finder=cycle_finder, read_cache=read_cache
+    )
+    arbitrator = Arbitrator(w3=w3, settings=settings, ai_client=ai_client, executor=executor, quote_engine=quote_engine, aw3=aw3)
+
+    # Bounded fan-out: the scanner blocks once MAX_CONCURRENT_EVALUATIONS are in flight
+    slots = asyncio.Semaphore(settings.MAX_CONCURRENT_EVALUATIONS)
+    tasks: Set[asyncio.Task] = set()
     async for opp in scanner.scan_loop():
-        try:
-            await arbitrator.evaluate_and_maybe_execute(opp)
-        except Exception as e:
-            log.exception("agent.error", msg=str(e))
+        await slots.acquire()
+        task = asyncio.create_task(_evaluate(arbitrator, opp, slots))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
 
 if __name__ == "__main__":
     try:
@@ -1,19 +1,27 @@
-from typing import Dict, Any, Optional, Tuple
-from web3 import Web3
+import asyncio
+import time
+from typing import Awaitable, Dict, Any, List, Optional, Tuple, TypeVar
+from web3 import AsyncWeb3, Web3
 from agent.config import Settings
 from agent.ai.client import AIClient
-from agent.ai.parser import ArbAnalysis
-from agent.core.transaction_builder import build_transaction
+from agent.ai.parser import ArbAnalysis, ArbPath, ExecutionDecision
+from agent.core.calldata import ExecuteFlashLoanEncoder
 from agent.core.executor import TransactionExecutor
+from agent.defi.uniswap_v2 import V2QuoteEngine
 from agent.utils.logger import get_logger
-from agent.strategies.plan_builder import build_uniswap_v2_cycle_plan
-from agent.strategies.simulator import simulate_v2_cycle
-
-import json
-import os
+from agent.utils.metrics import EVALUATION_SECONDS, OPPORTUNITIES
+from agent.utils.tracing import annotate, stage
+from agent.utils.web3_client import build_async_web3
+from agent.strategies.plan_builder import build_uniswap_v2_cycle_plan_async
+from agent.strategies.gates import (
+    Candidate, Gate, build_path_gates, build_simulation_gates, first_rejection, select_v2_cycle,
+)
+from agent.strategies.simulator import QuoteResult, simulate_v2_cycle_async, size_v2_cycle
 
 log = get_logger(__name__)
 
+T = TypeVar("T")
+
 DEX_NAME_MAP = {
     "uniswapv2": "uniswapv2",
     "uniswap v2": "uniswapv2",
@@ -22,24 +30,48 @@ DEX_NAME_MAP = {
     "sushi": "sushiswap",
 }
 
+async def _timed(name: str, aw: Awaitable[T]) -> T:
+    with stage(name):
+        return await aw
+
 class Arbitrator:
-    def __init__(self, w3: Web3, settings: Settings, ai_client: AIClient, executor: TransactionExecutor):
+    def __init__(
+        self,
+        w3: Web3,
+        settings: Settings,
+        ai_client: AIClient,
+        executor: TransactionExecutor,
+        quote_engine: Optional[V2QuoteEngine] = None,
+        aw3: Optional[AsyncWeb3] = None,
+    ):
         self.w3 = w3
+        # All hot-path RPCs go through the async client so evaluations can overlap
+        self.aw3 = aw3 or executor.aw3 or build_async_web3(settings)
+        if executor.aw3 is None:
+            executor.aw3 = self.aw3
         self.settings = settings
         self.ai = ai_client
         self.executor = executor
-        self._executor_contract = self._load_executor_contract()
+        # Cached V2 reserves; hops without cached reserves are quoted via the router
+        self.quote_engine = quote_engine or V2QuoteEngine(
+            default_fee_bps=settings.V2_FEE_BPS,
+            cross_check=settings.V2_QUOTE_CROSS_CHECK,
+        )
+        self._executor_encoder = self._load_executor_encoder()
+        self._path_gates = build_path_gates(settings, self.quote_engine)
+        self._sim_gates = build_simulation_gates(settings)
 
-    def _load_executor_contract(self):
+    def _load_executor_encoder(self) -> ExecuteFlashLoanEncoder:
         if not self.settings.EXECUTOR_ADDRESS:
             raise ValueError("EXECUTOR_ADDRESS is not configured in Settings")
-        abi_path = os.path.join("abis", "AIFlashLoanExecutor.json")
-        if not os.path.exists(abi_path):
-            raise FileNotFoundError("Missing abis/AIFlashLoanExecutor.json. Run forge build + scripts/export_abis.sh")
-        with open(abi_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            abi = data["abi"] if "abi" in data else data
-        return self.w3.eth.contract(address=Web3.to_checksum_address(self.settings.EXECUTOR_ADDRESS), abi=abi)
+        # Address is checksum-validated here once; executeFlashLoan is encoded without web3 per call
+        return ExecuteFlashLoanEncoder(self.settings.EXECUTOR_ADDRESS)
+
+    def _reject(self, gates: List[Gate], candidate: Candidate) -> bool:
+        reason = first_rejection(gates, candidate)
+        if reason is not None:
+            log.info("arb.gate_rejected", opportunity_id=candidate.opportunity_id, reason=reason)
+        return reason is not None
 
     def _normalize_dex_name(self, name: str) -> Optional[str]:
         key = (name or "").strip().lower()
@@ -87,43 +119,137 @@ class Arbitrator:
             return (a0, a1, r_a, r_b)
         return None
 
+    def _select_graph_cycle(self, opp: Dict[str, Any]) -> Optional[Tuple[str, str, str, str]]:
+        """
+        Returns (token_in, mid_token, router_a, router_b) from the scanner's deterministic
+        cycles: the most profitable 2-hop cycle whose legs are both V2 pairs on known routers.
+        """
+        return select_v2_cycle(opp.get("cycles") or [], (self.settings.UNISWAP_V2_ROUTER, self.settings.SUSHISWAP_V2_ROUTER))
+
+    def _analysis_for(self, candidate: Candidate) -> ArbAnalysis:
+        """Deterministic stand-in for the analysis stage when the graph search supplied the path."""
+        c = candidate
+        return ArbAnalysis(
+            opportunity_id=c.opportunity_id,
+            paths=[ArbPath(
+                dex_sequence=[c.router_a, c.router_b],
+                assets=[c.token_in, c.mid_token, c.token_in],
+                amounts=[str(c.amount_in)],
+            )],
+            confidence=1.0,
+        )
+
+    def _ai_payload(self, analysis: ArbAnalysis, sim: QuoteResult) -> Dict[str, Any]:
+        payload = analysis.model_dump()
+        payload["simulation"] = {
+            "amounts": [str(a) for a in sim.amounts],
+            "premium": str(sim.premium),
+            "gas_cost_wei": str(sim.gas_cost_wei),
+            "expected_net_profit": str(sim.expected_net_profit),
+        }
+        return payload
+
+    async def _ai_decide(self, opp_id: str, payload: Dict[str, Any]) -> Optional[ExecutionDecision]:
+        """Runs the risk/decision stages per AI_DECISION_MODE; None means the model declined."""
+        mode = self.settings.AI_DECISION_MODE.lower()
+        if mode == "combined":
+            decision = await _timed("risk_decision", self.ai.assess_and_decide_async(payload))
+            log.info("ai.risk_decision", opportunity_id=opp_id, score=decision.risk_score,
+                     recommendation=decision.recommendation, execute=decision.execute, reason=decision.reason)
+            return decision if decision.execute and decision.recommendation != "skip" else None
+
+        if mode == "concurrent":
+            # Decision does not see the risk output, so a "skip" recommendation vetoes it
+            risk, decision = await asyncio.gather(
+                _timed("risk", self.ai.assess_risk_async(payload)),
+                _timed("decision", self.ai.decide_execution_async(payload)),
+            )
+            log.info("ai.risk", opportunity_id=opp_id, score=risk.risk_score, recommendation=risk.recommendation)
+        else:
+            risk = await _timed("risk", self.ai.assess_risk_async(payload))
+            log.info("ai.risk", opportunity_id=opp_id, score=risk.risk_score, recommendation=risk.recommendation)
+            # A skip (possibly decided mid-stream) makes the decision call pointless
+            if risk.recommendation == "skip":
+                return None
+            decision = await _timed("decision", self.ai.decide_execution_async(risk.model_dump()))
+        log.info("ai.decision", opportunity_id=opp_id, execute=decision.execute, reason=decision.reason)
+        if not decision.execute or risk.recommendation == "skip":
+            return None
+        return decision
+
     async def evaluate_and_maybe_execute(self, opp: Dict[str, Any]) -> None:
+        start, outcome = time.perf_counter(), "error"
+        try:
+            outcome = await self._evaluate(opp)
+        finally:
+            annotate(outcome=outcome)
+            OPPORTUNITIES.inc(outcome=outcome)
+            EVALUATION_SECONDS.observe(time.perf_counter() - start, outcome=outcome)
+
+    async def _evaluate(self, opp: Dict[str, Any]) -> str:
+        """One opportunity through the pipeline; returns the outcome label for metrics."""
         opp_id = opp.get("opportunity_id", "unknown")
         snapshot = opp.get("snapshot", opp)
 
-        analysis = self.ai.analyze_arbitrage(snapshot)
-        log.info("ai.analysis", opportunity_id=analysis.opportunity_id, confidence=analysis.confidence)
-
-        # Attempt to find a Uniswap V2 two-hop cycle plan candidate from the analysis
-        candidate = self._select_v2_cycle(analysis)
-        if not candidate:
+        # Prefer cycles found by the scanner's graph search; ask the AI for paths only without one
+        analysis: Optional[ArbAnalysis] = None
+        path = self._select_graph_cycle(opp)
+        if path is None and self.settings.AI_PATH_DISCOVERY:
+            analysis = await _timed("ai_analysis", self.ai.analyze_arbitrage_async(snapshot))
+            log.info("ai.analysis", opportunity_id=analysis.opportunity_id, confidence=analysis.confidence)
+            path = self._select_v2_cycle(analysis)
+        if not path:
             log.info("arb.no_supported_path", opportunity_id=opp_id)
-            return
+            return "no_path"
 
-        token_in, mid_token, router_a, router_b = candidate
+        token_in, mid_token, router_a, router_b = path
+        candidate = Candidate(opp_id, token_in, mid_token, router_a, router_b)
+        with stage("gates"):
+            rejected = self._reject(self._path_gates, candidate)
+        if rejected:
+            return "gate_rejected"
 
-        # Amount: prefer AI suggested amounts[0] if looks like int, else fallback to settings
+        # Amount: size optimally from cached reserves when both pairs are mirrored;
+        # otherwise prefer AI suggested amounts[0] if looks like int, else fallback to settings
         amount_in = None
-        try:
-            if analysis.paths and analysis.paths[0].amounts:
-                # Accept string/integer; assume wei
-                amount_in = int(analysis.paths[0].amounts[0])
-        except Exception:
-            amount_in = None
+        with stage("sizing"):
+            sizing = size_v2_cycle(
+                self.quote_engine,
+                self.settings,
+                router_a=router_a,
+                router_b=router_b,
+                token_in=token_in,
+                mid_token=mid_token,
+                max_amount_in=self.settings.MAX_FLASHLOAN_AMOUNT_WEI,
+            )
+        if sizing is not None:
+            amount_in = sizing.amount_in
+            log.info("arb.sizing", opportunity_id=opp_id, amount_in=sizing.amount_in, profit=sizing.profit)
+        elif analysis is not None:
+            try:
+                if analysis.paths and analysis.paths[0].amounts:
+                    # Accept string/integer; assume wei
+                    amount_in = int(analysis.paths[0].amounts[0])
+            except Exception:
+                amount_in = None
         if not amount_in or amount_in <= 0:
             amount_in = int(self.settings.DEFAULT_FLASHLOAN_AMOUNT_WEI)
+        candidate.amount_in = amount_in
 
         # Simulate the cycle using quotes to ensure expected net profitability
-        sim = simulate_v2_cycle(
-            w3=self.w3,
+        sim = await _timed("simulation", simulate_v2_cycle_async(
+            w3=self.aw3,
             settings=self.settings,
             router_a=router_a,
             router_b=router_b,
             token_in=token_in,
             mid_token=mid_token,
             amount_in=amount_in,
-            gas_limit_hint=1_000_000,
-        )
+            gas_limit_hint=candidate.gas_limit,
+            quote_engine=self.quote_engine,
+            gas_oracle=self.executor.gas_oracle,
+        ))
+        candidate.sim = sim
         log.info(
             "arb.simulation",
             opportunity_id=opp_id,
@@ -133,22 +259,21 @@ class Arbitrator:
             expected_profit=sim.expected_profit,
             expected_net_profit=sim.expected_net_profit,
         )
+        # Net profit is the hard backstop; it runs here so unprofitable cycles never reach the AI
+        with stage("gates"):
+            rejected = self._reject(self._sim_gates, candidate)
+        if rejected:
+            return "gate_rejected"
 
-        # Ask AI for risk and decision after we have a concrete plan sketch
-        risk = self.ai.assess_risk(analysis.model_dump())
-        log.info("ai.risk", opportunity_id=risk.opportunity_id, score=risk.risk_score, recommendation=risk.recommendation)
-
-        decision = self.ai.decide_execution(risk.model_dump())
-        log.info("ai.decision", opportunity_id=decision.opportunity_id, execute=decision.execute, reason=decision.reason)
-
-        # Hard backstop: require positive expected net profit from deterministic sim
-        if not decision.execute or sim.expected_net_profit <= 0:
-            log.info("arb.skip", opportunity_id=opp_id, reason="unprofitable_or_ai_declined")
-            return
+        # Only survivors of the deterministic gates are shown to the model
+        decision = await self._ai_decide(opp_id, self._ai_payload(analysis or self._analysis_for(candidate), sim))
+        if decision is None:
+            log.info("arb.skip", opportunity_id=opp_id, reason="ai_declined")
+            return "ai_declined"
 
         # Build the on-chain plan params with minOut backstops
-        params, info = build_uniswap_v2_cycle_plan(
-            w3=self.w3,
+        params, info = await _timed("plan_build", build_uniswap_v2_cycle_plan_async(
+            w3=self.aw3,
             settings=self.settings,
             executor_address=self.settings.EXECUTOR_ADDRESS,
             token_in=token_in,
@@ -156,27 +281,23 @@ class Arbitrator:
             router_a=router_a,
             router_b=router_b,
             amount_in=amount_in,
-        )
+            quote_engine=self.quote_engine,
+            # Reuse the simulated quotes: no second round of quoting, minOuts match the sim
+            quote_result=sim,
+        ))
         log.info("arb.plan", opportunity_id=opp_id, info=info)
 
         # Encode function call to executor
-        data = self._executor_contract.encode_abi(
-            fn_name="executeFlashLoan",
-            args=[Web3.to_checksum_address(token_in), int(amount_in), bytes(params)],
-        )
+        with stage("encode"):
+            data = self._executor_encoder.encode(token_in, int(amount_in), params)
 
         # Build and submit transaction
         tx_template = {
-            "to": Web3.to_checksum_address(self.settings.EXECUTOR_ADDRESS),
+            "to": self._executor_encoder.executor,
             "data": data,
             "value": 0,
             "gas": 1_000_000,
         }
-        tx = build_transaction(
-            w3=self.executor.w3,
-            settings=self.settings,
-            tx=tx_template,
-            max_gas_gwei=decision.max_gas_gwei,
-        )
-        tx_hash = self.executor.sign_and_send(tx)
+        tx_hash = await self.executor.submit_async(tx_template, max_gas_gwei=decision.max_gas_gwei)
         log.info("arb.executed", opportunity_id=opp_id, tx_hash=tx_hash)
+        return "executed"
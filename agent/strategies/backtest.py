@@ -0,0 +1,394 @@
+"""
+Offline backtest over a recorded stream of pool events (Sync / V3 Swap logs).
+
+    python -m agent.strategies.backtest run events.jsonl.gz --pools pools.json [--workers 4] \\
+        [--from 19000000 --to 19007200] [--base-fee-gwei 20] [--set AAVE_PREMIUM_BPS=9] \\
+        [--sweep DEFAULT_SLIPPAGE_BPS=10,30,50] [--out opportunities.jsonl]
+    python -m agent.strategies.backtest convert events.jsonl events.bin
+
+Events are eth_getLogs entries in block order, one per line (.jsonl, or .jsonl.gz), or the
+compact binary form written by `convert`. They are streamed block by block through the
+same mirror, cycle search, sizing, simulation and gates the agent runs; nothing is read
+from a node. The pools file lists the pairs to mirror (same layout as the benchmark
+fixture: "tokens", "routers", "pairs" with optional starting reserves) and, optionally,
+"v3_pools" with their starting slot0/liquidity and per-tick liquidityNet. V3 state feeds
+the cycle search as in the agent; only V2 cycles are sized and traded. Logs from pools
+the file does not list are counted as skipped.
+
+Block ranges run in parallel worker processes. Each worker replays the events before its
+range without searching, so its pool state (and results) match a sequential run.
+"""
+import argparse
+import gzip
+import json
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from hexbytes import HexBytes
+from web3 import Web3
+from agent.config import Settings
+from agent.defi.pool_mirror import PoolStateMirror
+from agent.defi.uniswap_v2 import V2Pair, V2QuoteEngine
+from agent.defi.uniswap_v3 import V3Pool
+from agent.strategies.cycle_finder import CycleFinder, TokenGraph
+from agent.strategies.gates import Candidate, build_path_gates, build_simulation_gates, first_rejection, select_v2_cycle
+from agent.strategies.simulator import simulate_v2_cycle, size_v2_cycle
+from agent.utils.gas_estimator import GasOracle
+
+# Binary event file: magic, then per log <block u64, logIndex u32, topic count u8, address>,
+# the topics (32 bytes each), <data length u32> and the data
+MAGIC = b"FLEV\x01"
+_HEAD = struct.Struct("<QIB20s")
+_LEN = struct.Struct("<I")
+
+def _int(value: Any) -> int:
+    return int(value, 16) if isinstance(value, str) else int(value)
+
+def _read_binary(f: BinaryIO) -> Iterator[Dict[str, Any]]:
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ValueError("not a backtest event file")
+    while True:
+        head = f.read(_HEAD.size)
+        if not head:
+            return
+        block, log_index, n_topics, address = _HEAD.unpack(head)
+        topics = [f.read(32) for _ in range(n_topics)]
+        (size,) = _LEN.unpack(f.read(_LEN.size))
+        yield {"address": "0x" + address.hex(), "topics": topics, "data": f.read(size),
+               "blockNumber": block, "logIndex": log_index}
+
+def read_events(path: str) -> Iterator[Dict[str, Any]]:
+    """Streams logs from a .jsonl / .jsonl.gz / binary event file, one at a time."""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rb") as f:
+        if f.peek(len(MAGIC))[:len(MAGIC)] == MAGIC:
+            yield from _read_binary(f)
+            return
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                entry["blockNumber"] = _int(entry["blockNumber"])
+                entry["logIndex"] = _int(entry.get("logIndex", 0))
+                yield entry
+
+def write_events(path: str, logs: Iterable[Dict[str, Any]]) -> int:
+    """Writes logs in the binary format; returns how many were written."""
+    count = 0
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "wb") as f:
+        f.write(MAGIC)
+        for entry in logs:
+            topics = [bytes(HexBytes(t)) for t in entry.get("topics", [])]
+            data = bytes(HexBytes(entry.get("data", b"")))
+            f.write(_HEAD.pack(_int(entry["blockNumber"]), _int(entry.get("logIndex", 0)), len(topics),
+                               bytes(HexBytes(entry["address"]))))
+            f.write(b"".join(topics))
+            f.write(_LEN.pack(len(data)))
+            f.write(data)
+            count += 1
+    return count
+
+def blocks(logs: Iterable[Dict[str, Any]]) -> Iterator[Tuple[int, List[Dict[str, Any]]]]:
+    """Groups a block-ordered log stream into (block, logs) without reading ahead more than one block."""
+    current: Optional[int] = None
+    batch: List[Dict[str, Any]] = []
+    for entry in logs:
+        n = entry["blockNumber"]
+        if n != current and batch:
+            yield current, batch
+            batch = []
+        current = n
+        batch.append(entry)
+    if batch:
+        yield current, batch
+
+def load_pools(path: str) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def build_engine(pools: Dict[str, Any], settings: Settings) -> Tuple[V2QuoteEngine, List[str]]:
+    """Quote engine holding the pools file's pairs, and the routers they belong to."""
+    tokens, routers = pools.get("tokens", {}), pools.get("routers", {})
+    engine = V2QuoteEngine(default_fee_bps=settings.V2_FEE_BPS)
+    for p in pools["pairs"]:
+        router = Web3.to_checksum_address(routers.get(p["router"], p["router"]))
+        engine.upsert_pair(router, V2Pair(
+            Web3.to_checksum_address(p["address"]),
+            Web3.to_checksum_address(tokens.get(p["token0"], p["token0"])),
+            Web3.to_checksum_address(tokens.get(p["token1"], p["token1"])),
+            int(p.get("reserve0", 0)), int(p.get("reserve1", 0)),
+            int(p.get("fee_bps", settings.V2_FEE_BPS)),
+        ))
+    return engine, sorted({router for router, _ in engine.pairs_by_router()})
+
+def build_v3_pools(pools: Dict[str, Any]) -> List[V3Pool]:
+    """The pools file's V3 pools. Ticks map to liquidityNet; gross is taken as |net|."""
+    tokens = pools.get("tokens", {})
+    out: List[V3Pool] = []
+    for p in pools.get("v3_pools", []):
+        net = {int(t): int(n) for t, n in p.get("ticks", {}).items()}
+        out.append(V3Pool(
+            address=Web3.to_checksum_address(p["address"]),
+            token0=Web3.to_checksum_address(tokens.get(p["token0"], p["token0"])),
+            token1=Web3.to_checksum_address(tokens.get(p["token1"], p["token1"])),
+            fee=int(p["fee"]),
+            sqrt_price_x96=int(p.get("sqrt_price_x96", 0)),
+            liquidity=int(p.get("liquidity", 0)),
+            tick=int(p.get("tick", 0)),
+            tick_spacing=int(p.get("tick_spacing", 0)),
+            liquidity_net=net,
+            liquidity_gross={t: abs(n) for t, n in net.items()},
+        ))
+    return out
+
+@dataclass
+class BacktestReport:
+    start: Optional[int] = None
+    end: Optional[int] = None
+    blocks: int = 0
+    events: int = 0
+    # Logs from pools the pools file does not list (not applied)
+    skipped: int = 0
+    # Blocks where the search found a profitable cycle / one the agent could trade / that passed the gates
+    with_cycles: int = 0
+    candidates: int = 0
+    accepted: int = 0
+    # Expected net profit per token_in (smallest units: cycles start from different tokens)
+    profit: Dict[str, int] = field(default_factory=dict)
+    # The same if the cycle only returns its DEFAULT_SLIPPAGE_BPS minOut (the contract's floor)
+    floor_profit: Dict[str, int] = field(default_factory=dict)
+    rejections: Dict[str, int] = field(default_factory=dict)
+    block_seconds: List[float] = field(default_factory=list)
+    opportunities: List[Dict[str, Any]] = field(default_factory=list)
+
+    def merge(self, other: "BacktestReport") -> "BacktestReport":
+        for name in ("blocks", "events", "skipped", "with_cycles", "candidates", "accepted"):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        for mine, theirs in ((self.rejections, other.rejections), (self.profit, other.profit),
+                             (self.floor_profit, other.floor_profit)):
+            for key, n in theirs.items():
+                mine[key] = mine.get(key, 0) + n
+        self.block_seconds.extend(other.block_seconds)
+        self.opportunities.extend(other.opportunities)
+        if other.start is not None:
+            self.start = other.start if self.start is None else min(self.start, other.start)
+        if other.end is not None:
+            self.end = other.end if self.end is None else max(self.end, other.end)
+        return self
+
+    def percentile_ms(self, q: float) -> float:
+        values = sorted(self.block_seconds)
+        if not values:
+            return 0.0
+        return 1000 * values[min(len(values) - 1, max(0, int(round(q / 100.0 * (len(values) - 1)))))]
+
+    def format(self, names: Optional[Dict[str, str]] = None) -> str:
+        """`names` maps token addresses (lowercase) to display names."""
+        names = names or {}
+        total = sum(self.block_seconds)
+        lines = [
+            f"blocks {self.start}..{self.end}: {self.blocks} with events ({self.events} logs, {self.skipped} skipped)",
+            f"with cycles {self.with_cycles}  tradeable {self.candidates}  accepted {self.accepted}",
+        ]
+        for token, profit in sorted(self.profit.items()):
+            lines.append(f"theoretical profit {names.get(token, token)}: {profit} (floor at slippage {self.floor_profit[token]})")
+        lines += [
+            f"rejections {dict(sorted(self.rejections.items()))}",
+            f"per block: mean {1000 * total / max(1, self.blocks):.3f} ms  p50 {self.percentile_ms(50):.3f} ms  "
+            f"p99 {self.percentile_ms(99):.3f} ms  max {1000 * max(self.block_seconds, default=0):.3f} ms",
+        ]
+        return "\n".join(lines)
+
+class Backtester:
+    """One pass over a block range: mirror -> cycle search -> gates -> sizing -> simulation -> gates."""
+
+    def __init__(self, settings: Settings, pools: Dict[str, Any], base_fee_gwei: float = 20.0):
+        self.settings = settings
+        self.engine, self.routers = build_engine(pools, settings)
+        self.mirror = PoolStateMirror(w3=None, settings=settings, v2=self.engine)
+        for pool in build_v3_pools(pools):
+            self.mirror.track_v3_pool(pool)
+        self._known = {a.lower() for a in self.mirror.addresses()}
+        self.cycle_finder = CycleFinder(TokenGraph.from_pools(self.engine, self.mirror.v3.values()))
+        # Historical base fees are not in the event stream: one assumed fee, steady (half-full blocks)
+        self.gas_oracle = GasOracle(priority_gwei=settings.GAS_PRIORITY_GWEI)
+        self.gas_oracle.update_head({"number": 0, "baseFeePerGas": Web3.to_wei(base_fee_gwei, "gwei"),
+                                     "gasUsed": 15_000_000, "gasLimit": 30_000_000})
+        self._path_gates = build_path_gates(settings, self.engine)
+        self._sim_gates = build_simulation_gates(settings)
+
+    def warm(self, logs: List[Dict[str, Any]]) -> Set[str]:
+        """Applies a block's logs without searching; returns the pools they changed."""
+        return self.mirror.apply_logs(logs).changed
+
+    def evaluate(self, block: int, logs: List[Dict[str, Any]], report: BacktestReport) -> None:
+        start = time.perf_counter()
+        delta = self.mirror.apply_logs(logs)
+        cycles = self.cycle_finder.update(delta.changed)
+        path = select_v2_cycle([c.as_dict() for c in cycles], self.routers) if cycles else None
+        if path is not None:
+            self._evaluate_path(block, path, report)
+        report.block_seconds.append(time.perf_counter() - start)
+        report.blocks += 1
+        report.events += len(logs)
+        report.skipped += sum(str(e["address"]).lower() not in self._known for e in logs)
+        report.with_cycles += bool(cycles)
+
+    def _reject(self, reason: str, report: BacktestReport) -> None:
+        # Reasons carry the token / pool; aggregate by kind
+        kind = reason.split(":", 1)[0]
+        report.rejections[kind] = report.rejections.get(kind, 0) + 1
+
+    def _evaluate_path(self, block: int, path: Tuple[str, str, str, str], report: BacktestReport) -> None:
+        s = self.settings
+        token_in, mid_token, router_a, router_b = path
+        report.candidates += 1
+        candidate = Candidate(f"block-{block}", token_in, mid_token, router_a, router_b)
+        reason = first_rejection(self._path_gates, candidate)
+        if reason is not None:
+            self._reject(reason, report)
+            return
+        sizing = size_v2_cycle(self.engine, s, router_a=router_a, router_b=router_b, token_in=token_in,
+                               mid_token=mid_token, max_amount_in=s.MAX_FLASHLOAN_AMOUNT_WEI)
+        candidate.amount_in = sizing.amount_in if sizing is not None else int(s.DEFAULT_FLASHLOAN_AMOUNT_WEI)
+        sim = simulate_v2_cycle(None, s, router_a, router_b, token_in, mid_token, candidate.amount_in,
+                                gas_limit_hint=candidate.gas_limit, quote_engine=self.engine,
+                                gas_oracle=self.gas_oracle)
+        candidate.sim = sim
+        reason = first_rejection(self._sim_gates, candidate)
+        if reason is not None:
+            self._reject(reason, report)
+            return
+        floor_out = sim.gross_cycle_out * (10_000 - s.DEFAULT_SLIPPAGE_BPS) // 10_000
+        floor = floor_out - candidate.amount_in - sim.premium - sim.gas_cost_wei
+        key = token_in.lower()
+        report.accepted += 1
+        report.profit[key] = report.profit.get(key, 0) + sim.expected_net_profit
+        report.floor_profit[key] = report.floor_profit.get(key, 0) + floor
+        report.opportunities.append({
+            "block": block, "token_in": token_in, "mid_token": mid_token, "routers": [router_a, router_b],
+            "amount_in": candidate.amount_in, "expected_net_profit": sim.expected_net_profit,
+            "floor_profit": floor, "premium": sim.premium, "gas_cost_wei": sim.gas_cost_wei,
+        })
+
+def backtest_range(
+    events_path: str,
+    pools: Dict[str, Any],
+    overrides: Dict[str, Any],
+    start: Optional[int] = None,
+    end: Optional[int] = None,
+    base_fee_gwei: float = 20.0,
+) -> BacktestReport:
+    """Runs [start, end] of the event file; earlier blocks only bring pool state up to date."""
+    tester = Backtester(Settings(**overrides), pools, base_fee_gwei)
+    report = BacktestReport()
+    warmed: Set[str] = set()
+    for block, logs in blocks(read_events(events_path)):
+        if end is not None and block > end:
+            break
+        if start is not None and block < start:
+            warmed |= tester.warm(logs)
+            continue
+        if warmed:
+            # Searching resumes from the up-to-date graph, as in a sequential run
+            tester.cycle_finder.graph.refresh(warmed)
+            warmed = set()
+        if report.start is None:
+            report.start = block
+        report.end = block
+        tester.evaluate(block, logs, report)
+    return report
+
+def block_bounds(events_path: str) -> Tuple[Optional[int], Optional[int]]:
+    first = last = None
+    for entry in read_events(events_path):
+        n = entry["blockNumber"]
+        first = n if first is None else first
+        last = n
+    return first, last
+
+def split_range(start: int, end: int, parts: int) -> List[Tuple[int, int]]:
+    size = max(1, -(-(end - start + 1) // max(1, parts)))
+    return [(a, min(end, a + size - 1)) for a in range(start, end + 1, size)]
+
+def run_backtest(
+    events_path: str,
+    pools: Dict[str, Any],
+    overrides: Optional[Dict[str, Any]] = None,
+    start: Optional[int] = None,
+    end: Optional[int] = None,
+    workers: int = 1,
+    base_fee_gwei: float = 20.0,
+) -> BacktestReport:
+    """Backtests [start, end] (default: the whole file), split across `workers` processes."""
+    overrides = overrides or {}
+    if workers <= 1:
+        return backtest_range(events_path, pools, overrides, start, end, base_fee_gwei)
+    if start is None or end is None:
+        first, last = block_bounds(events_path)
+        if first is None:
+            return BacktestReport()
+        start = first if start is None else start
+        end = last if end is None else end
+    ranges = split_range(start, end, workers)
+    report = BacktestReport()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(backtest_range, events_path, pools, overrides, a, b, base_fee_gwei) for a, b in ranges]
+        for future in futures:
+            report.merge(future.result())
+    return report
+
+def _assignment(spec: str) -> Tuple[str, str]:
+    key, sep, value = spec.partition("=")
+    if not sep:
+        raise argparse.ArgumentTypeError(f"expected KEY=VALUE, got {spec!r}")
+    return key.strip(), value.strip()
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="backtest an event file")
+    run.add_argument("events", help="event file (.jsonl, .jsonl.gz or binary)")
+    run.add_argument("--pools", required=True, help="JSON file listing the pairs to mirror")
+    run.add_argument("--from", dest="start", type=int, help="first block to evaluate")
+    run.add_argument("--to", dest="end", type=int, help="last block to evaluate")
+    run.add_argument("--workers", type=int, default=1, help="worker processes (block ranges run in parallel)")
+    run.add_argument("--base-fee-gwei", type=float, default=20.0, help="assumed base fee for gas costs")
+    run.add_argument("--set", dest="overrides", type=_assignment, action="append", default=[],
+                     help="Settings override, e.g. AAVE_PREMIUM_BPS=9 (repeatable)")
+    run.add_argument("--sweep", type=_assignment, help="run once per value, e.g. DEFAULT_SLIPPAGE_BPS=10,30,50")
+    run.add_argument("--out", help="write accepted opportunities to this JSONL file")
+
+    convert = sub.add_parser("convert", help="rewrite a JSONL event file in the binary format")
+    convert.add_argument("source")
+    convert.add_argument("target")
+
+    args = parser.parse_args(argv)
+    if args.command == "convert":
+        print(f"wrote {write_events(args.target, read_events(args.source))} events to {args.target}")
+        return
+
+    pools = load_pools(args.pools)
+    names = {Web3.to_checksum_address(a).lower(): name for name, a in pools.get("tokens", {}).items()}
+    base = dict(args.overrides)
+    variants = [base]
+    if args.sweep:
+        key, values = args.sweep
+        variants = [{**base, key: v} for v in values.split(",")]
+    for overrides in variants:
+        wall = time.perf_counter()
+        report = run_backtest(args.events, pools, overrides, args.start, args.end, args.workers, args.base_fee_gwei)
+        if len(variants) > 1 or overrides:
+            print(f"\n== {', '.join(f'{k}={v}' for k, v in overrides.items()) or 'defaults'}")
+        print(report.format(names))
+        print(f"wall clock {time.perf_counter() - wall:.2f}s with {args.workers} worker(s)")
+        if args.out:
+            with open(args.out, "w" if overrides is variants[0] else "a", encoding="utf-8") as f:
+                for opp in report.opportunities:
+                    f.write(json.dumps({**opp, "settings": overrides}) + "\n")
+
+if __name__ == "__main__":
+    main()
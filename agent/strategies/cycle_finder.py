@@ -0,0 +1,259 @@
+import math
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+import numpy as np
+from agent.defi.uniswap_v2 import V2Pair, V2QuoteEngine
+from agent.defi.uniswap_v3 import V3Pool
+
+_LOG_Q96 = 96 * math.log(2)
+
+@dataclass
+class GraphEdge:
+    pool: str
+    kind: str  # "v2" | "v3"
+    token_in: str
+    token_out: str
+    # V2: fee in bps and the router the pair is traded through; V3: fee in pips
+    fee: int
+    router: Optional[str] = None
+
+@dataclass
+class Cycle:
+    tokens: List[str]
+    edges: List[GraphEdge]
+    # Sum of log marginal rates after fees; > 0 means the cycle gains before sizing/gas
+    log_gain: float
+
+    @property
+    def hops(self) -> int:
+        return len(self.edges)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "tokens": self.tokens,
+            "pools": [e.pool for e in self.edges],
+            "kinds": [e.kind for e in self.edges],
+            "routers": [e.router for e in self.edges],
+            "fees": [e.fee for e in self.edges],
+            "log_gain": self.log_gain,
+        }
+
+def _v2_weights(pair: V2Pair) -> Tuple[float, float]:
+    """-log(rate) for token0->token1 and token1->token0 at the marginal price."""
+    if pair.reserve0 <= 0 or pair.reserve1 <= 0:
+        return math.inf, math.inf
+    fee = math.log((10_000 - pair.fee_bps) / 10_000)
+    l0, l1 = math.log(pair.reserve0), math.log(pair.reserve1)
+    return l0 - l1 - fee, l1 - l0 - fee
+
+def _v3_weights(pool: V3Pool) -> Tuple[float, float]:
+    if pool.sqrt_price_x96 <= 0 or pool.liquidity <= 0:
+        return math.inf, math.inf
+    fee = math.log((1_000_000 - pool.fee) / 1_000_000)
+    log_price = 2 * (math.log(pool.sqrt_price_x96) - _LOG_Q96)  # token1 per token0
+    return -log_price - fee, log_price - fee
+
+class TokenGraph:
+    """
+    Directed token graph with one edge per pool direction, weighted by -log(marginal rate
+    after fee). Edge endpoints and weights are held in NumPy arrays; `refresh` recomputes
+    weights for changed pools in place and returns the touched edge ids.
+    """
+
+    def __init__(self):
+        self.tokens: List[str] = []
+        self.index: Dict[str, int] = {}
+        self.edges: List[GraphEdge] = []
+        self._sources: Dict[str, Any] = {}
+        self._pool_edges: Dict[str, List[int]] = {}
+        self._src: List[int] = []
+        self._dst: List[int] = []
+        self._w: List[float] = []
+        self.src = np.zeros(0, dtype=np.int64)
+        self.dst = np.zeros(0, dtype=np.int64)
+        self.weight = np.zeros(0, dtype=np.float64)
+        self._dirty = False
+
+    @classmethod
+    def from_pools(cls, v2: Optional[V2QuoteEngine] = None, v3: Iterable[V3Pool] = ()) -> "TokenGraph":
+        g = cls()
+        for router, pair in (v2.pairs_by_router() if v2 is not None else []):
+            g.add_v2_pair(router, pair)
+        for pool in v3:
+            g.add_v3_pool(pool)
+        return g
+
+    def _token(self, address: str) -> int:
+        key = address.lower()
+        i = self.index.get(key)
+        if i is None:
+            i = len(self.tokens)
+            self.index[key] = i
+            self.tokens.append(address)
+        return i
+
+    def _add_edge(self, edge: GraphEdge, weight: float) -> None:
+        eid = len(self.edges)
+        self.edges.append(edge)
+        self._src.append(self._token(edge.token_in))
+        self._dst.append(self._token(edge.token_out))
+        self._w.append(weight)
+        self._pool_edges.setdefault(edge.pool.lower(), []).append(eid)
+        self._dirty = True
+
+    def ensure_arrays(self) -> None:
+        """Rebuilds the edge arrays after topology changes (adds are batched until a search)."""
+        if self._dirty:
+            self.src = np.asarray(self._src, dtype=np.int64)
+            self.dst = np.asarray(self._dst, dtype=np.int64)
+            self.weight = np.asarray(self._w, dtype=np.float64)
+            self._dirty = False
+
+    def add_v2_pair(self, router: str, pair: V2Pair) -> None:
+        w01, w10 = _v2_weights(pair)
+        key = f"{pair.address.lower()}@{router.lower()}"
+        self._sources[key] = pair
+        self._add_edge(GraphEdge(pair.address, "v2", pair.token0, pair.token1, pair.fee_bps, router), w01)
+        self._add_edge(GraphEdge(pair.address, "v2", pair.token1, pair.token0, pair.fee_bps, router), w10)
+
+    def add_v3_pool(self, pool: V3Pool) -> None:
+        w01, w10 = _v3_weights(pool)
+        self._sources[pool.address.lower()] = pool
+        self._add_edge(GraphEdge(pool.address, "v3", pool.token0, pool.token1, pool.fee), w01)
+        self._add_edge(GraphEdge(pool.address, "v3", pool.token1, pool.token0, pool.fee), w10)
+
+    def refresh(self, pools: Iterable[str]) -> Set[int]:
+        """Recomputes weights of the given pools' edges from their cached state."""
+        self.ensure_arrays()
+        touched: Set[int] = set()
+        for address in pools:
+            eids = self._pool_edges.get(address.lower())
+            if not eids:
+                continue
+            for i in range(0, len(eids), 2):
+                e = self.edges[eids[i]]
+                if e.kind == "v2":
+                    w01, w10 = _v2_weights(self._sources[f"{e.pool.lower()}@{(e.router or '').lower()}"])
+                else:
+                    w01, w10 = _v3_weights(self._sources[e.pool.lower()])
+                self._w[eids[i]] = self.weight[eids[i]] = w01
+                self._w[eids[i + 1]] = self.weight[eids[i + 1]] = w10
+                touched.update((eids[i], eids[i + 1]))
+        return touched
+
+class CycleFinder:
+    """
+    Finds profitable 2..max_hops cycles with a layered, vectorized Bellman-Ford.
+
+    Layer k holds, for every (source, token), the cheapest simple k-edge path from source
+    (relaxations onto a token already on the path are excluded); a negative distance back
+    at the source after k layers is a profitable k-hop cycle. All sources in a chunk are
+    relaxed together as one (sources x edges) array op. `update` re-weights only the
+    changed pools' edges and searches from their tails with the first hop restricted to
+    those edges, so it reports only cycles that use a changed edge: a cycle with no
+    changed edge cannot have changed profitability since the previous block.
+    """
+
+    def __init__(self, graph: TokenGraph, max_hops: int = 4, min_log_gain: float = 0.0, source_chunk: int = 64):
+        self.graph = graph
+        self.max_hops = max_hops
+        self.min_log_gain = min_log_gain
+        self.source_chunk = source_chunk
+
+    def update(self, changed_pools: Iterable[str]) -> List[Cycle]:
+        touched = self.graph.refresh(changed_pools)
+        if not touched:
+            return []
+        g = self.graph
+        ids = np.fromiter(touched, dtype=np.int64)
+        return self.search(np.unique(g.src[ids]), touched)
+
+    def search(self, sources: Optional[Sequence[int]] = None, touched: Optional[Set[int]] = None) -> List[Cycle]:
+        g = self.graph
+        g.ensure_arrays()
+        if len(g.edges) == 0:
+            return []
+        all_sources = np.arange(len(g.tokens)) if sources is None else np.asarray(sources, dtype=np.int64)
+        found: Dict[Tuple[int, ...], Cycle] = {}
+        for start in range(0, len(all_sources), self.source_chunk):
+            self._search_chunk(all_sources[start:start + self.source_chunk], touched, found)
+        return sorted(found.values(), key=lambda c: c.log_gain, reverse=True)
+
+    def _search_chunk(self, sources: np.ndarray, touched: Optional[Set[int]], found: Dict[Tuple[int, ...], Cycle]) -> None:
+        g = self.graph
+        n_src, n_tok, n_edge = len(sources), len(g.tokens), len(g.edges)
+        rows = np.broadcast_to(np.arange(n_src)[:, None], (n_src, n_edge))
+        cols = np.broadcast_to(g.dst[None, :], (n_src, n_edge))
+        at_source = (np.arange(n_src), sources)
+        threshold = -self.min_log_gain - 1e-12
+        first: Optional[np.ndarray] = None
+        if touched is not None:
+            # Rotated to start at a changed edge, every cycle through one is found from its tail
+            first = np.zeros(n_edge, dtype=bool)
+            first[list(touched)] = True
+
+        dist = np.full((n_src, n_tok), np.inf)
+        dist[at_source] = 0.0
+        preds: List[np.ndarray] = []
+        # steps[j][row, t]: token reached after j + 1 edges on the best walk to t; a walk
+        # may not step onto any of them again, so layers only ever hold simple paths
+        steps: List[np.ndarray] = []
+        for k in range(1, self.max_hops + 1):
+            cand = dist[:, g.src] + g.weight[None, :]
+            if k == 1 and first is not None:
+                cand[:, ~first] = np.inf
+            for step in steps:
+                cand[step[:, g.src] == g.dst[None, :]] = np.inf
+            nxt = np.full((n_src, n_tok), np.inf)
+            np.minimum.at(nxt, (rows, cols), cand)
+            pred = np.full((n_src, n_tok), -1, dtype=np.int64)
+            hit = np.isfinite(cand) & (cand == nxt[rows, cols])
+            r, e = np.nonzero(hit)
+            pred[r, g.dst[e]] = e
+            preds.append(pred)
+            if k >= 2:
+                closing = nxt[at_source]
+                for s in np.nonzero(closing < threshold)[0]:
+                    cycle = self._reconstruct(preds, int(s), int(sources[s]), k)
+                    if cycle is None:
+                        continue
+                    if touched is not None and not touched.intersection(cycle):
+                        continue
+                    key = self._canonical(cycle)
+                    if key not in found:
+                        found[key] = self._to_cycle(cycle)
+            # Returning to the source closes a cycle (checked above); it never continues one
+            nxt[at_source] = np.inf
+            reached = pred >= 0
+            prev = g.src[np.where(reached, pred, 0)]
+            steps = [np.where(reached, np.take_along_axis(step, prev, axis=1), -1) for step in steps]
+            steps.append(np.where(reached, np.arange(n_tok)[None, :], -1))
+            dist = nxt
+
+    def _reconstruct(self, preds: List[np.ndarray], row: int, source: int, k: int) -> Optional[List[int]]:
+        g = self.graph
+        path: List[int] = []
+        node = source
+        for layer in range(k - 1, -1, -1):
+            e = int(preds[layer][row, node])
+            if e < 0:
+                return None
+            path.append(e)
+            node = int(g.src[e])
+        path.reverse()
+        # Relaxation already excludes revisits; keep the check as a guard
+        visited = [int(g.src[e]) for e in path]
+        if len(set(visited)) != len(visited):
+            return None
+        return path
+
+    @staticmethod
+    def _canonical(path: List[int]) -> Tuple[int, ...]:
+        i = path.index(min(path))
+        return tuple(path[i:] + path[:i])
+
+    def _to_cycle(self, path: List[int]) -> Cycle:
+        g = self.graph
+        edges = [g.edges[e] for e in path]
+        tokens = [edges[0].token_in] + [e.token_out for e in edges]
+        return Cycle(tokens=tokens, edges=edges, log_gain=float(-g.weight[path].sum()))
@@ -0,0 +1,107 @@
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from web3 import Web3
+from agent.config import Settings
+from agent.defi.uniswap_v2 import V2QuoteEngine
+from agent.strategies.simulator import QuoteResult
+
+@dataclass
+class Candidate:
+    """A concrete 2-hop V2 cycle under evaluation; `sim` is filled in once it has been simulated."""
+    opportunity_id: str
+    token_in: str
+    mid_token: str
+    router_a: str
+    router_b: str
+    amount_in: int = 0
+    gas_limit: int = 1_000_000
+    sim: Optional[QuoteResult] = None
+
+def select_v2_cycle(cycles: List[Dict[str, Any]], routers: Iterable[str]) -> Optional[Tuple[str, str, str, str]]:
+    """
+    (token_in, mid_token, router_a, router_b) of the first (most profitable) 2-hop cycle in
+    the scanner's list whose legs are both V2 pairs on one of `routers`.
+    """
+    known = {r.lower() for r in routers if r}
+    for c in cycles:
+        legs = c.get("routers") or []
+        if len(legs) != 2 or any(k != "v2" for k in c.get("kinds", [])):
+            continue
+        if not all(r and r.lower() in known for r in legs):
+            continue
+        tokens = c["tokens"]
+        return (tokens[0], tokens[1], legs[0], legs[1])
+    return None
+
+# A gate returns None to pass the candidate or a short rejection reason
+Gate = Callable[[Candidate], Optional[str]]
+
+def parse_token_allowlist(raw: str) -> frozenset:
+    return frozenset(t.strip().lower() for t in (raw or "").split(",") if t.strip())
+
+def allowlist_gate(allowed: frozenset) -> Gate:
+    def check(c: Candidate) -> Optional[str]:
+        for token in (c.token_in, c.mid_token):
+            if token.lower() not in allowed:
+                return f"token_not_allowed:{token}"
+        return None
+    return check
+
+def liquidity_gate(quote_engine: V2QuoteEngine, min_reserve_wei: int) -> Gate:
+    """Both pairs must hold at least `min_reserve_wei` of token_in. Pairs that are not mirrored pass."""
+    def check(c: Candidate) -> Optional[str]:
+        for router in (c.router_a, c.router_b):
+            pair = quote_engine.get_pair(router, c.token_in, c.mid_token)
+            if pair is None:
+                continue
+            reserve_in, _ = pair.reserves_for(c.token_in)
+            if reserve_in < min_reserve_wei:
+                return f"low_liquidity:{pair.address}"
+        return None
+    return check
+
+def gas_ceiling_gate(max_gas_gwei: float) -> Gate:
+    ceiling = Web3.to_wei(max_gas_gwei, "gwei")
+
+    def check(c: Candidate) -> Optional[str]:
+        if c.sim is None or c.gas_limit <= 0:
+            return None
+        if c.sim.gas_cost_wei // c.gas_limit > ceiling:
+            return "gas_above_ceiling"
+        return None
+    return check
+
+def net_profit_gate(min_net_profit_wei: int) -> Gate:
+    def check(c: Candidate) -> Optional[str]:
+        if c.sim is None:
+            return None
+        if c.sim.expected_net_profit <= min_net_profit_wei:
+            return "net_profit_below_min"
+        return None
+    return check
+
+def build_path_gates(settings: Settings, quote_engine: V2QuoteEngine) -> List[Gate]:
+    """Gates that only need the path (no RPC): run before sizing and simulation."""
+    gates: List[Gate] = []
+    allowed = parse_token_allowlist(settings.TOKEN_ALLOWLIST)
+    if allowed:
+        gates.append(allowlist_gate(allowed))
+    if settings.MIN_POOL_LIQUIDITY_WEI > 0:
+        gates.append(liquidity_gate(quote_engine, settings.MIN_POOL_LIQUIDITY_WEI))
+    return gates
+
+def build_simulation_gates(settings: Settings) -> List[Gate]:
+    """Gates on the simulated result: run before any AI stage."""
+    gates: List[Gate] = []
+    if settings.MAX_GAS_PRICE_GWEI is not None:
+        gates.append(gas_ceiling_gate(settings.MAX_GAS_PRICE_GWEI))
+    # Always on: the profit backstop used to run only after the AI had been asked
+    gates.append(net_profit_gate(settings.MIN_NET_PROFIT_WEI))
+    return gates
+
+def first_rejection(gates: List[Gate], candidate: Candidate) -> Optional[str]:
+    for gate in gates:
+        reason = gate(candidate)
+        if reason is not None:
+            return reason
+    return None
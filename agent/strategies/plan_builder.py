@@ -1,14 +1,29 @@
 import time
-from typing import Dict, Any, List, Tuple
-from web3 import Web3
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Tuple
+from web3 import AsyncWeb3, Web3
 from agent.config import Settings
-from agent.core.flash_params import encode_flash_params
-from agent.defi.uniswap_v2 import encode_v2_swap_exact_tokens_for_tokens, quote_v2_get_amounts_out
-from agent.defi.uniswap_v3 import encode_v3_exact_input_single, quote_v3_exact_input_single
+from agent.core.calldata import (
+    V2_SWAP_AMOUNT_IN_OFFSET,
+    V2_SWAP_AMOUNT_OUT_MIN_OFFSET,
+    V2_SWAP_DEADLINE_OFFSET,
+    v2_swap_encoder,
+)
+from agent.core.flash_params import FlashParamsTemplate, encode_flash_params
+from agent.defi import uniswap_v2
+from agent.defi.uniswap_v2 import V2QuoteEngine
+from agent.defi.read_cache import BlockReadCache
+from agent.defi.uniswap_v3 import V3Pool, encode_v3_exact_input_single, quote_v3_exact_input_single_local
+from agent.strategies.simulator import QuoteResult
 
 def _slip(value: int, slippage_bps: int) -> int:
     return (value * (10_000 - slippage_bps)) // 10_000
 
+def _simulated_v2_amounts(quote_result: QuoteResult, amount_in: int) -> Tuple[int, int, int]:
+    if len(quote_result.amounts) != 3 or quote_result.amounts[0] != amount_in:
+        raise ValueError("QuoteResult does not describe a 2-hop cycle for this amount_in")
+    return quote_result.amounts[0], quote_result.amounts[1], quote_result.amounts[2]
+
 def build_uniswap_v2_cycle_plan(
     w3: Web3,
     settings: Settings,
@@ -19,46 +34,123 @@ def build_uniswap_v2_cycle_plan(
     router_b: str,
     amount_in: int,
     slippage_bps: int | None = None,
+    quote_engine: Optional[V2QuoteEngine] = None,
+    quote_result: Optional[QuoteResult] = None,
 ) -> Tuple[bytes, Dict[str, Any]]:
-    # Quote
-    amounts_a = quote_v2_get_amounts_out(w3, router_a, amount_in, [token_in, mid_token])
+    # A simulated QuoteResult is reused as-is so minOuts match what was simulated
+    if quote_result is not None:
+        return _assemble_v2_cycle_plan(
+            settings, executor_address, token_in, mid_token, router_a, router_b,
+            *_simulated_v2_amounts(quote_result, amount_in), slippage_bps,
+        )
+
+    # Quote (locally from cached reserves when an engine is supplied)
+    quote = quote_engine.quote if quote_engine is not None else uniswap_v2.quote_v2_get_amounts_out
+    amounts_a = quote(w3, router_a, amount_in, [token_in, mid_token])
     out_mid = amounts_a[-1]
-    amounts_b = quote_v2_get_amounts_out(w3, router_b, out_mid, [mid_token, token_in])
+    amounts_b = quote(w3, router_b, out_mid, [mid_token, token_in])
     out_back = amounts_b[-1]
 
-    slip_bps = slippage_bps if slippage_bps is not None else settings.DEFAULT_SLIPPAGE_BPS
-    min_out_mid = _slip(out_mid, slip_bps)
-    min_out_back = _slip(out_back, slip_bps)
+    return _assemble_v2_cycle_plan(
+        settings, executor_address, token_in, mid_token, router_a, router_b,
+        amount_in, out_mid, out_back, slippage_bps,
+    )
 
-    deadline = int(time.time()) + 600
-    exec_addr = Web3.to_checksum_address(executor_address)
+async def build_uniswap_v2_cycle_plan_async(
+    w3: AsyncWeb3,
+    settings: Settings,
+    executor_address: str,
+    token_in: str,
+    mid_token: str,
+    router_a: str,
+    router_b: str,
+    amount_in: int,
+    slippage_bps: int | None = None,
+    quote_engine: Optional[V2QuoteEngine] = None,
+    quote_result: Optional[QuoteResult] = None,
+) -> Tuple[bytes, Dict[str, Any]]:
+    if quote_result is not None:
+        return _assemble_v2_cycle_plan(
+            settings, executor_address, token_in, mid_token, router_a, router_b,
+            *_simulated_v2_amounts(quote_result, amount_in), slippage_bps,
+        )
 
-    call1_data = encode_v2_swap_exact_tokens_for_tokens(
-        w3, router_a, amount_in, min_out_mid, [token_in, mid_token], exec_addr, deadline
+    quote = quote_engine.quote_async if quote_engine is not None else uniswap_v2.quote_v2_get_amounts_out_async
+    amounts_a = await quote(w3, router_a, amount_in, [token_in, mid_token])
+    out_mid = amounts_a[-1]
+    amounts_b = await quote(w3, router_b, out_mid, [mid_token, token_in])
+    out_back = amounts_b[-1]
+
+    return _assemble_v2_cycle_plan(
+        settings, executor_address, token_in, mid_token, router_a, router_b,
+        amount_in, out_mid, out_back, slippage_bps,
     )
-    call2_data = encode_v2_swap_exact_tokens_for_tokens(
-        w3, router_b, out_mid, min_out_back, [mid_token, token_in], exec_addr, deadline
+
+@lru_cache(maxsize=256)
+def v2_cycle_template(
+    beneficiary: str,
+    executor_address: str,
+    token_in: str,
+    mid_token: str,
+    router_a: str,
+    router_b: str,
+) -> FlashParamsTemplate:
+    """
+    FlashParams template for token_in -> mid_token on router_a, then back on router_b.
+    Slots: min_profit, amount_in, out_mid, min_out_mid, min_out_back, deadline.
+    """
+    exec_addr = Web3.to_checksum_address(executor_address)
+    call1_data = v2_swap_encoder(router_a).encode(0, 0, [token_in, mid_token], exec_addr, 0)
+    call2_data = v2_swap_encoder(router_b).encode(0, 0, [mid_token, token_in], exec_addr, 0)
+    return FlashParamsTemplate.from_shape(
+        beneficiary=beneficiary,
+        approvals=[
+            {"token": token_in, "spender": router_a, "amount": 0},
+            {"token": mid_token, "spender": router_b, "amount": 0},
+        ],
+        calls=[
+            {"target": router_a, "value": 0, "data": call1_data},
+            {"target": router_b, "value": 0, "data": call2_data},
+        ],
+        approval_slots={0: "amount_in", 1: "out_mid"},
+        call_slots={
+            0: {"amount_in": V2_SWAP_AMOUNT_IN_OFFSET, "min_out_mid": V2_SWAP_AMOUNT_OUT_MIN_OFFSET, "deadline": V2_SWAP_DEADLINE_OFFSET},
+            1: {"out_mid": V2_SWAP_AMOUNT_IN_OFFSET, "min_out_back": V2_SWAP_AMOUNT_OUT_MIN_OFFSET, "deadline": V2_SWAP_DEADLINE_OFFSET},
+        },
     )
 
-    approvals = [
-        {"token": token_in, "spender": router_a, "amount": amount_in},
-        {"token": mid_token, "spender": router_b, "amount": out_mid},
-    ]
-    calls = [
-        {"target": router_a, "value": 0, "data": call1_data},
-        {"target": router_b, "value": 0, "data": call2_data},
-    ]
+def _assemble_v2_cycle_plan(
+    settings: Settings,
+    executor_address: str,
+    token_in: str,
+    mid_token: str,
+    router_a: str,
+    router_b: str,
+    amount_in: int,
+    out_mid: int,
+    out_back: int,
+    slippage_bps: int | None,
+) -> Tuple[bytes, Dict[str, Any]]:
+    slip_bps = slippage_bps if slippage_bps is not None else settings.DEFAULT_SLIPPAGE_BPS
+    min_out_mid = _slip(out_mid, slip_bps)
+    min_out_back = _slip(out_back, slip_bps)
+
+    deadline = int(time.time()) + 600
 
     premium = (amount_in * settings.AAVE_PREMIUM_BPS) // 10_000
     expected_profit = out_back - amount_in
     # Very conservative minProfit; can be tuned. Ensure non-negative.
     min_profit = max(expected_profit - premium, 0)
 
-    params = encode_flash_params(
+    # Route shape is encoded once; per plan only the amount/minOut/deadline words are patched
+    template = v2_cycle_template(settings.PUBLIC_ADDRESS, executor_address, token_in, mid_token, router_a, router_b)
+    params = template.render(
         min_profit=int(min_profit),
-        beneficiary=settings.PUBLIC_ADDRESS,
-        approvals=approvals,
-        calls=calls,
+        amount_in=int(amount_in),
+        out_mid=int(out_mid),
+        min_out_mid=int(min_out_mid),
+        min_out_back=int(min_out_back),
+        deadline=deadline,
     )
 
     info = {
@@ -83,8 +175,18 @@ def build_uniswap_v3_exact_input_single_plan(
     quoter_v3: str,
     amount_in: int,
     slippage_bps: int | None = None,
+    v3_pool: Optional[V3Pool] = None,
+    quote_result: Optional[QuoteResult] = None,
+    read_cache: Optional[BlockReadCache] = None,
 ) -> Tuple[bytes, Dict[str, Any]]:
-    out = quote_v3_exact_input_single(w3, quoter_v3, token_in, token_out, fee, amount_in)
+    if quote_result is not None:
+        if quote_result.amounts[0] != amount_in:
+            raise ValueError("QuoteResult was simulated for a different amount_in")
+        out = quote_result.amounts[-1]
+    else:
+        out = quote_v3_exact_input_single_local(
+            w3, quoter_v3, token_in, token_out, fee, amount_in, v3_pool, read_cache
+        )
     slip_bps = slippage_bps if slippage_bps is not None else settings.DEFAULT_SLIPPAGE_BPS
     min_out = _slip(out, slip_bps)
     deadline = int(time.time()) + 600
@@ -1,21 +1,77 @@
 import asyncio
-from typing import AsyncGenerator, Dict, Any
+from typing import AsyncGenerator, Dict, Any, List, Optional
 from web3 import Web3
 from agent.config import Settings
+from agent.defi.pool_mirror import PoolDelta, PoolStateMirror
+from agent.defi.read_cache import BlockReadCache
+from agent.strategies.cycle_finder import Cycle, CycleFinder
 from agent.utils.logger import get_logger
+from agent.utils.tracing import activate, discard_trace, stage, start_trace
 from agent.utils.control import read_agent_enabled  # new
 log = get_logger(__name__)
 class OpportunityScanner:
-    def __init__(self, w3: Web3, settings: Settings):
+    def __init__(
+        self,
+        w3: Web3,
+        settings: Settings,
+        mirror: Optional[PoolStateMirror] = None,
+        cycle_finder: Optional[CycleFinder] = None,
+        max_cycles: int = 8,
+        read_cache: Optional[BlockReadCache] = None,
+    ):
         self.w3 = w3
         self.settings = settings
-async def scan_loop(self) -> AsyncGenerator[Dict[str, Any], None]:
-    while True:
-        # If disabled, sleep briefly and skip work
-        if not read_agent_enabled(self.settings.AGENT_ENABLE_FILE):
-            await asyncio.sleep(2.0)
-            continue
+        self.mirror = mirror
+        self.cycle_finder = cycle_finder
+        self.max_cycles = max_cycles
+        self.read_cache = read_cache
+
+    def _opportunity_from_delta(self, delta: PoolDelta, cycles: List[Cycle]) -> Dict[str, Any]:
+        changed = sorted(delta.changed)
+        return {
+            "opportunity_id": f"block-{delta.block_number}",
+            "block_number": delta.block_number,
+            "changed_pools": changed,
+            "reorg": delta.rolled_back_to is not None,
+            "cycles": [c.as_dict() for c in cycles[:self.max_cycles]],
+            "snapshot": {
+                "block_number": delta.block_number,
+                "pools": self.mirror.snapshot(changed),
+            },
+        }
+
+    async def scan_loop(self) -> AsyncGenerator[Dict[str, Any], None]:
+        if self.mirror is None:
+            # Nothing to watch
+            while True:
+                await asyncio.sleep(3)
 
-        await asyncio.sleep(3)
-        if False:
-            yield {}
\ No newline at end of file
+        async for delta in self.mirror.stream():
+            # The trace (if sampled) starts when the delta arrives; it is current only inside
+            # activate() so nothing leaks into the consumer's context across the yield
+            trace = start_trace(f"block-{delta.block_number}", delta.block_number)
+            with activate(trace):
+                opp = self._scan_delta(delta)
+            if opp is None:
+                discard_trace(trace)
+                continue
+            if trace is not None:
+                opp["trace_id"] = trace.trace_id
+            yield opp
+
+    def _scan_delta(self, delta: PoolDelta) -> Optional[Dict[str, Any]]:
+        # View reads for this opportunity are pinned to (and cached at) the delta's block
+        if self.read_cache is not None:
+            self.read_cache.advance(delta.block_number, reorg=delta.rolled_back_to is not None)
+        # Graph weights must track every delta, even while disabled
+        with stage("cycle_search"):
+            cycles: List[Cycle] = self.cycle_finder.update(delta.changed) if self.cycle_finder is not None else []
+        # If disabled, keep the mirror current but skip emitting work
+        if not read_agent_enabled(self.settings.AGENT_ENABLE_FILE):
+            return None
+        # Deterministic stage: only blocks that opened a profitable cycle become opportunities
+        if self.cycle_finder is not None and not cycles:
+            return None
+        log.debug("scanner.delta", block=delta.block_number, changed=len(delta.changed), cycles=len(cycles))
+        with stage("snapshot"):
+            return self._opportunity_from_delta(delta, cycles)
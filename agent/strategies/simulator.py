@@ -1,9 +1,17 @@
+import math
 from dataclasses import dataclass
-from typing import List, Optional
-from web3 import Web3
+from typing import Callable, List, Optional, Sequence, Tuple
+from web3 import AsyncWeb3, Web3
 from agent.config import Settings
-from agent.defi.uniswap_v2 import quote_v2_get_amounts_out
-from agent.defi.uniswap_v3 import quote_v3_exact_input_single
+from agent.defi.uniswap_v2 import (
+    V2QuoteEngine,
+    get_amount_out,
+    quote_v2_get_amounts_out,
+    quote_v2_get_amounts_out_async,
+)
+from agent.defi.read_cache import BlockReadCache
+from agent.defi.uniswap_v3 import V3Pool, quote_v3_exact_input_single_local
+from agent.utils.gas_estimator import GasOracle
 
 @dataclass
 class QuoteResult:
@@ -14,12 +22,37 @@ class QuoteResult:
     expected_profit: int
     expected_net_profit: int
 
-def estimate_gas_cost_wei(w3: Web3, settings: Settings, gas_limit: int = 350000) -> int:
-    # Simple heuristic; refine with eth_estimateGas once end-to-end call path is in place
-    max_fee, priority = w3.eth.max_priority_fee if hasattr(w3.eth, "max_priority_fee") else (0, 0)
+def estimate_gas_cost_wei(
+    w3: Web3, settings: Settings, gas_limit: int = 350000, gas_oracle: Optional[GasOracle] = None
+) -> int:
+    # Served from the per-head oracle when it is warm; eth_gasPrice otherwise
+    if gas_oracle is not None and gas_oracle.ready:
+        return gas_limit * gas_oracle.gas_price()
     price = w3.to_wei(settings.GAS_PRIORITY_GWEI, "gwei") + w3.eth.gas_price
     return gas_limit * int(price)
 
+async def estimate_gas_cost_wei_async(
+    w3: AsyncWeb3, settings: Settings, gas_limit: int = 350000, gas_oracle: Optional[GasOracle] = None
+) -> int:
+    if gas_oracle is not None and gas_oracle.ready:
+        return gas_limit * gas_oracle.gas_price()
+    price = w3.to_wei(settings.GAS_PRIORITY_GWEI, "gwei") + await w3.eth.gas_price
+    return gas_limit * int(price)
+
+def _v2_cycle_result(settings: Settings, amount_in: int, out_mid: int, out_back: int, gas_cost: int) -> QuoteResult:
+    premium = (amount_in * settings.AAVE_PREMIUM_BPS) // 10_000
+    expected_profit = out_back - amount_in
+    expected_net = expected_profit - premium - gas_cost
+
+    return QuoteResult(
+        amounts=[amount_in, out_mid, out_back],
+        gross_cycle_out=out_back,
+        premium=premium,
+        gas_cost_wei=gas_cost,
+        expected_profit=expected_profit,
+        expected_net_profit=expected_net,
+    )
+
 def simulate_v2_cycle(
     w3: Web3,
     settings: Settings,
@@ -28,28 +61,43 @@ def simulate_v2_cycle(
     token_in: str,
     mid_token: str,
     amount_in: int,
-    gas_limit_hint: int = 350000
+    gas_limit_hint: int = 350000,
+    quote_engine: Optional[V2QuoteEngine] = None,
+    gas_oracle: Optional[GasOracle] = None,
 ) -> QuoteResult:
+    # Prefer cached reserves when available; falls back to router eth_call per hop
+    quote = quote_engine.quote if quote_engine is not None else quote_v2_get_amounts_out
+
     # WETH -> USDC on A, then USDC -> WETH on B
-    amounts_a = quote_v2_get_amounts_out(w3, router_a, amount_in, [token_in, mid_token])
+    amounts_a = quote(w3, router_a, amount_in, [token_in, mid_token])
     out_mid = amounts_a[-1]
-    amounts_b = quote_v2_get_amounts_out(w3, router_b, out_mid, [mid_token, token_in])
+    amounts_b = quote(w3, router_b, out_mid, [mid_token, token_in])
     out_back = amounts_b[-1]
 
-    premium = (amount_in * settings.AAVE_PREMIUM_BPS) // 10_000
-    gas_cost = estimate_gas_cost_wei(w3, settings, gas_limit_hint)
+    gas_cost = estimate_gas_cost_wei(w3, settings, gas_limit_hint, gas_oracle)
+    return _v2_cycle_result(settings, amount_in, out_mid, out_back, gas_cost)
 
-    expected_profit = out_back - amount_in
-    expected_net = expected_profit - premium - gas_cost
+async def simulate_v2_cycle_async(
+    w3: AsyncWeb3,
+    settings: Settings,
+    router_a: str,
+    router_b: str,
+    token_in: str,
+    mid_token: str,
+    amount_in: int,
+    gas_limit_hint: int = 350000,
+    quote_engine: Optional[V2QuoteEngine] = None,
+    gas_oracle: Optional[GasOracle] = None,
+) -> QuoteResult:
+    quote = quote_engine.quote_async if quote_engine is not None else quote_v2_get_amounts_out_async
 
-    return QuoteResult(
-        amounts=[amount_in, out_mid, out_back],
-        gross_cycle_out=out_back,
-        premium=premium,
-        gas_cost_wei=gas_cost,
-        expected_profit=expected_profit,
-        expected_net_profit=expected_net,
-    )
+    amounts_a = await quote(w3, router_a, amount_in, [token_in, mid_token])
+    out_mid = amounts_a[-1]
+    amounts_b = await quote(w3, router_b, out_mid, [mid_token, token_in])
+    out_back = amounts_b[-1]
+
+    gas_cost = await estimate_gas_cost_wei_async(w3, settings, gas_limit_hint, gas_oracle)
+    return _v2_cycle_result(settings, amount_in, out_mid, out_back, gas_cost)
 
 def simulate_v3_single(
     w3: Web3,
@@ -59,11 +107,15 @@ def simulate_v3_single(
     token_out: str,
     fee: int,
     amount_in: int,
-    gas_limit_hint: int = 220000
+    gas_limit_hint: int = 220000,
+    v3_pool: Optional[V3Pool] = None,
+    gas_oracle: Optional[GasOracle] = None,
+    read_cache: Optional[BlockReadCache] = None,
 ) -> QuoteResult:
-    out = quote_v3_exact_input_single(w3, quoter, token_in, token_out, fee, amount_in)
+    # Local tick-walking simulation when the pool is cached; QuoterV2 eth_call otherwise
+    out = quote_v3_exact_input_single_local(w3, quoter, token_in, token_out, fee, amount_in, v3_pool, read_cache)
     premium = (amount_in * settings.AAVE_PREMIUM_BPS) // 10_000
-    gas_cost = estimate_gas_cost_wei(w3, settings, gas_limit_hint)
+    gas_cost = estimate_gas_cost_wei(w3, settings, gas_limit_hint, gas_oracle)
     expected_profit = out - amount_in if token_out.lower() == token_in.lower() else 0
     expected_net = expected_profit - premium - gas_cost
     return QuoteResult(
@@ -74,3 +126,118 @@ def simulate_v3_single(
         expected_profit=expected_profit,
         expected_net_profit=expected_net,
     )
+
+@dataclass
+class SizingResult:
+    amount_in: int
+    amount_out: int
+    premium: int
+    # amount_out - amount_in - premium; gas is size-independent and left to the caller
+    profit: int
+
+def _premium(amount_in: int, premium_bps: int) -> int:
+    return (amount_in * premium_bps) // 10_000
+
+def _sized(amount_in: int, amount_out: int, premium_bps: int) -> SizingResult:
+    premium = _premium(amount_in, premium_bps)
+    return SizingResult(amount_in, amount_out, premium, amount_out - amount_in - premium)
+
+def _v2_path_out(hops: Sequence[Tuple[int, int, int]], amount_in: int) -> int:
+    out = amount_in
+    for reserve_in, reserve_out, fee_bps in hops:
+        out = get_amount_out(out, reserve_in, reserve_out, fee_bps)
+    return out
+
+def optimal_v2_cycle_input(
+    hops: Sequence[Tuple[int, int, int]],
+    premium_bps: int,
+    max_amount_in: Optional[int] = None,
+) -> Optional[SizingResult]:
+    """
+    Profit-maximizing input for a cycle of V2 hops given as (reserve_in, reserve_out, fee_bps).
+
+    A chain of constant-product swaps composes to out(x) = A*x / (B + C*x), folded hop by
+    hop with g = 10_000 - fee_bps:  A' = g*Ro*A,  B' = 10_000*Ri*B,  C' = 10_000*Ri*C + g*A.
+    Maximizing out(x) - x*(1 + premium) gives x* = (sqrt(A*B/(1 + premium)) - B) / C, computed
+    with integer sqrt. The result is re-evaluated with per-hop floor rounding and the best of
+    x* and its neighbours is returned. None when the cycle is unprofitable at any size.
+    """
+    a, b, c = 1, 1, 0
+    for reserve_in, reserve_out, fee_bps in hops:
+        if reserve_in <= 0 or reserve_out <= 0:
+            return None
+        g = 10_000 - fee_bps
+        a, b, c = g * reserve_out * a, 10_000 * reserve_in * b, 10_000 * reserve_in * c + g * a
+    # Marginal rate at zero (A/B) must beat the flash-loan premium
+    if a * 10_000 <= b * (10_000 + premium_bps):
+        return None
+    root = math.isqrt(a * b * 10_000 // (10_000 + premium_bps))
+    x = (root - b) // c
+    if max_amount_in is not None:
+        x = min(x, max_amount_in)
+    best: Optional[SizingResult] = None
+    for candidate in (x - 1, x, x + 1):
+        if candidate <= 0 or (max_amount_in is not None and candidate > max_amount_in):
+            continue
+        r = _sized(candidate, _v2_path_out(hops, candidate), premium_bps)
+        if best is None or r.profit > best.profit:
+            best = r
+    return best if best is not None and best.profit > 0 else None
+
+def optimize_input_golden(
+    quote: Callable[[int], int],
+    premium_bps: int,
+    max_amount_in: int,
+    min_amount_in: int = 1,
+) -> Optional[SizingResult]:
+    """
+    Golden-section search over integer input sizes for paths without a closed form (mixed
+    V2/V3). `quote` maps amount_in to cycle output and must be local (no RPC); profit is
+    assumed unimodal on [min_amount_in, max_amount_in]. Quotes that raise count as losses.
+    """
+    cache = {}
+
+    def evaluate(x: int) -> SizingResult:
+        r = cache.get(x)
+        if r is None:
+            try:
+                r = _sized(x, int(quote(x)), premium_bps)
+            except Exception:
+                r = SizingResult(x, 0, _premium(x, premium_bps), -(1 << 255))
+            cache[x] = r
+        return r
+
+    lo, hi = int(min_amount_in), int(max_amount_in)
+    if hi < lo:
+        return None
+    inv_phi = (math.sqrt(5) - 1) / 2
+    while hi - lo > 3:
+        span = hi - lo
+        m1 = lo + int(span * (1 - inv_phi))
+        m2 = max(lo + int(span * inv_phi), m1 + 1)
+        if evaluate(m1).profit < evaluate(m2).profit:
+            lo = m1 + 1
+        else:
+            hi = m2 - 1
+    best = max((evaluate(x) for x in range(lo, hi + 1)), key=lambda r: r.profit)
+    return best if best.profit > 0 else None
+
+def size_v2_cycle(
+    quote_engine: V2QuoteEngine,
+    settings: Settings,
+    router_a: str,
+    router_b: str,
+    token_in: str,
+    mid_token: str,
+    max_amount_in: Optional[int] = None,
+) -> Optional[SizingResult]:
+    """Optimal input for token_in -> mid_token (router_a) -> token_in (router_b) from cached reserves; zero RPC."""
+    pair_a = quote_engine.get_pair(router_a, token_in, mid_token)
+    pair_b = quote_engine.get_pair(router_b, mid_token, token_in)
+    if pair_a is None or pair_b is None:
+        return None
+    hops = [
+        pair_a.reserves_for(token_in) + (pair_a.fee_bps,),
+        pair_b.reserves_for(mid_token) + (pair_b.fee_bps,),
+    ]
+    return optimal_v2_cycle_input(hops, settings.AAVE_PREMIUM_BPS, max_amount_in)
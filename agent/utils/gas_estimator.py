@@ -1,15 +1,127 @@
-from typing import Tuple
-from web3 import Web3
+import asyncio
+from collections import deque
+from statistics import median_low
+from typing import Any, Awaitable, Callable, Deque, List, Mapping, Optional, Tuple
+from web3 import AsyncWeb3, Web3
+from agent.utils.logger import get_logger
+
+log = get_logger(__name__)
+
+# EIP-1559 constants
+BASE_FEE_MAX_CHANGE_DENOMINATOR = 8
+ELASTICITY_MULTIPLIER = 2
+
+# Priority-fee percentiles sampled per block by the oracle
+REWARD_PERCENTILES = (10, 25, 50, 75, 90)
 
 def estimate_dynamic_fees(w3: Web3, priority_gwei: float = 2.0) -> Tuple[int, int]:
-    # Use feeHistory to suggest EIP-1559 fees
-        try:
-                history = w3.eth.fee_history(5, "latest", [10, 30, 50])
-                        base = int(history["baseFeePerGas"][-1])
-                            except Exception:
-                                    base = w3.to_wei(15, "gwei")
-
-                                        priority = w3.to_wei(priority_gwei, "gwei")
-                                            max_fee = int(base + priority * 2)
-                                                return max_fee, priority
-        
\ No newline at end of file
+    # feeHistory's last baseFeePerGas entry is the next block's base fee
+    try:
+        history = w3.eth.fee_history(1, "latest", [])
+        base = int(history["baseFeePerGas"][-1])
+    except Exception:
+        base = w3.to_wei(15, "gwei")
+
+    priority = w3.to_wei(priority_gwei, "gwei")
+    max_fee = int(base + priority * 2)
+    return max_fee, priority
+
+async def estimate_dynamic_fees_async(w3: AsyncWeb3, priority_gwei: float = 2.0) -> Tuple[int, int]:
+    try:
+        history = await w3.eth.fee_history(1, "latest", [])
+        base = int(history["baseFeePerGas"][-1])
+    except Exception:
+        base = w3.to_wei(15, "gwei")
+
+    priority = w3.to_wei(priority_gwei, "gwei")
+    max_fee = int(base + priority * 2)
+    return max_fee, priority
+
+def next_base_fee(parent_base_fee: int, parent_gas_used: int, parent_gas_limit: int) -> int:
+    """EIP-1559 base fee of the child block, integer-exact as in the execution clients."""
+    target = parent_gas_limit // ELASTICITY_MULTIPLIER
+    if target == 0 or parent_gas_used == target:
+        return parent_base_fee
+    if parent_gas_used > target:
+        delta = parent_base_fee * (parent_gas_used - target) // target // BASE_FEE_MAX_CHANGE_DENOMINATOR
+        return parent_base_fee + max(delta, 1)
+    delta = parent_base_fee * (target - parent_gas_used) // target // BASE_FEE_MAX_CHANGE_DENOMINATOR
+    return parent_base_fee - delta
+
+class GasOracle:
+    """
+    Fee view refreshed once per head and served from memory.
+
+    Each refresh reads the head block (for the local next-base-fee computation) and that
+    block's priority-fee percentiles from feeHistory into a rolling window. The simulator
+    and transaction builder call fees()/gas_price() with no RPC. When priority_percentile
+    is None the configured priority_gwei is used as-is, as before the oracle existed.
+    """
+
+    def __init__(self, priority_gwei: float = 2.0, priority_percentile: Optional[float] = None, window: int = 20):
+        self.priority_floor = Web3.to_wei(priority_gwei, "gwei")
+        self.priority_percentile = priority_percentile
+        self.block_number: Optional[int] = None
+        self.base_fee: Optional[int] = None
+        self._rewards: Deque[List[int]] = deque(maxlen=window)
+
+    @property
+    def ready(self) -> bool:
+        return self.base_fee is not None
+
+    def update_head(self, header: Mapping[str, Any], rewards: Optional[List[int]] = None) -> None:
+        self.block_number = int(header["number"])
+        self.base_fee = next_base_fee(int(header["baseFeePerGas"]), int(header["gasUsed"]), int(header["gasLimit"]))
+        if rewards:
+            self._rewards.append([int(r) for r in rewards])
+
+    async def refresh(self, w3: AsyncWeb3) -> bool:
+        """Pull the head if it moved; returns True when the view advanced."""
+        header = await w3.eth.get_block("latest")
+        if header["number"] == self.block_number:
+            return False
+        # First refresh backfills the reward window; afterwards one block per head
+        count = 1 if self._rewards else self._rewards.maxlen
+        history = await w3.eth.fee_history(count, header["number"], list(REWARD_PERCENTILES))
+        for rewards in (history.get("reward") or [])[:-1]:
+            self._rewards.append([int(r) for r in rewards])
+        self.update_head(header, (history.get("reward") or [None])[-1])
+        log.debug("gas.head", block=self.block_number, next_base_fee=self.base_fee)
+        return True
+
+    async def run(
+        self,
+        w3: AsyncWeb3,
+        poll_interval: float = 1.0,
+        on_head: Optional[Callable[[int], Awaitable[None]]] = None,
+    ) -> None:
+        """Refresh loop; `on_head` is awaited with the block number each time the head moves."""
+        while True:
+            advanced = False
+            try:
+                advanced = await self.refresh(w3)
+            except Exception as e:
+                log.warning("gas.refresh_failed", msg=str(e))
+            if advanced and on_head is not None:
+                try:
+                    await on_head(self.block_number)
+                except Exception as e:
+                    log.warning("gas.on_head_failed", block=self.block_number, msg=str(e))
+            await asyncio.sleep(poll_interval)
+
+    def priority_fee(self, percentile: Optional[float] = None) -> int:
+        percentile = percentile if percentile is not None else self.priority_percentile
+        if percentile is None or not self._rewards:
+            return self.priority_floor
+        # Nearest sampled percentile column, median across the window
+        col = min(range(len(REWARD_PERCENTILES)), key=lambda i: abs(REWARD_PERCENTILES[i] - percentile))
+        return int(median_low(r[col] for r in self._rewards if len(r) > col))
+
+    def fees(self) -> Tuple[int, int]:
+        """(maxFeePerGas, maxPriorityFeePerGas) for a transaction targeting the next block."""
+        priority = self.priority_fee()
+        return int(self.base_fee + priority * 2), priority
+
+    def gas_price(self) -> int:
+        """Expected effective gas price in the next block."""
+        return int(self.base_fee + self.priority_fee())
@@ -1,17 +1,189 @@
+import atexit
+import json
+import logging
 import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Any, Dict, Optional, TextIO, Tuple
 import structlog
-from agent.config import Settings
 
 def _level_from_env(default="INFO"):
     return os.getenv("LOG_LEVEL", default)
 
-    def get_logger(name: str):
+def parse_event_rates(raw: str) -> Dict[str, float]:
+    """'arb.simulation=0.1,ai.analysis=0.25' -> {'arb.simulation': 0.1, 'ai.analysis': 0.25}"""
+    rates: Dict[str, float] = {}
+    for spec in filter(None, (s.strip() for s in (raw or "").split(","))):
+        event, _, value = spec.partition("=")
+        rates[event.strip()] = float(value)
+    return rates
+
+class EventSampler:
+    """
+    structlog processor that thins out high-frequency events. `sample` keeps every Nth
+    occurrence of an event (rate 0.1 -> 1 in 10); `per_second` caps how many are kept in
+    each wall-clock second. Warnings and errors are never dropped.
+    """
+
+    def __init__(self, sample: Optional[Dict[str, float]] = None, per_second: Optional[Dict[str, float]] = None):
+        self.every = {e: max(1, round(1 / r)) for e, r in (sample or {}).items() if r > 0}
+        self.muted = {e for e, r in (sample or {}).items() if r <= 0}
+        self.per_second = dict(per_second or {})
+        self._seen: Dict[str, int] = {}
+        self._window: Dict[str, Tuple[int, int]] = {}
+        self.dropped = 0
+
+    def __call__(self, logger: Any, method_name: str, event_dict: Dict[str, Any]) -> Dict[str, Any]:
+        if method_name in ("warning", "error", "critical", "exception"):
+            return event_dict
+        event = event_dict.get("event")
+        if event in self.muted:
+            self._drop()
+        every = self.every.get(event)
+        if every is not None:
+            seen = self._seen.get(event, 0)
+            self._seen[event] = seen + 1
+            if seen % every:
+                self._drop()
+        limit = self.per_second.get(event)
+        if limit is not None:
+            second = int(time.monotonic())
+            start, count = self._window.get(event, (second, 0))
+            if start != second:
+                start, count = second, 0
+            if count >= limit:
+                self._drop()
+            self._window[event] = (start, count + 1)
+        return event_dict
+
+    def _drop(self) -> None:
+        self.dropped += 1
+        raise structlog.DropEvent
+
+def _stamp(logger: Any, method_name: str, event_dict: Dict[str, Any]) -> Dict[str, Any]:
+    # Capture the time now; formatting it is left to the writer thread
+    event_dict["timestamp"] = time.time()
+    return event_dict
+
+class QueueWriter:
+    """Background thread that renders event dicts to JSON lines. The caller only enqueues."""
+
+    def __init__(self, stream: TextIO, maxsize: int = 10_000):
+        self.stream = stream
+        self.queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=maxsize)
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def put(self, event_dict: Dict[str, Any]) -> None:
+        try:
+            self.queue.put_nowait(event_dict)
+        except queue.Full:
+            # Never block the event loop on logging; count what was lost instead
+            self.dropped += 1
+
+    def _render(self, event_dict: Dict[str, Any]) -> str:
+        ts = event_dict.get("timestamp")
+        if isinstance(ts, float):
+            event_dict["timestamp"] = datetime.fromtimestamp(ts, timezone.utc).isoformat().replace("+00:00", "Z")
+        return json.dumps(event_dict, default=repr)
+
+    def _run(self) -> None:
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    self.stream.flush()
+                    return
+                self.stream.write(self._render(item) + "\n")
+                if self.queue.empty():
+                    self.stream.flush()
+            except Exception:
+                pass
+            finally:
+                self.queue.task_done()
+
+    def flush(self) -> None:
+        self.queue.join()
+
+    def stop(self, timeout: float = 2.0) -> None:
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+class QueueLogger:
+    """structlog logger that hands the processed event dict to the current writer."""
+
+    def msg(self, **event_dict: Any) -> None:
+        _writer.put(event_dict)
+
+    debug = info = warning = warn = error = critical = exception = fatal = failure = err = log = msg
+
+_writer: Optional[QueueWriter] = None
+_sampler: Optional[EventSampler] = None
+_lock = threading.Lock()
+
+def configure_logging(
+    level: Optional[str] = None,
+    sample: Optional[str] = None,
+    per_second: Optional[str] = None,
+    queue_size: int = 10_000,
+    stream: Optional[TextIO] = None,
+) -> None:
+    """
+    Sets up structlog once for the process. Arguments default to the LOG_LEVEL,
+    LOG_SAMPLE and LOG_RATE_LIMIT environment variables. Calling it again swaps the
+    writer for every logger, but level and sampling only apply to loggers not yet used.
+    """
+    global _writer, _sampler
+    with _lock:
+        old = _writer
+        _writer = QueueWriter(stream or sys.stdout, maxsize=queue_size)
+        _sampler = EventSampler(
+            parse_event_rates(sample if sample is not None else os.getenv("LOG_SAMPLE", "")),
+            parse_event_rates(per_second if per_second is not None else os.getenv("LOG_RATE_LIMIT", "")),
+        )
         structlog.configure(
-                processors=[
-                            structlog.processors.add_log_level,
-                                        structlog.processors.TimeStamper(fmt="ISO"),
-                                                    structlog.processors.JSONRenderer(),
-                                                            ]
-                                                                )
-                                                                    return structlog.get_logger(name)
-    
\ No newline at end of file
+            processors=[
+                _sampler,
+                structlog.processors.add_log_level,
+                _stamp,
+                structlog.processors.format_exc_info,
+            ],
+            wrapper_class=structlog.make_filtering_bound_logger(
+                logging.getLevelName((level or _level_from_env()).upper())
+            ),
+            logger_factory=lambda *args: QueueLogger(),
+            cache_logger_on_first_use=True,
+        )
+        get_logger.cache_clear()
+    if old is not None:
+        old.stop()
+
+def flush_logging() -> None:
+    """Blocks until everything logged so far has been written."""
+    if _writer is not None:
+        _writer.flush()
+
+def log_stats() -> Dict[str, int]:
+    return {
+        "sampled_out": _sampler.dropped if _sampler else 0,
+        "queue_dropped": _writer.dropped if _writer else 0,
+    }
+
+@lru_cache(maxsize=None)
+def get_logger(name: str):
+    if _writer is None:
+        configure_logging()
+    return structlog.get_logger(name)
+
+@atexit.register
+def _drain() -> None:
+    if _writer is not None:
+        _writer.stop()
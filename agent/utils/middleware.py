@@ -1,5 +1,120 @@
-# Placeholder for tx middleware (e.g., custom nonce manager, MEV protection)
-# Implement Flashbots or MEV-Share relay integration here as needed.
+import asyncio
+import heapq
+from typing import Dict, List, Optional, Set
+from web3 import AsyncWeb3
+from agent.utils.logger import get_logger
+
+log = get_logger(__name__)
+
+# Substrings of node errors that mean our local nonce view is behind the chain
+NONCE_TOO_LOW_ERRORS = ("nonce too low", "nonce has already been used", "invalid nonce")
+
+def is_nonce_too_low(exc: Exception) -> bool:
+    msg = str(exc).lower()
+    return any(s in msg for s in NONCE_TOO_LOW_ERRORS)
 
 class TxMiddleware:
-    pass
+    """
+    In-memory nonce manager for one sending account.
+
+    The pending nonce is read once; after that nonces are allocated locally under a lock so
+    concurrent submitters never collide and no RPC is spent per transaction. Nonces that were
+    allocated but never broadcast are released and handed out again first (a gap would stall
+    every later transaction). Broadcast nonces stay in-flight until reconcile() (run once per
+    head by the executor) sees them mined, so a replacement can reuse the nonce of the
+    transaction it replaces.
+    """
+
+    def __init__(self, address: str):
+        self.address = address
+        self._next: Optional[int] = None
+        self._released: List[int] = []
+        # Allocated, not yet broadcast
+        self._reserved: Set[int] = set()
+        self._lock = asyncio.Lock()
+        # nonce -> tx hash of the latest broadcast using it
+        self.in_flight: Dict[int, str] = {}
+
+    async def _load(self, w3: AsyncWeb3) -> None:
+        self._next = await w3.eth.get_transaction_count(self.address, "pending")
+        self._released.clear()
+        log.info("nonce.sync", address=self.address, next=self._next)
+
+    async def allocate(self, w3: AsyncWeb3) -> int:
+        async with self._lock:
+            if self._next is None:
+                await self._load(w3)
+            if self._released:
+                nonce = heapq.heappop(self._released)
+            else:
+                nonce = self._next
+                self._next += 1
+            self._reserved.add(nonce)
+            return nonce
+
+    def release(self, nonce: int) -> None:
+        """Return a nonce that was allocated but not broadcast."""
+        self._reserved.discard(nonce)
+        if nonce not in self.in_flight:
+            heapq.heappush(self._released, nonce)
+
+    def mark_sent(self, nonce: int, tx_hash: str) -> None:
+        self._reserved.discard(nonce)
+        self.in_flight[nonce] = tx_hash
+
+    def nonce_for(self, tx_hash: str) -> Optional[int]:
+        """In-flight nonce of a broadcast transaction, for building its replacement."""
+        for nonce, h in self.in_flight.items():
+            if h == tx_hash:
+                return nonce
+        return None
+
+    async def reconcile(self, w3: AsyncWeb3) -> List[int]:
+        """
+        Resync with the node after a nonce error and on every new head. Mined nonces leave
+        the in-flight set; nonces the node no longer has pending are reported as dropped and
+        become allocatable again (lowest first). In-flight nonces above one that was never
+        broadcast are queued behind it, not dropped. Nonces reserved by submitters that have
+        not broadcast yet are left alone. Returns the dropped nonces.
+        """
+        async with self._lock:
+            latest = await w3.eth.get_transaction_count(self.address, "latest")
+            pending = await w3.eth.get_transaction_count(self.address, "pending")
+            for n in [n for n in self.in_flight if n < latest]:
+                del self.in_flight[n]
+
+            dropped: List[int] = []
+            if self._next is None or pending >= self._next:
+                # Another sender used the account (or first sync): jump forward
+                self._next = pending
+                self._released = []
+            else:
+                # The node only counts a contiguous run as pending; anything past the first hole is queued
+                holes = [n for n in range(pending, self._next) if n not in self.in_flight]
+                first_hole = holes[0] if holes else self._next
+                dropped = [n for n in sorted(self.in_flight) if pending <= n < first_hole]
+                for n in dropped:
+                    del self.in_flight[n]
+                self._released = [
+                    n for n in range(pending, self._next) if n not in self._reserved and n not in self.in_flight
+                ]
+                heapq.heapify(self._released)
+            if dropped:
+                log.warning("nonce.dropped", address=self.address, nonces=dropped, next=self._next)
+            return dropped
+
+    async def claim_gaps(self) -> List[int]:
+        """
+        Released nonces that broadcast transactions are queued behind. They are reserved for
+        the caller, which must fill them (mark_sent) or hand them back (release).
+        """
+        async with self._lock:
+            if not self.in_flight:
+                return []
+            top = max(self.in_flight)
+            gaps = sorted(n for n in self._released if n < top)
+            if gaps:
+                self._released = [n for n in self._released if n >= top]
+                heapq.heapify(self._released)
+                self._reserved.update(gaps)
+            return gaps
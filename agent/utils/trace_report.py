@@ -0,0 +1,119 @@
+"""
+Latency attribution from trace files written by agent.utils.tracing.
+
+    python -m agent.utils.trace_report run/traces.jsonl [run/traces.jsonl.1 ...]
+
+Prints where critical-path time goes across all traces (which stages actually delayed
+each opportunity, not just how long they ran) and the time-to-submit distribution.
+"""
+import argparse
+import json
+from collections import defaultdict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+def load_traces(paths: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+def _children(spans: List[Dict[str, Any]]) -> Dict[int, List[Dict[str, Any]]]:
+    by_parent: Dict[int, List[Dict[str, Any]]] = defaultdict(list)
+    for s in spans:
+        by_parent[s["parent"]].append(s)
+    for kids in by_parent.values():
+        kids.sort(key=lambda s: s["end_ns"], reverse=True)
+    return by_parent
+
+def _walk(by_parent, node: int, label: str, start: int, end: int, out: List[Tuple[str, int]]) -> None:
+    # Walk backwards from `end`: the child finishing last gated completion, then whatever
+    # finished before it started, and so on. Uncovered time is the node's own ("self") time.
+    cursor = end
+    for kid in by_parent.get(node, []):
+        if kid["end_ns"] > cursor:
+            continue  # overlapped a child already on the path (ran concurrently)
+        if kid["end_ns"] <= start:
+            break
+        if cursor > kid["end_ns"]:
+            out.append((label, cursor - kid["end_ns"]))
+        _walk(by_parent, kid["id"], kid["name"], max(kid["start_ns"], start), kid["end_ns"], out)
+        cursor = max(kid["start_ns"], start)
+    if cursor > start:
+        out.append((label, cursor - start))
+
+def critical_path(trace: Dict[str, Any]) -> List[Tuple[str, int]]:
+    """[(span name, ns on the critical path)] in time order; "(untraced)" is uncovered root time."""
+    out: List[Tuple[str, int]] = []
+    _walk(_children(trace.get("spans", [])), 0, "(untraced)", trace["start_ns"], trace["end_ns"], out)
+    return list(reversed(out))
+
+def time_to_submit(trace: Dict[str, Any]) -> Optional[int]:
+    """ns from the delta's arrival to the end of the last send, or None if nothing was sent."""
+    sends = [s["end_ns"] for s in trace.get("spans", []) if s["name"] == "send"]
+    return max(sends) - trace["start_ns"] if sends else None
+
+def missed_block(trace: Dict[str, Any]) -> bool:
+    """True if the chain head had moved past the opportunity's block by the time it was sent."""
+    sends = [s for s in trace.get("spans", []) if s["name"] == "send"]
+    if not sends or trace.get("block") is None:
+        return False
+    last = max(sends, key=lambda s: s["end_ns"])
+    head = last.get("end_block", last.get("block"))
+    return head is not None and head > trace["block"]
+
+def _percentile(sorted_values: List[int], q: float) -> int:
+    idx = min(len(sorted_values) - 1, max(0, int(round(q / 100.0 * (len(sorted_values) - 1)))))
+    return sorted_values[idx]
+
+def summarize(traces: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    path_ns: Dict[str, int] = defaultdict(int)
+    outcomes: Dict[str, int] = defaultdict(int)
+    submit: List[int] = []
+    missed = total = 0
+    for trace in traces:
+        total += 1
+        outcomes[trace.get("outcome", "unknown")] += 1
+        for name, ns in critical_path(trace):
+            path_ns[name] += ns
+        tts = time_to_submit(trace)
+        if tts is not None:
+            submit.append(tts)
+            missed += missed_block(trace)
+    submit.sort()
+    return {
+        "traces": total,
+        "outcomes": dict(outcomes),
+        "critical_path_ns": dict(sorted(path_ns.items(), key=lambda kv: kv[1], reverse=True)),
+        "time_to_submit_ns": {
+            "count": len(submit),
+            **({f"p{q}": _percentile(submit, q) for q in (50, 90, 99)} if submit else {}),
+            **({"max": submit[-1]} if submit else {}),
+        },
+        "missed_block": missed,
+    }
+
+def _ms(ns: int) -> str:
+    return f"{ns / 1e6:10.2f} ms"
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("paths", nargs="+", help="trace JSONL files")
+    parser.add_argument("--top", type=int, default=15, help="critical-path entries to show")
+    args = parser.parse_args(argv)
+
+    report = summarize(load_traces(args.paths))
+    print(f"traces: {report['traces']}  outcomes: {report['outcomes']}")
+    total = sum(report["critical_path_ns"].values()) or 1
+    print("\ncritical path (summed over traces):")
+    for name, ns in list(report["critical_path_ns"].items())[:args.top]:
+        print(f"  {name:<24} {_ms(ns)}  {100.0 * ns / total:5.1f}%")
+    tts = report["time_to_submit_ns"]
+    print(f"\ntime to submit ({tts['count']} sent, {report['missed_block']} after the head moved on):")
+    for key in ("p50", "p90", "p99", "max"):
+        if key in tts:
+            print(f"  {key:<4} {_ms(tts[key])}")
+
+if __name__ == "__main__":
+    main()
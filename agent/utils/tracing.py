@@ -0,0 +1,203 @@
+import atexit
+import itertools
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from agent.utils.logger import QueueWriter
+from agent.utils.metrics import STAGE_SECONDS
+
+class Trace:
+    """Spans recorded while evaluating one opportunity. Times are time.monotonic_ns()."""
+
+    __slots__ = ("trace_id", "opportunity_id", "block", "start_ns", "wall_time", "attrs", "spans", "_ids")
+
+    def __init__(self, opportunity_id: str, block: Optional[int]):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.opportunity_id = opportunity_id
+        self.block = block
+        self.start_ns = time.monotonic_ns()
+        self.wall_time = time.time()
+        self.attrs: Dict[str, Any] = {}
+        self.spans: List[Dict[str, Any]] = []
+        self._ids = itertools.count(1)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "opportunity_id": self.opportunity_id,
+            "block": self.block,
+            "wall_time": self.wall_time,
+            "start_ns": self.start_ns,
+            "end_ns": time.monotonic_ns(),
+            **self.attrs,
+            "spans": self.spans,
+        }
+
+class RotatingFile:
+    """Append-only text file rotated to path.1 .. path.N once it exceeds max_bytes."""
+
+    def __init__(self, path: str, max_bytes: int, backups: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._f = open(path, "a", encoding="utf-8")
+
+    def write(self, s: str) -> None:
+        if self.max_bytes and self._f.tell() + len(s) > self.max_bytes and self._f.tell() > 0:
+            self._rotate()
+        self._f.write(s)
+
+    def _rotate(self) -> None:
+        self._f.close()
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        self._f = open(self.path, "w", encoding="utf-8")
+
+    def flush(self) -> None:
+        self._f.flush()
+
+    def close(self) -> None:
+        self._f.close()
+
+class Tracer:
+    """
+    Samples every Nth opportunity (rate 0.1 -> 1 in 10) and writes finished traces as JSON
+    lines from a background thread. `head` reports the chain head stamped on each span.
+    """
+
+    def __init__(self, path: str, sample_rate: float, max_bytes: int = 50 * 2**20, backups: int = 3,
+                 head: Optional[Callable[[], Optional[int]]] = None, max_open: int = 1024):
+        self.every = max(1, round(1 / sample_rate)) if sample_rate > 0 else 0
+        self.head = head or (lambda: None)
+        self.max_open = max_open
+        self._seen = 0
+        self._open: Dict[str, Trace] = {}
+        self._file = RotatingFile(path, max_bytes, backups) if self.every else None
+        self._writer = QueueWriter(self._file) if self._file is not None else None
+
+    def start(self, opportunity_id: str, block: Optional[int] = None) -> Optional[Trace]:
+        if not self.every:
+            return None
+        self._seen += 1
+        if (self._seen - 1) % self.every:
+            return None
+        trace = Trace(opportunity_id, block)
+        if len(self._open) >= self.max_open:
+            # Traces that were never picked up for evaluation
+            self._open.pop(next(iter(self._open)))
+        self._open[trace.trace_id] = trace
+        return trace
+
+    def claim(self, trace_id: Optional[str]) -> Optional[Trace]:
+        return self._open.pop(trace_id, None) if trace_id else None
+
+    def finish(self, trace: Trace) -> None:
+        if self._writer is not None:
+            self._writer.put(trace.as_dict())
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.stop()
+            self._file.close()
+
+_tracer: Optional[Tracer] = None
+_trace: ContextVar[Optional[Trace]] = ContextVar("trace", default=None)
+_parent: ContextVar[int] = ContextVar("trace_parent", default=0)
+
+def configure_tracing(path: str, sample_rate: float, max_bytes: int = 50 * 2**20, backups: int = 3,
+                      head: Optional[Callable[[], Optional[int]]] = None) -> Optional[Tracer]:
+    global _tracer
+    if _tracer is not None:
+        _tracer.close()
+    _tracer = Tracer(path, sample_rate, max_bytes, backups, head) if sample_rate > 0 else None
+    return _tracer
+
+def start_trace(opportunity_id: str, block: Optional[int] = None) -> Optional[Trace]:
+    """Opens a trace if this opportunity is sampled. Record into it under activate()."""
+    return _tracer.start(opportunity_id, block) if _tracer is not None else None
+
+def discard_trace(trace: Optional[Trace]) -> None:
+    if trace is not None and _tracer is not None:
+        _tracer.claim(trace.trace_id)
+
+@contextmanager
+def activate(trace: Optional[Trace]) -> Iterator[None]:
+    """Makes `trace` current for the block (and for tasks created inside it)."""
+    if trace is None:
+        yield
+        return
+    token = _trace.set(trace)
+    try:
+        yield
+    finally:
+        _trace.reset(token)
+
+@contextmanager
+def resume(trace_id: Optional[str]) -> Iterator[Optional[Trace]]:
+    """Continues a trace opened by start_trace() elsewhere, then writes it out."""
+    trace = _tracer.claim(trace_id) if _tracer is not None else None
+    if trace is None:
+        yield None
+        return
+    try:
+        with activate(trace):
+            yield trace
+    finally:
+        _tracer.finish(trace)
+
+def annotate(**attrs: Any) -> None:
+    """Adds attributes to the current trace (no-op when untraced)."""
+    trace = _trace.get()
+    if trace is not None:
+        trace.attrs.update(attrs)
+
+@contextmanager
+def span(name: str, kind: str = "stage", **attrs: Any) -> Iterator[None]:
+    trace = _trace.get()
+    if trace is None:
+        yield
+        return
+    span_id = next(trace._ids)
+    head = _tracer.head if _tracer is not None else (lambda: None)
+    record = {"id": span_id, "parent": _parent.get(), "name": name, "kind": kind, "block": head(), **attrs}
+    token = _parent.set(span_id)
+    record["start_ns"] = time.monotonic_ns()
+    try:
+        yield
+    except BaseException as e:
+        record["error"] = type(e).__name__
+        raise
+    finally:
+        record["end_ns"] = time.monotonic_ns()
+        _parent.reset(token)
+        end_block = head()
+        if end_block != record["block"]:
+            record["end_block"] = end_block
+        trace.spans.append(record)
+
+@contextmanager
+def stage(name: str, **attrs: Any) -> Iterator[None]:
+    """A pipeline stage: always timed into STAGE_SECONDS, and recorded as a span when traced."""
+    with STAGE_SECONDS.time(stage=name), span(name, **attrs):
+        yield
+
+async def async_trace_middleware(make_request, w3):
+    """web3 async middleware: one "rpc" span per request made from a traced context."""
+    async def middleware(method, params):
+        if _trace.get() is None:
+            return await make_request(method, params)
+        with span(method, kind="rpc"):
+            return await make_request(method, params)
+    return middleware
+
+@atexit.register
+def _close() -> None:
+    if _tracer is not None:
+        _tracer.close()
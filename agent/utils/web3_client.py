@@ -1,11 +1,608 @@
-from web3 import Web3
-from web3.middleware import geth_poa_middleware
+import asyncio
+import atexit
+import bisect
+import gzip
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Sequence, Set, Tuple
+from urllib.parse import urlsplit
+import aiohttp
+from web3 import AsyncWeb3, Web3
+from web3.middleware import async_geth_poa_middleware, geth_poa_middleware
+from web3.providers.async_base import AsyncJSONBaseProvider
+from web3.providers.base import JSONBaseProvider
+from web3._utils.encoding import FriendlyJsonSerde, Web3JsonEncoder
+from web3.types import RPCEndpoint, RPCResponse
 from agent.config import Settings
+from agent.utils.logger import get_logger
+from agent.utils.metrics import RPC_CALLS, RPC_REQUESTS, RPC_SECONDS
+from agent.utils.tracing import async_trace_middleware
+
+log = get_logger(__name__)
+
+POA_CHAIN_IDS = (5, 10, 56, 100, 137, 250, 42161, 43114, 8453, 1101)
+
+# Never duplicated by hedging (failover after a transport error is still allowed)
+NON_IDEMPOTENT_METHODS = frozenset({"eth_sendRawTransaction", "eth_sendTransaction"})
 
 def build_web3(settings: Settings) -> Web3:
-    w3 = Web3(Web3.HTTPProvider(settings.RPC_HTTP_URL, request_kwargs={"timeout": 30}))
-        if settings.CHAIN_ID in (5, 10, 56, 100, 137, 250, 42161, 43114, 8453, 1101):
-                # Some chains need POA middleware
-                        w3.middleware_onion.inject(geth_poa_middleware, layer=0)
-                            return w3
-    
\ No newline at end of file
+    tape = rpc_tape(settings)
+    if settings.RPC_REPLAY_FILE:
+        # Everything is answered from the recording; no endpoint is contacted
+        provider = SyncReplayRPCProvider(tape)
+    else:
+        provider = Web3.HTTPProvider(settings.RPC_HTTP_URL, request_kwargs={"timeout": 30})
+        if tape is not None:
+            provider = SyncRecordingRPCProvider(provider, tape)
+    w3 = Web3(provider)
+    if settings.CHAIN_ID in POA_CHAIN_IDS:
+        # Some chains need POA middleware
+        w3.middleware_onion.inject(geth_poa_middleware, layer=0)
+    return w3
+
+def rpc_urls(settings: Settings) -> List[str]:
+    urls = [settings.RPC_HTTP_URL] + [u.strip() for u in settings.MULTI_RPC_HTTP_URLS.split(",")]
+    return list(dict.fromkeys(u for u in urls if u))
+
+def build_async_web3(settings: Settings) -> AsyncWeb3:
+    # aiohttp-backed provider for the evaluation hot path; keeps the event loop free during RPCs
+    tape = rpc_tape(settings)
+    if settings.RPC_REPLAY_FILE:
+        # Everything is answered from the recording; no endpoint is contacted
+        provider = ReplayRPCProvider(tape)
+    else:
+        urls = rpc_urls(settings)
+        if len(urls) > 1 or settings.RPC_BATCHING:
+            provider = HedgedRPCProvider(urls, hedge_percentile=settings.RPC_HEDGE_PERCENTILE)
+            if settings.RPC_BATCHING:
+                provider = BatchingRPCProvider(provider, window=settings.RPC_BATCH_WINDOW_MS / 1000.0)
+        else:
+            provider = AsyncWeb3.AsyncHTTPProvider(settings.RPC_HTTP_URL, request_kwargs={"timeout": 30})
+        if tape is not None:
+            provider = RecordingRPCProvider(provider, tape)
+    w3 = AsyncWeb3(provider)
+    if settings.CHAIN_ID in POA_CHAIN_IDS:
+        w3.middleware_onion.inject(async_geth_poa_middleware, layer=0)
+    # Per-request spans for traced opportunities; a context-variable check otherwise
+    w3.middleware_onion.add(async_trace_middleware, "trace")
+    return w3
+
+class EndpointStats:
+    """Latency and error EWMAs plus a sample window (for hedge delays) for one RPC endpoint."""
+
+    def __init__(self, url: str, alpha: float = 0.2, window: int = 256):
+        self.url = url
+        # Metrics label: host only, so API keys in the path never end up in a scrape
+        self.label = urlsplit(url).netloc or url
+        self.alpha = alpha
+        self.latency_ewma: Optional[float] = None
+        self.error_ewma = 0.0
+        self.samples: Deque[float] = deque(maxlen=window)
+        self.down_until = 0.0
+
+    def record(self, ok: bool, latency: float, cooldown: float) -> None:
+        self.error_ewma += self.alpha * ((0.0 if ok else 1.0) - self.error_ewma)
+        if ok:
+            self.samples.append(latency)
+            self.latency_ewma = latency if self.latency_ewma is None else (
+                self.latency_ewma + self.alpha * (latency - self.latency_ewma)
+            )
+        elif self.error_ewma > 0.5:
+            self.down_until = time.monotonic() + cooldown
+
+    def record_lower_bound(self, elapsed: float) -> None:
+        """An unanswered request took at least `elapsed`: only ever raises the latency EWMA."""
+        if self.latency_ewma is None or elapsed > self.latency_ewma:
+            self.latency_ewma = elapsed if self.latency_ewma is None else (
+                self.latency_ewma + self.alpha * (elapsed - self.latency_ewma)
+            )
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.down_until
+
+    def score(self) -> float:
+        # Unmeasured endpoints rank first so every node gets sampled
+        if self.latency_ewma is None:
+            return 0.0
+        return self.latency_ewma * (1.0 + 4.0 * self.error_ewma)
+
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        if len(self.samples) < 8:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percentile / 100.0))]
+
+class HedgedRPCProvider(AsyncJSONBaseProvider):
+    """
+    Async JSON-RPC provider over several endpoints.
+
+    Requests go to the endpoint with the best latency/error EWMA score (healthy ones first).
+    If it has not answered within its own `hedge_percentile` latency, the same request is
+    also sent to the next-best endpoint and the first successful answer wins; the loser is
+    cancelled. Transport failures fail over down the ranking. All endpoints share one
+    keep-alive aiohttp session, so steady-state requests skip TCP/TLS setup.
+    """
+
+    def __init__(
+        self,
+        urls: Sequence[str],
+        timeout: float = 10.0,
+        hedge_percentile: float = 90.0,
+        min_hedge_delay: float = 0.02,
+        default_hedge_delay: float = 0.25,
+        max_hedges: int = 1,
+        cooldown: float = 5.0,
+    ):
+        super().__init__()
+        if not urls:
+            raise ValueError("HedgedRPCProvider needs at least one endpoint")
+        self.endpoints = [EndpointStats(u) for u in urls]
+        self.timeout = timeout
+        self.hedge_percentile = hedge_percentile
+        self.min_hedge_delay = min_hedge_delay
+        self.default_hedge_delay = default_hedge_delay
+        self.max_hedges = max_hedges
+        self.cooldown = cooldown
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def __str__(self) -> str:
+        return f"HedgedRPCProvider({', '.join(e.url for e in self.endpoints)})"
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit_per_host=32, keepalive_timeout=60, ttl_dns_cache=300),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={"Content-Type": "application/json"},
+            )
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+
+    def ranked(self) -> List[EndpointStats]:
+        by_score = sorted(self.endpoints, key=lambda e: e.score())
+        return [e for e in by_score if e.healthy] + [e for e in by_score if not e.healthy]
+
+    def hedge_delay(self, endpoint: EndpointStats) -> float:
+        p = endpoint.latency_percentile(self.hedge_percentile)
+        return self.default_hedge_delay if p is None else max(self.min_hedge_delay, p)
+
+    async def _post(self, endpoint: EndpointStats, body: bytes, method: str) -> Any:
+        start = time.perf_counter()
+        try:
+            async with self._get_session().post(endpoint.url, data=body) as resp:
+                resp.raise_for_status()
+                raw = await resp.read()
+        except asyncio.CancelledError:
+            # Lost a hedge race: accounted for by post_raw, not an endpoint error
+            RPC_REQUESTS.inc(method=method, endpoint=endpoint.label, outcome="cancelled")
+            raise
+        except Exception:
+            elapsed = time.perf_counter() - start
+            endpoint.record(False, elapsed, self.cooldown)
+            RPC_REQUESTS.inc(method=method, endpoint=endpoint.label, outcome="error")
+            RPC_SECONDS.observe(elapsed, method=method, endpoint=endpoint.label)
+            raise
+        elapsed = time.perf_counter() - start
+        endpoint.record(True, elapsed, self.cooldown)
+        RPC_REQUESTS.inc(method=method, endpoint=endpoint.label, outcome="ok")
+        RPC_SECONDS.observe(elapsed, method=method, endpoint=endpoint.label)
+        return self.decode_rpc_response(raw)
+
+    async def post_raw(self, body: bytes, hedge: bool = True, method: str = "batch") -> Any:
+        """
+        Send an encoded JSON-RPC payload with ranking, hedging and failover; returns decoded JSON.
+        `method` only labels metrics.
+        """
+        queue = self.ranked()
+        hedges_left = self.max_hedges if hedge else 0
+        inflight: Dict[asyncio.Task, EndpointStats] = {}
+        started: Dict[asyncio.Task, float] = {}
+        last_error: Optional[BaseException] = None
+        cancelled = False
+
+        def launch() -> None:
+            ep = queue.pop(0)
+            task = asyncio.create_task(self._post(ep, body, method))
+            inflight[task] = ep
+            started[task] = time.perf_counter()
+
+        launch()
+        try:
+            while inflight:
+                delay = None
+                if hedges_left and queue:
+                    delay = self.hedge_delay(next(iter(inflight.values())))
+                done, _ = await asyncio.wait(inflight, timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedges_left -= 1
+                    log.debug("rpc.hedge", slow=next(iter(inflight.values())).url, hedge=queue[0].url)
+                    launch()
+                    continue
+                for task in done:
+                    ep = inflight.pop(task)
+                    if task.exception() is None:
+                        return task.result()
+                    last_error = task.exception()
+                    log.warning("rpc.endpoint_error", url=ep.url, msg=str(last_error))
+                if not inflight and queue:
+                    launch()
+            raise last_error
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+        finally:
+            for task, ep in inflight.items():
+                # A hedge loser took at least the time it was given; it neither succeeded nor
+                # failed, and its truncated latency stays out of the hedge-delay samples. A
+                # cancelled caller says nothing about the endpoints, so record nothing.
+                if not cancelled:
+                    ep.record_lower_bound(time.perf_counter() - started[task])
+                task.cancel()
+
+    async def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        body = self.encode_rpc_request(method, params)
+        return await self.post_raw(body, hedge=method not in NON_IDEMPOTENT_METHODS, method=method)
+
+def _fail_unanswered(items: List[Tuple[Dict[str, Any], asyncio.Future]], error: Optional[BaseException]) -> None:
+    """Resolves the futures a dispatch left unanswered, so their callers never wait forever."""
+    for payload, fut in items:
+        if fut.done():
+            continue
+        if isinstance(error, asyncio.CancelledError):
+            fut.cancel()
+        else:
+            fut.set_exception(error or RuntimeError(f"{payload['method']}: batch dispatch ended without an answer"))
+
+class RPCBatch:
+    """Explicit batch: queue calls with add(), they are sent as one JSON-RPC array on exit."""
+
+    def __init__(self, provider: "BatchingRPCProvider"):
+        self._provider = provider
+        self._items: List[Tuple[Dict[str, Any], asyncio.Future]] = []
+        self._results: List[asyncio.Future] = []
+
+    def add(self, method: str, params: Any = None) -> asyncio.Future:
+        """Returns a future resolving to the call's `result` (ValueError on a JSON-RPC error)."""
+        RPC_CALLS.inc(method=method)
+        loop = asyncio.get_running_loop()
+        raw, result = loop.create_future(), loop.create_future()
+        self._items.append((self._provider._payload(method, params), raw))
+        self._results.append(result)
+        return result
+
+    async def __aenter__(self) -> "RPCBatch":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        if exc_type is not None:
+            return
+        try:
+            await self._provider._dispatch(self._items)
+        finally:
+            _fail_unanswered(self._items, None)
+        for (_, raw), result in zip(self._items, self._results):
+            if raw.exception() is not None:
+                result.set_exception(raw.exception())
+            elif "error" in raw.result():
+                result.set_exception(ValueError(raw.result()["error"]))
+            else:
+                result.set_result(raw.result().get("result"))
+
+class BatchingRPCProvider(AsyncJSONBaseProvider):
+    """
+    Coalesces concurrent JSON-RPC requests into batch arrays over a HedgedRPCProvider transport.
+
+    Requests issued within `window` seconds of each other (0 = the same event-loop turn) are
+    sent as one array and demultiplexed by id. Sends are never batched. If the node answers a
+    batch with something other than an array, or batches keep failing, batching is switched
+    off and requests go out one per POST. batch() gives explicit control for calls Multicall
+    cannot aggregate (eth_getLogs, eth_getBlockByNumber, eth_getTransactionCount, ...).
+    """
+
+    def __init__(self, transport: HedgedRPCProvider, window: float = 0.0, max_batch: int = 100):
+        super().__init__()
+        self.transport = transport
+        self.window = window
+        self.max_batch = max_batch
+        self.batch_supported = True
+        self._batch_failures = 0
+        self._pending: List[Tuple[Dict[str, Any], asyncio.Future]] = []
+        self._flush_scheduled = False
+        # The loop only holds tasks weakly: keep in-flight dispatches alive until they finish
+        self._dispatches: Set[asyncio.Task] = set()
+        self._ids = itertools.count()
+
+    def __str__(self) -> str:
+        return f"BatchingRPCProvider({self.transport})"
+
+    def _payload(self, method: str, params: Any) -> Dict[str, Any]:
+        return {"jsonrpc": "2.0", "method": method, "params": params or [], "id": next(self._ids)}
+
+    def _encode(self, obj: Any) -> bytes:
+        return FriendlyJsonSerde().json_encode(obj, cls=Web3JsonEncoder).encode()
+
+    def batch(self) -> RPCBatch:
+        return RPCBatch(self)
+
+    async def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        RPC_CALLS.inc(method=method)
+        if method in NON_IDEMPOTENT_METHODS:
+            return await self.transport.make_request(method, params)
+        fut = asyncio.get_running_loop().create_future()
+        self._pending.append((self._payload(method, params), fut))
+        if len(self._pending) >= self.max_batch:
+            self._start_flush()
+        elif not self._flush_scheduled:
+            self._flush_scheduled = True
+            loop = asyncio.get_running_loop()
+            if self.window > 0:
+                loop.call_later(self.window, self._start_flush)
+            else:
+                loop.call_soon(self._start_flush)
+        return await fut
+
+    def _start_flush(self) -> None:
+        self._flush_scheduled = False
+        pending, self._pending = self._pending, []
+        if pending:
+            task = asyncio.ensure_future(self._dispatch(pending))
+            self._dispatches.add(task)
+            task.add_done_callback(lambda t: self._dispatch_done(t, pending))
+
+    def _dispatch_done(self, task: asyncio.Task, items: List[Tuple[Dict[str, Any], asyncio.Future]]) -> None:
+        self._dispatches.discard(task)
+        error = asyncio.CancelledError() if task.cancelled() else task.exception()
+        if error is not None and not isinstance(error, asyncio.CancelledError):
+            log.warning("rpc.dispatch_failed", size=len(items), msg=str(error))
+        _fail_unanswered(items, error)
+
+    async def _dispatch(self, items: List[Tuple[Dict[str, Any], asyncio.Future]]) -> None:
+        if len(items) == 1 or not self.batch_supported:
+            await asyncio.gather(*(self._send_one(p, f) for p, f in items))
+            return
+        chunks = [items[i:i + self.max_batch] for i in range(0, len(items), self.max_batch)]
+        await asyncio.gather(*(self._send_batch(c) for c in chunks))
+
+    async def _send_one(self, payload: Dict[str, Any], fut: asyncio.Future) -> None:
+        try:
+            resp = await self.transport.post_raw(self._encode(payload), method=payload["method"])
+        except Exception as e:
+            if not fut.done():
+                fut.set_exception(e)
+            return
+        if not fut.done():
+            fut.set_result(resp)
+
+    async def _send_batch(self, items: List[Tuple[Dict[str, Any], asyncio.Future]]) -> None:
+        try:
+            resp = await self.transport.post_raw(self._encode([p for p, _ in items]))
+        except Exception as e:
+            self._batch_failures += 1
+            if self._batch_failures >= 3:
+                self.batch_supported = False
+            log.warning("rpc.batch_failed", size=len(items), msg=str(e), batching=self.batch_supported)
+            await asyncio.gather(*(self._send_one(p, f) for p, f in items))
+            return
+
+        if not isinstance(resp, list):
+            # e.g. {"error": {"message": "batch requests are not supported"}}
+            self.batch_supported = False
+            log.warning("rpc.batch_rejected", response=str(resp)[:200])
+            await asyncio.gather(*(self._send_one(p, f) for p, f in items))
+            return
+
+        self._batch_failures = 0
+        by_id = {r.get("id"): r for r in resp if isinstance(r, dict)}
+        missing = []
+        for payload, fut in items:
+            r = by_id.get(payload["id"])
+            if r is None:
+                missing.append((payload, fut))
+            elif not fut.done():
+                fut.set_result(r)
+        if missing:
+            await asyncio.gather(*(self._send_one(p, f) for p, f in missing))
+
+def _block_of(value: Any) -> Optional[int]:
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str) and value.startswith("0x"):
+        return int(value, 16)
+    return None
+
+class RPCTape:
+    """
+    Append-only recording of JSON-RPC answers for replay (one JSON object per line,
+    gzip-compressed when the path ends in .gz).
+
+    Answers are keyed by method, params and the chain head the caller had last seen (from
+    eth_blockNumber or eth_getBlockByNumber("latest")), so "latest"-relative calls replay
+    as they were answered at that head. The same key asked repeatedly replays its answers
+    in order and then keeps returning the last one. A key never asked at the current head
+    is answered as it was at the nearest earlier head (e.g. eth_chainId).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.head: Optional[int] = None
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._file: Optional[Any] = None
+        # (method, params) -> {head: [response, ...]}; heads kept sorted for lookup
+        self._answers: Dict[Tuple[str, str], Dict[int, List[Dict[str, Any]]]] = {}
+        self._heads: Dict[Tuple[str, str], List[int]] = {}
+        self._served: Dict[Tuple[str, str, int], int] = {}
+
+    def _open(self, mode: str):
+        if self.path.endswith(".gz"):
+            return gzip.open(self.path, mode + "t", encoding="utf-8")
+        return open(self.path, mode, encoding="utf-8")
+
+    @staticmethod
+    def _params_key(params: Any) -> str:
+        return json.dumps(params or [], cls=Web3JsonEncoder, sort_keys=True, separators=(",", ":"))
+
+    def observe(self, method: str, params: Any, response: Dict[str, Any]) -> None:
+        """Advances the head from responses that report it."""
+        result = response.get("result") if isinstance(response, dict) else None
+        if method == "eth_blockNumber":
+            head = _block_of(result)
+        elif method == "eth_getBlockByNumber" and params and params[0] == "latest" and isinstance(result, dict):
+            head = _block_of(result.get("number"))
+        else:
+            return
+        if head is not None:
+            self.head = head
+
+    # Recording
+
+    def record(self, method: str, params: Any, response: Dict[str, Any]) -> None:
+        entry: Dict[str, Any] = {"m": method, "p": params or [], "b": self.head}
+        if "error" in response:
+            entry["e"] = response["error"]
+        else:
+            entry["r"] = response.get("result")
+        line = json.dumps(entry, cls=Web3JsonEncoder, separators=(",", ":")) + "\n"
+        with self._lock:
+            if self._file is None:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                self._file = self._open("a")
+            self._file.write(line)
+            self.observe(method, params, response)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    # Replay
+
+    def load(self) -> "RPCTape":
+        with self._open("r") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                key = (entry["m"], self._params_key(entry["p"]))
+                head = entry["b"] if entry["b"] is not None else -1
+                by_head = self._answers.setdefault(key, {})
+                if head not in by_head:
+                    by_head[head] = []
+                    bisect.insort(self._heads.setdefault(key, []), head)
+                by_head[head].append({"error": entry["e"]} if "e" in entry else {"result": entry.get("r")})
+        log.info("rpc.tape_loaded", path=self.path, keys=len(self._answers))
+        return self
+
+    def answer(self, method: str, params: Any, request_id: int = 0) -> Dict[str, Any]:
+        key = (method, self._params_key(params))
+        heads = self._heads.get(key)
+        with self._lock:
+            if not heads:
+                self.misses += 1
+                if method == "eth_sendRawTransaction" and params:
+                    # A replayed pipeline may build different transactions: acknowledge, never broadcast
+                    return {"jsonrpc": "2.0", "id": request_id, "result": Web3.to_hex(Web3.keccak(hexstr=params[0]))}
+                log.warning("rpc.replay_miss", method=method, head=self.head)
+                return {"jsonrpc": "2.0", "id": request_id,
+                        "error": {"code": -32000, "message": f"{method} not in recording {self.path}"}}
+            current = self.head if self.head is not None else -1
+            i = bisect.bisect_right(heads, current)
+            head = heads[i - 1] if i else heads[0]
+            answers = self._answers[key][head]
+            served = self._served.get((*key, head), 0)
+            self._served[(*key, head)] = served + 1
+            response = {"jsonrpc": "2.0", "id": request_id, **answers[min(served, len(answers) - 1)]}
+            self.observe(method, params, response)
+        return response
+
+class RecordingRPCProvider(AsyncJSONBaseProvider):
+    """Passes requests to `inner` and appends every answer to the tape."""
+
+    def __init__(self, inner: Any, tape: RPCTape):
+        super().__init__()
+        self.inner = inner
+        self.tape = tape
+        # Keep the wrapped provider's own middlewares (e.g. retries) in front of it
+        self.middlewares = inner.middlewares
+
+    def __str__(self) -> str:
+        return f"RecordingRPCProvider({self.inner} -> {self.tape.path})"
+
+    async def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        response = await self.inner.make_request(method, params)
+        self.tape.record(method, params, response)
+        return response
+
+class ReplayRPCProvider(AsyncJSONBaseProvider):
+    """Answers from a loaded tape; no network, no waiting."""
+
+    def __init__(self, tape: RPCTape):
+        super().__init__()
+        self.tape = tape
+        self._ids = itertools.count()
+
+    def __str__(self) -> str:
+        return f"ReplayRPCProvider({self.tape.path})"
+
+    async def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        return self.tape.answer(method, params, next(self._ids))
+
+    async def is_connected(self, show_traceback: bool = False) -> bool:
+        return True
+
+class SyncRecordingRPCProvider(JSONBaseProvider):
+    """RecordingRPCProvider for the synchronous Web3 client."""
+
+    def __init__(self, inner: Any, tape: RPCTape):
+        super().__init__()
+        self.inner = inner
+        self.tape = tape
+        # Keep the wrapped provider's own middlewares (e.g. retries) in front of it
+        self.middlewares = inner.middlewares
+
+    def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        response = self.inner.make_request(method, params)
+        self.tape.record(method, params, response)
+        return response
+
+class SyncReplayRPCProvider(JSONBaseProvider):
+    """ReplayRPCProvider for the synchronous Web3 client."""
+
+    def __init__(self, tape: RPCTape):
+        super().__init__()
+        self.tape = tape
+        self._ids = itertools.count()
+
+    def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        return self.tape.answer(method, params, next(self._ids))
+
+    def is_connected(self, show_traceback: bool = False) -> bool:
+        return True
+
+# One tape per file, shared by the sync and async clients of a process
+_tapes: Dict[Tuple[str, bool], RPCTape] = {}
+
+def rpc_tape(settings: Settings) -> Optional[RPCTape]:
+    """The tape configured by RPC_REPLAY_FILE (loaded) or RPC_RECORD_FILE, if any."""
+    replay = bool(settings.RPC_REPLAY_FILE)
+    path = settings.RPC_REPLAY_FILE or settings.RPC_RECORD_FILE
+    if not path:
+        return None
+    if (path, replay) not in _tapes:
+        tape = RPCTape(path)
+        _tapes[(path, replay)] = tape.load() if replay else tape
+    return _tapes[(path, replay)]
+
+@atexit.register
+def _close_tapes() -> None:
+    for tape in _tapes.values():
+        tape.close()
@@ -1,5 +1,8 @@
 import json
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse
@@ -19,12 +22,43 @@ USE_FLASHBOTS_FOR_ADMIN = os.getenv("USE_FLASHBOTS_FOR_ADMIN", "false").lower()
 PRIVATE_KEY = os.getenv("PRIVATE_KEY", "")
 PUBLIC_ADDRESS = os.getenv("PUBLIC_ADDRESS", "")
 app = FastAPI(title="Flashloan AI Agent Panel")
+_W3_BY_URL: dict = {}
+_PROBE_BY_URL: dict = {}
+_BEST = {"url": None, "at": float("-inf")}
+_RANKING = threading.Lock()
+BEST_RPC_TTL_SECONDS = 60.0
+RPC_PROBE_TIMEOUT_SECONDS = 2.0
+def _w3_for(url: str) -> Web3:
+    # One provider per URL so its HTTP session (keep-alive) is reused across requests
+    if url not in _W3_BY_URL:
+        _W3_BY_URL[url] = Web3(Web3.HTTPProvider(url, request_kwargs={"timeout": 20}))
+    return _W3_BY_URL[url]
+def _probe(url: str) -> float:
+    # eth_blockNumber round trip on a short-timeout provider; unreachable endpoints sort last
+    if url not in _PROBE_BY_URL:
+        _PROBE_BY_URL[url] = Web3(Web3.HTTPProvider(url, request_kwargs={"timeout": RPC_PROBE_TIMEOUT_SECONDS}))
+    start = time.perf_counter()
+    try:
+        _PROBE_BY_URL[url].eth.block_number
+        return time.perf_counter() - start
+    except Exception:
+        return float("inf")
+def _rank_rpcs() -> None:
+    try:
+        with ThreadPoolExecutor(max_workers=len(RPCS)) as pool:
+            latencies = dict(zip(RPCS, pool.map(_probe, RPCS)))
+        _BEST["url"] = min(RPCS, key=latencies.__getitem__)
+    finally:
+        _BEST["at"] = time.monotonic()
+        _RANKING.release()
 def get_best_w3() -> Web3:
     if not RPCS:
         raise RuntimeError("No RPC configured. Set MULTI_RPC_HTTP_URLS or RPC_HTTP_URL")
-    best_url = RPCS[0]
-    w3 = Web3(Web3.HTTPProvider(best_url, request_kwargs={"timeout": 20}))
-    return w3
+    stale = time.monotonic() - _BEST["at"] > BEST_RPC_TTL_SECONDS
+    if len(RPCS) > 1 and stale and _RANKING.acquire(blocking=False):
+        # Re-rank off the request path; requests keep the current pick until it finishes
+        threading.Thread(target=_rank_rpcs, name="rpc-rank", daemon=True).start()
+    return _w3_for(_BEST["url"] or RPCS[0])
 def get_sender_w3() -> Web3:
     if USE_FLASHBOTS_FOR_ADMIN:
         return Web3(Web3.HTTPProvider(FLASHBOTS_RELAY_URL, request_kwargs={"timeout": 20}))
@@ -0,0 +1,70 @@
+import asyncio
+import json
+import pytest
+from agent.ai.client import AIClient
+from agent.ai.providers import AIProvider
+
+class PartialProvider(AIProvider):
+    """Answers a batch but drops the first item and returns a broken second item."""
+
+    name = "partial"
+    model = "m"
+
+    def __init__(self):
+        self.calls = []
+
+    async def complete(self, system_prompt, user_input):
+        items = json.loads(user_input)["items"]
+        self.calls.append(items)
+        results = [{"id": items[1]["id"], "result": {"paths": []}}] if len(items) > 1 else []
+        for item in items[2:]:
+            results.append({"id": item["id"], "result": {"opportunity_id": item["input"]["name"], "confidence": 0.7}})
+        return json.dumps({"results": list(reversed(results))})
+
+@pytest.mark.asyncio
+async def test_batch_aligns_results_and_tolerates_partial_failure(settings):
+    provider = PartialProvider()
+    client = AIClient(settings, provider=provider)
+    snapshots = [{"name": n} for n in ("a", "b", "c", "d")] + [{"name": "c"}]
+
+    results = await client.analyze_arbitrage_batch(snapshots)
+    assert len(provider.calls) == 1 and len(provider.calls[0]) == 4  # duplicate "c" sent once
+    assert results[0] is None and results[1] is None
+    assert [r.opportunity_id for r in results[2:]] == ["c", "d", "c"]
+
+    # Successful items are memoized for both single and batch calls
+    assert (await client.analyze_arbitrage_async({"name": "d"})).opportunity_id == "d"
+    await client.analyze_arbitrage_batch([{"name": "c"}, {"name": "d"}])
+    assert len(provider.calls) == 1
+
+class FlakyChunkProvider(AIProvider):
+    """Fails any chunk holding "boom" and garbles any chunk holding "junk"."""
+
+    name = "flaky"
+    model = "m"
+
+    async def complete(self, system_prompt, user_input):
+        items = json.loads(user_input)["items"]
+        names = [item["input"]["name"] for item in items]
+        if "boom" in names:
+            raise RuntimeError("HTTP 502")
+        if "junk" in names:
+            return "not json"
+        return json.dumps({"results": [
+            {"id": item["id"], "result": {"opportunity_id": item["input"]["name"], "confidence": 0.5}} for item in items
+        ]})
+
+@pytest.mark.asyncio
+async def test_failed_chunk_only_loses_its_own_items(settings):
+    client = AIClient(settings.model_copy(update={"AI_BATCH_SIZE": 2}), provider=FlakyChunkProvider())
+    names = ["a", "boom", "b", "c", "junk", "d"]
+
+    results = await client.analyze_arbitrage_batch([{"name": n} for n in names])
+    assert [r.opportunity_id if r else None for r in results] == [None, None, "b", "c", None, None]
+
+def test_stub_provider_answers_batches(settings):
+    client = AIClient(settings)
+    analyses = asyncio.run(client.analyze_arbitrage_batch([{"block": 1}, {"block": 2}]))
+    decisions = asyncio.run(client.assess_and_decide_batch([a.model_dump() for a in analyses]))
+    assert [a.opportunity_id for a in analyses] == ["stub-1", "stub-1"]
+    assert all(d.execute is False for d in decisions)
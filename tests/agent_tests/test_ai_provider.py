@@ -0,0 +1,151 @@
+import asyncio
+import gc
+import json
+import threading
+import warnings
+import pytest
+from aiohttp import web
+from agent.ai.client import AIClient
+from agent.ai.providers import AnthropicProvider, OpenAICompatibleProvider
+from agent.ai.streaming import consume_stream, risk_verdict
+
+async def _stand_in(delay: float = 0.0):
+    requests = []
+
+    async def chat(request):
+        body = await request.json()
+        requests.append((request.path, dict(request.headers), body))
+        await asyncio.sleep(delay)
+        content = json.dumps({"opportunity_id": "local-1", "paths": [], "confidence": 0.5})
+        if request.path == "/v1/messages":
+            return web.json_response({"content": [{"type": "text", "text": content}]})
+        return web.json_response({"choices": [{"message": {"role": "assistant", "content": content}}]})
+
+    app = web.Application()
+    app.router.add_post("/chat/completions", chat)
+    app.router.add_post("/v1/messages", chat)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    return runner, f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}", requests
+
+@pytest.mark.asyncio
+async def test_openai_compatible_calls_are_memoized(settings):
+    runner, url, requests = await _stand_in()
+    client = AIClient(settings, provider=OpenAICompatibleProvider("sk-test", "m", base_url=url))
+    try:
+        snapshot = {"block_number": 1, "pools": {"0xa": [1, 2]}}
+        first = await client.analyze_arbitrage_async(snapshot)
+        # Same state with a different key order hashes identically
+        second = await client.analyze_arbitrage_async({"pools": {"0xa": [1, 2]}, "block_number": 1})
+        assert first.opportunity_id == "local-1" and second is first
+        assert len(requests) == 1
+        path, headers, body = requests[0]
+        assert headers["Authorization"] == "Bearer sk-test"
+        assert body["messages"][0]["content"].startswith("System: Arbitrage Analysis")
+
+        await client.analyze_arbitrage_async({"block_number": 2, "pools": {}})
+        assert len(requests) == 2
+    finally:
+        await client.close()
+        await runner.cleanup()
+
+@pytest.mark.asyncio
+async def test_anthropic_provider_and_deadline(settings):
+    runner, url, requests = await _stand_in(delay=0.2)
+    client = AIClient(settings, provider=AnthropicProvider("key", "m", base_url=url))
+    try:
+        with pytest.raises(asyncio.TimeoutError):
+            await client.analyze_arbitrage_async({"block_number": 3}, timeout=0.05)
+        analysis = await client.analyze_arbitrage_async({"block_number": 3}, timeout=2)
+        assert analysis.confidence == 0.5
+        assert requests[-1][0] == "/v1/messages" and requests[-1][1]["x-api-key"] == "key"
+    finally:
+        await client.close()
+        await runner.cleanup()
+
+async def _streaming_stand_in(chunks, stall: float):
+    async def chat(request):
+        resp = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await resp.prepare(request)
+        for i, text in enumerate(chunks):
+            if i == 2:
+                await asyncio.sleep(stall)
+            event = {"choices": [{"delta": {"content": text}}]}
+            await resp.write(f"data: {json.dumps(event)}\n\n".encode())
+        await resp.write(b"data: [DONE]\n\n")
+        return resp
+
+    app = web.Application()
+    app.router.add_post("/chat/completions", chat)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    return runner, f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+
+@pytest.mark.asyncio
+async def test_streamed_decision_returns_once_decided(settings):
+    declined = ['{"opportunity_id": "s-1", ', '"execute": false, ', '"reason": "thin margin", "max_gas_gwei": 0}']
+    runner, url = await _streaming_stand_in(declined, stall=1.5)
+    client = AIClient(settings, provider=OpenAICompatibleProvider(None, "m", base_url=url))
+    try:
+        # The server stalls after "execute": false; the client must not wait for the rest
+        decision = await client.decide_execution_async({"opportunity_id": "s-1"}, timeout=0.5)
+        assert decision.execute is False and decision.opportunity_id == "s-1"
+    finally:
+        await client.close()
+        await runner.cleanup()
+
+@pytest.mark.asyncio
+async def test_streamed_decision_reads_to_end_when_undecided(settings):
+    accepted = ['{"opportunity_id": "s-2", ', '"execute": tr', 'ue, "reason": "ok", "max_gas_gwei": 30}']
+    runner, url = await _streaming_stand_in(accepted, stall=0.0)
+    client = AIClient(settings, provider=OpenAICompatibleProvider(None, "m", base_url=url))
+    try:
+        decision = await client.decide_execution_async({"opportunity_id": "s-2"})
+        assert decision.execute is True and decision.max_gas_gwei == 30
+    finally:
+        await client.close()
+        await runner.cleanup()
+
+@pytest.mark.asyncio
+async def test_risk_score_is_trusted_only_once_terminated():
+    async def chunks(parts):
+        for part in parts:
+            yield part
+
+    # "9" could still become "9e-2": no verdict until the number is closed
+    low = ['{"opportunity_id": "r-1", "risk_score": 9', 'e-2, "risks": [], ', '"recommendation": "proceed"}']
+    text, early = await consume_stream(chunks(low), risk_verdict(0.8))
+    assert early is None and json.loads(text)["risk_score"] == 0.09
+
+    high = ['{"opportunity_id": "r-2", "risk_score": 0.9', '5, ', '"risks": ["stale reserves"]']
+    text, early = await consume_stream(chunks(high), risk_verdict(0.8))
+    assert early["risk_score"] == 0.95 and text.endswith("5, ")
+
+def test_blocking_calls_close_their_session(settings):
+    # The stand-in lives on its own loop; each blocking call runs (and ends) a loop of its own
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    runner, url, requests = asyncio.run_coroutine_threadsafe(_stand_in(), loop).result()
+    provider = OpenAICompatibleProvider("sk-test", "m", base_url=url)
+    client = AIClient(settings, provider=provider)
+    try:
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            sessions = []
+            for block in (1, 2):
+                assert client.analyze_arbitrage({"block_number": block}).opportunity_id == "local-1"
+                sessions.append(provider._session)
+            gc.collect()
+        assert len(requests) == 2 and sessions[0] is not sessions[1]
+        assert all(s.closed for s in sessions)
+        assert not [w for w in caught if "Unclosed" in str(w.message)]
+    finally:
+        asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
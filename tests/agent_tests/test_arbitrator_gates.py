@@ -0,0 +1,92 @@
+import pytest
+from eth_account import Account
+from web3 import Web3
+from agent.ai.parser import RiskDecision
+from agent.config import Settings
+from agent.defi.uniswap_v2 import V2Pair, V2QuoteEngine
+from agent.strategies.arbitrator import Arbitrator
+from agent.utils.metrics import OPPORTUNITIES, STAGE_SECONDS
+
+WETH = "0x0000000000000000000000000000000000000001"
+USDC = "0x0000000000000000000000000000000000000002"
+UNI = "0x00000000000000000000000000000000000000A1"
+SUSHI = "0x00000000000000000000000000000000000000B1"
+EXECUTOR = "0x00000000000000000000000000000000000000E1"
+
+class FakeAsyncEth:
+    @property
+    async def gas_price(self):
+        return 10**9
+
+class FakeAsyncWeb3:
+    to_wei = staticmethod(Web3.to_wei)
+
+    def __init__(self):
+        self.eth = FakeAsyncEth()
+
+class FakeExecutor:
+    def __init__(self):
+        self.aw3 = FakeAsyncWeb3()
+        self.gas_oracle = None
+        self.submitted = []
+
+    async def submit_async(self, tx, max_gas_gwei=None):
+        self.submitted.append(tx)
+        return "0x" + "1" * 64
+
+class CountingAI:
+    def __init__(self):
+        self.calls = []
+
+    async def analyze_arbitrage_async(self, snapshot):
+        raise AssertionError("graph cycle available; analysis must be skipped")
+
+    async def assess_and_decide_async(self, payload):
+        self.calls.append(payload)
+        return RiskDecision(opportunity_id="x", execute=True, recommendation="proceed", max_gas_gwei=50)
+
+def _arbitrator(usdc_on_sushi: int, **overrides):
+    # Explicit, so a placeholder PUBLIC_ADDRESS in a local .env never reaches the calldata
+    overrides.setdefault("PUBLIC_ADDRESS", Account.from_key(Settings().PRIVATE_KEY).address)
+    settings = Settings(
+        EXECUTOR_ADDRESS=EXECUTOR, UNISWAP_V2_ROUTER=UNI, SUSHISWAP_V2_ROUTER=SUSHI,
+        AI_DECISION_MODE="combined", **overrides,
+    )
+    engine = V2QuoteEngine()
+    engine.upsert_pair(UNI, V2Pair("0x00000000000000000000000000000000000000F1", WETH, USDC, 1_000 * 10**18, 2_000_000 * 10**6))
+    engine.upsert_pair(SUSHI, V2Pair("0x00000000000000000000000000000000000000F2", WETH, USDC, 1_000 * 10**18, usdc_on_sushi))
+    ai, executor = CountingAI(), FakeExecutor()
+    return Arbitrator(None, settings, ai, executor, quote_engine=engine), ai, executor
+
+OPP = {"opportunity_id": "o1", "cycles": [{"tokens": [WETH, USDC, WETH], "routers": [SUSHI, UNI], "kinds": ["v2", "v2"]}]}
+
+@pytest.mark.asyncio
+async def test_unprofitable_cycle_never_reaches_ai():
+    arb, ai, executor = _arbitrator(2_000_000 * 10**6)
+    rejected, simulated = OPPORTUNITIES.value(outcome="gate_rejected"), STAGE_SECONDS.count(stage="simulation")
+    await arb.evaluate_and_maybe_execute(OPP)
+    assert ai.calls == [] and executor.submitted == []
+    assert OPPORTUNITIES.value(outcome="gate_rejected") == rejected + 1
+    assert STAGE_SECONDS.count(stage="simulation") == simulated + 1
+
+@pytest.mark.asyncio
+async def test_path_gates_reject_before_simulation():
+    arb, ai, _ = _arbitrator(2_100_000 * 10**6, TOKEN_ALLOWLIST=WETH)
+    await arb.evaluate_and_maybe_execute(OPP)
+    assert ai.calls == []
+
+    arb, ai, _ = _arbitrator(2_100_000 * 10**6, MIN_POOL_LIQUIDITY_WEI=10_000 * 10**18)
+    await arb.evaluate_and_maybe_execute(OPP)
+    assert ai.calls == []
+
+@pytest.mark.asyncio
+async def test_profitable_cycle_makes_one_combined_ai_call():
+    arb, ai, executor = _arbitrator(2_100_000 * 10**6)
+    await arb.evaluate_and_maybe_execute(OPP)
+    assert len(ai.calls) == 1
+    assert int(ai.calls[0]["simulation"]["expected_net_profit"]) > 0
+    assert len(executor.submitted) == 1
+
+    arb, ai, executor = _arbitrator(2_100_000 * 10**6, MAX_GAS_PRICE_GWEI=0.5)
+    await arb.evaluate_and_maybe_execute(OPP)
+    assert ai.calls == [] and executor.submitted == []
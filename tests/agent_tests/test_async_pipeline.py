@@ -0,0 +1,65 @@
+import asyncio
+import pytest
+from eth_account import Account
+from web3 import Web3
+from agent.config import Settings
+from agent.core.executor import TransactionExecutor
+from agent.defi.uniswap_v2 import V2Pair, V2QuoteEngine
+from agent.strategies.simulator import simulate_v2_cycle_async
+
+WETH = "0x0000000000000000000000000000000000000001"
+USDC = "0x0000000000000000000000000000000000000002"
+UNI = "0x00000000000000000000000000000000000000A1"
+SUSHI = "0x00000000000000000000000000000000000000B1"
+
+class FakeAsyncEth:
+    def __init__(self):
+        self.sent = []
+
+    @property
+    async def gas_price(self):
+        return 10**9
+
+    async def get_transaction_count(self, account, block="latest"):
+        # Yield so concurrent callers interleave if nothing serializes them
+        await asyncio.sleep(0.01)
+        return len(self.sent)
+
+    async def fee_history(self, *args):
+        return {"baseFeePerGas": [10**10]}
+
+    async def send_raw_transaction(self, raw):
+        await asyncio.sleep(0.01)
+        self.sent.append(raw)
+        return bytes(32)
+
+class FakeAsyncWeb3:
+    to_wei = staticmethod(Web3.to_wei)
+
+    def __init__(self):
+        self.eth = FakeAsyncEth()
+
+@pytest.mark.asyncio
+async def test_simulate_v2_cycle_async_uses_cached_reserves():
+    engine = V2QuoteEngine()
+    engine.upsert_pair(UNI, V2Pair("0x00000000000000000000000000000000000000F1", WETH, USDC, 1_000 * 10**18, 2_000_000 * 10**6))
+    engine.upsert_pair(SUSHI, V2Pair("0x00000000000000000000000000000000000000F2", WETH, USDC, 1_000 * 10**18, 2_100_000 * 10**6))
+
+    sim = await simulate_v2_cycle_async(FakeAsyncWeb3(), Settings(), SUSHI, UNI, WETH, USDC, 10**18, quote_engine=engine)
+    assert sim.amounts[1] == engine.get_amounts_out(SUSHI, 10**18, [WETH, USDC])[-1]
+    assert sim.gas_cost_wei == 350000 * (Web3.to_wei(Settings().GAS_PRIORITY_GWEI, "gwei") + 10**9)
+
+@pytest.mark.asyncio
+async def test_concurrent_submissions_get_distinct_nonces():
+    base = Settings()
+    settings = Settings(DRY_RUN=False, PUBLIC_ADDRESS=Account.from_key(base.PRIVATE_KEY).address)
+    aw3 = FakeAsyncWeb3()
+    executor = TransactionExecutor(w3=None, settings=settings, state=None, aw3=aw3)
+    template = {"to": WETH, "data": b"", "value": 0, "gas": 100_000}
+
+    signed = []
+    sign = executor._account.sign_transaction
+    executor._account = type("Signer", (), {"sign_transaction": staticmethod(lambda tx: signed.append(tx["nonce"]) or sign(tx))})()
+
+    await asyncio.gather(*(executor.submit_async(template) for _ in range(5)))
+    assert sorted(signed) == [0, 1, 2, 3, 4]
@@ -0,0 +1,95 @@
+import json
+import math
+from eth_abi import encode as abi_encode
+from hexbytes import HexBytes
+from agent.config import Settings
+from agent.defi.pool_mirror import SYNC_TOPIC, V3_SWAP_TOPIC
+from agent.strategies.backtest import Backtester, BacktestReport, read_events, run_backtest, write_events
+
+WETH = "0x00000000000000000000000000000000000000c1"
+USDC = "0x00000000000000000000000000000000000000c2"
+UNI_PAIR = "0x00000000000000000000000000000000000000f1"
+SUSHI_PAIR = "0x00000000000000000000000000000000000000f2"
+BASE = (2_000 * 10**18, 6_000_000 * 10**6)
+POOLS = {
+    "tokens": {"WETH": WETH, "USDC": USDC},
+    "routers": {"uni": "0x00000000000000000000000000000000000000a1", "sushi": "0x00000000000000000000000000000000000000b1"},
+    "pairs": [
+        {"router": "uni", "address": UNI_PAIR, "token0": "WETH", "token1": "USDC", "reserve0": BASE[0], "reserve1": BASE[1]},
+        {"router": "sushi", "address": SUSHI_PAIR, "token0": "WETH", "token1": "USDC", "reserve0": BASE[0], "reserve1": BASE[1]},
+    ],
+}
+
+def _sync(block, idx, pair, move):
+    # Price moves by ~move^2 with k unchanged; move 1.0 restores the base price
+    data = abi_encode(["uint112", "uint112"], [int(BASE[0] * move), int(BASE[1] / move)])
+    return {"address": pair, "topics": ["0x" + SYNC_TOPIC.hex().removeprefix("0x")], "data": HexBytes(data).hex(),
+            "blockNumber": hex(block), "logIndex": hex(idx)}
+
+def _events(tmp_path):
+    logs = []
+    for i, block in enumerate(range(100, 140)):
+        pair = UNI_PAIR if i % 2 else SUSHI_PAIR
+        # Every third block opens a ~2% gap; the others restore the base price
+        logs.append(_sync(block, 0, pair, 1.01 if i % 3 == 0 else 1.0))
+    path = tmp_path / "events.jsonl"
+    path.write_text("".join(json.dumps(entry) + "\n" for entry in logs))
+    return str(path)
+
+def _summary(report):
+    return (report.blocks, report.with_cycles, report.accepted, report.profit, report.floor_profit,
+            [(o["block"], o["amount_in"], o["expected_net_profit"]) for o in report.opportunities])
+
+def test_backtest_finds_opened_cycles(tmp_path):
+    report = run_backtest(_events(tmp_path), POOLS)
+    assert (report.start, report.end, report.blocks, report.events) == (100, 139, 40, 40)
+    # Blocks 100, 103, ... open a gap; restoring blocks make the reverse cycle briefly profitable
+    assert report.accepted > 0 and report.accepted <= report.candidates <= report.with_cycles
+    assert all(p > 0 for p in report.profit.values())
+    assert all(report.floor_profit[t] < p for t, p in report.profit.items())
+    assert len(report.block_seconds) == 40
+
+    # A premium larger than any gap rejects everything at the profit gate
+    expensive = run_backtest(_events(tmp_path), POOLS, {"AAVE_PREMIUM_BPS": 500})
+    assert expensive.accepted == 0 and expensive.rejections.get("net_profit_below_min", 0) > 0
+
+def test_binary_and_parallel_runs_match_sequential(tmp_path):
+    events = _events(tmp_path)
+    sequential = run_backtest(events, POOLS)
+
+    binary = str(tmp_path / "events.bin.gz")
+    assert write_events(binary, read_events(events)) == 40
+    assert _summary(run_backtest(binary, POOLS)) == _summary(sequential)
+
+    # Each worker warms up to its range, so split ranges reproduce the sequential result
+    parallel = run_backtest(events, POOLS, workers=3)
+    assert _summary(parallel) == _summary(sequential)
+    assert run_backtest(events, POOLS, start=120, end=129).blocks == 10
+
+V3_POOL = "0x00000000000000000000000000000000000000f3"
+
+def _v3_swap(block, price):
+    # price is USDC per WETH in raw units (token1 per token0)
+    sqrt_price = int(math.sqrt(price) * 2**96)
+    tick = math.floor(math.log(price, 1.0001))
+    data = abi_encode(["int256", "int256", "uint160", "uint128", "int24"], [1, -1, sqrt_price, 10**17, tick])
+    return {"address": V3_POOL, "topics": [V3_SWAP_TOPIC.hex(), "0x" + "00" * 32, "0x" + "00" * 32],
+            "data": HexBytes(data).hex(), "blockNumber": block, "logIndex": 0}
+
+def test_v3_swaps_move_mirrored_state_and_unknown_pools_are_skipped():
+    base_price = BASE[1] / BASE[0]
+    pools = dict(POOLS, v3_pools=[{"address": V3_POOL, "token0": "WETH", "token1": "USDC", "fee": 500,
+                                   "sqrt_price_x96": int(math.sqrt(base_price) * 2**96), "liquidity": 10**17,
+                                   "tick": math.floor(math.log(base_price, 1.0001))}])
+    tester = Backtester(Settings(), pools)
+    report = BacktestReport()
+
+    tester.evaluate(100, [_v3_swap(100, base_price * 1.03)], report)
+    assert tester.mirror.v3[V3_POOL].sqrt_price_x96 == int(math.sqrt(base_price * 1.03) * 2**96)
+    # The V3 leg opens a cycle the V2 executor cannot trade
+    assert report.with_cycles == 1 and report.candidates == 0
+
+    stray = dict(_sync(101, 0, UNI_PAIR, 1.0), address="0x00000000000000000000000000000000000000f9",
+                 blockNumber=101, logIndex=0)
+    tester.evaluate(101, [stray], report)
+    assert (report.events, report.skipped) == (2, 1)
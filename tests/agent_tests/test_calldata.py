@@ -0,0 +1,53 @@
+import pytest
+from web3 import Web3
+from agent.core.calldata import ExecuteFlashLoanEncoder, V2SwapEncoder, V3ExactInputSingleEncoder
+from agent.defi.abis import UNISWAP_V2_ROUTER_ABI, UNISWAP_V3_SWAP_ROUTER_ABI
+
+ROUTER = "0x7a250d5630B4cF539739dF2C5dAcb4c659F2488D"
+WETH = "0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2"
+USDC = "0xA0b86991c6218b36c1d19D4a2e9Eb0cE3606eB48"
+EXEC = "0x0000000000000000000000000000000000000009"
+
+w3 = Web3()
+
+def _hex(data) -> str:
+    return Web3.to_hex(data)
+
+def test_v2_swap_matches_web3():
+    c = w3.eth.contract(address=ROUTER, abi=UNISWAP_V2_ROUTER_ABI)
+    enc = V2SwapEncoder(ROUTER)
+    for path in ([WETH, USDC], [WETH, USDC, WETH]):
+        expected = c.encode_abi(fn_name="swapExactTokensForTokens", args=[10**18, 123, path, EXEC, 1_700_000_000])
+        assert _hex(enc.encode(10**18, 123, path, EXEC, 1_700_000_000)) == expected
+    # Reused buffers do not leak state between calls
+    assert _hex(enc.encode(1, 0, [USDC, WETH], EXEC, 1)) == c.encode_abi(
+        fn_name="swapExactTokensForTokens", args=[1, 0, [USDC, WETH], EXEC, 1]
+    )
+
+def test_v3_exact_input_single_matches_web3():
+    c = w3.eth.contract(address=ROUTER, abi=UNISWAP_V3_SWAP_ROUTER_ABI)
+    args = (WETH, USDC, 500, EXEC, 1_700_000_000, 10**18, 1_900 * 10**6, 0)
+    expected = c.encode_abi(fn_name="exactInputSingle", args=[args])
+    assert _hex(V3ExactInputSingleEncoder(ROUTER).encode(*args)) == expected
+
+def test_execute_flash_loan_matches_web3():
+    abi = [{
+        "type": "function", "name": "executeFlashLoan", "stateMutability": "nonpayable",
+        "inputs": [{"name": "asset", "type": "address"}, {"name": "amount", "type": "uint256"}, {"name": "params", "type": "bytes"}],
+        "outputs": [],
+    }]
+    c = w3.eth.contract(address=EXEC, abi=abi)
+    for params in (b"", b"\x01" * 31, b"\x02" * 70):
+        expected = c.encode_abi(fn_name="executeFlashLoan", args=[WETH, 10**18, params])
+        assert _hex(ExecuteFlashLoanEncoder(EXEC).encode(WETH, 10**18, params)) == expected
+
+def test_bad_checksum_is_rejected_at_construction():
+    # One letter's case flipped: a typo EIP-55 exists to catch
+    bad = ROUTER[:-1] + ROUTER[-1].lower()
+    for encoder in (V2SwapEncoder, V3ExactInputSingleEncoder, ExecuteFlashLoanEncoder):
+        with pytest.raises(ValueError):
+            encoder(bad)
+    # Unchecksummed (single-case) addresses are still accepted and normalised
+    assert V2SwapEncoder(ROUTER.lower()).router == ROUTER
+    with pytest.raises(ValueError):
+        V2SwapEncoder(ROUTER).encode(1, 1, [WETH, USDC[:2] + USDC[2].lower() + USDC[3:]], EXEC, 1)
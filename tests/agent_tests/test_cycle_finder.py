@@ -0,0 +1,72 @@
+from agent.defi.uniswap_v2 import V2Pair, V2QuoteEngine
+from agent.defi.uniswap_v3 import V3Pool
+from agent.strategies.cycle_finder import CycleFinder, TokenGraph
+
+WETH = "0x0000000000000000000000000000000000000001"
+USDC = "0x0000000000000000000000000000000000000002"
+DAI = "0x0000000000000000000000000000000000000003"
+UNI = "0x00000000000000000000000000000000000000A1"
+SUSHI = "0x00000000000000000000000000000000000000B1"
+
+def _engine(sushi_usdc_per_weth: int) -> V2QuoteEngine:
+    engine = V2QuoteEngine()
+    engine.upsert_pair(UNI, V2Pair("0x00000000000000000000000000000000000000F1", WETH, USDC, 1_000 * 10**18, 2_000_000 * 10**6))
+    engine.upsert_pair(SUSHI, V2Pair("0x00000000000000000000000000000000000000F2", WETH, USDC, 1_000 * 10**18, sushi_usdc_per_weth * 1_000 * 10**6))
+    return engine
+
+def test_balanced_pools_have_no_cycle():
+    finder = CycleFinder(TokenGraph.from_pools(_engine(2_000)))
+    assert finder.search() == []
+
+def test_finds_two_hop_cross_dex_cycle():
+    finder = CycleFinder(TokenGraph.from_pools(_engine(2_100)))
+    cycles = finder.search()
+
+    assert len(cycles) == 1
+    c = cycles[0]
+    assert c.hops == 2 and c.log_gain > 0
+    # Buy WETH where it is cheap (Uniswap), sell where it is dear (Sushiswap)
+    expected = [UNI, SUSHI] if c.tokens[0] == USDC else [SUSHI, UNI]
+    assert [e.router for e in c.edges] == [r.lower() for r in expected]
+
+def test_finds_three_hop_cycle_through_v3_pool():
+    engine = V2QuoteEngine()
+    engine.upsert_pair(UNI, V2Pair("0x00000000000000000000000000000000000000F1", WETH, USDC, 10**21, 2 * 10**12))
+    engine.upsert_pair(UNI, V2Pair("0x00000000000000000000000000000000000000F3", DAI, WETH, 2_100_000 * 10**18, 10**21))
+    # USDC/DAI at parity (price 1e12 in raw units): sqrtPriceX96 = sqrt(1e12) * 2**96
+    pool = V3Pool("0x00000000000000000000000000000000000000F4", USDC, DAI, 100, sqrt_price_x96=10**6 * 2**96, liquidity=10**18)
+    cycles = CycleFinder(TokenGraph.from_pools(engine, [pool])).search()
+
+    assert any(c.hops == 3 and {e.kind for e in c.edges} == {"v2", "v3"} for c in cycles)
+
+def test_incremental_update_reports_only_touched_cycles():
+    engine = _engine(2_000)
+    finder = CycleFinder(TokenGraph.from_pools(engine))
+    assert finder.update(["0x00000000000000000000000000000000000000F2"]) == []
+
+    engine.update_reserves("0x00000000000000000000000000000000000000F2", 1_000 * 10**18, 2_100_000 * 10**6)
+    cycles = finder.update(["0x00000000000000000000000000000000000000F2"])
+    assert len(cycles) == 1 and cycles[0].hops == 2
+
+def test_two_cycle_does_not_hide_simple_four_cycle_through_same_token():
+    # WETH/USDC is mispriced across DEXes (a strong 2-cycle) and WETH->C->D->E->WETH gains ~3%
+    engine = _engine(2_200)
+    c, d, e = ("0x00000000000000000000000000000000000000C%d" % i for i in range(3))
+    ring = [(WETH, c), (c, d), (d, e), (e, WETH)]
+    for i, (a, b) in enumerate(ring):
+        out = 1_030 * 10**18 if i == 0 else 1_000 * 10**18
+        engine.upsert_pair(UNI, V2Pair("0x00000000000000000000000000000000000000D%d" % i, a, b, 1_000 * 10**18, out))
+    finder = CycleFinder(TokenGraph.from_pools(engine))
+
+    def rings(cycles):
+        return [cy for cy in cycles if cy.hops == 4 and {t.lower() for t in cy.tokens} == {x.lower() for x in (WETH, c, d, e)}]
+
+    # From WETH alone the cheapest 4-edge walk home is the 2-cycle twice; the ring must still show
+    cycles = finder.search([finder.graph.index[WETH]])
+    assert any(cy.hops == 2 for cy in cycles)
+    assert len(rings(cycles)) == 1 and rings(cycles)[0].log_gain > 0
+    assert all(len({t.lower() for t in cy.tokens}) == cy.hops for cy in cycles)
+
+    # Incrementally, from the changed pool that joins the ring at WETH
+    engine.update_reserves("0x00000000000000000000000000000000000000D3", 1_000 * 10**18, 1_001 * 10**18)
+    assert len(rings(finder.update(["0x00000000000000000000000000000000000000D3"]))) == 1
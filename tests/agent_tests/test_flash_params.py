@@ -15,3 +15,29 @@ def test_encode_flash_params_roundtrip_smoke():
     )
     assert isinstance(params, (bytes, bytearray))
     assert len(params) > 0
+
+def test_template_render_matches_full_encode():
+    from agent.core.calldata import V2SwapEncoder, V2_SWAP_AMOUNT_IN_OFFSET, V2_SWAP_AMOUNT_OUT_MIN_OFFSET
+    from agent.core.flash_params import FlashParamsTemplate
+
+    token, mid = "0x0000000000000000000000000000000000000001", "0x0000000000000000000000000000000000000002"
+    router, recipient = "0x00000000000000000000000000000000000000A1", "0x0000000000000000000000000000000000000009"
+    beneficiary = "0x0000000000000000000000000000000000000003"
+    enc = V2SwapEncoder(router)
+
+    def shape(amount_in, min_out):
+        return (
+            [{"token": token, "spender": router, "amount": amount_in}],
+            [{"target": router, "value": 0, "data": enc.encode(amount_in, min_out, [token, mid], recipient, 7)}],
+        )
+
+    approvals, calls = shape(0, 0)
+    tmpl = FlashParamsTemplate.from_shape(
+        beneficiary=beneficiary, approvals=approvals, calls=calls,
+        approval_slots={0: "amount_in"},
+        call_slots={0: {"amount_in": V2_SWAP_AMOUNT_IN_OFFSET, "min_out": V2_SWAP_AMOUNT_OUT_MIN_OFFSET}},
+    )
+    for amount_in, min_out, min_profit in ((10**18, 1_990 * 10**6, 5), (1, 0, 0), (2**255, 2**200, 2**128)):
+        approvals, calls = shape(amount_in, min_out)
+        expected = encode_flash_params(min_profit=min_profit, beneficiary=beneficiary, approvals=approvals, calls=calls)
+        assert tmpl.render(min_profit=min_profit, amount_in=amount_in, min_out=min_out) == bytes(expected)
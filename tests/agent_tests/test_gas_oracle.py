@@ -0,0 +1,52 @@
+import pytest
+from agent.utils.gas_estimator import GasOracle, next_base_fee
+
+GWEI = 10**9
+
+def test_next_base_fee_eip1559():
+    assert next_base_fee(100 * GWEI, 15_000_000, 30_000_000) == 100 * GWEI
+    assert next_base_fee(100 * GWEI, 30_000_000, 30_000_000) == 112_500_000_000
+    assert next_base_fee(100 * GWEI, 0, 30_000_000) == 87_500_000_000
+    # Minimum increase of 1 wei when the block is barely over target
+    assert next_base_fee(7, 15_000_001, 30_000_000) == 8
+
+class FakeEth:
+    def __init__(self):
+        self.head = {"number": 100, "baseFeePerGas": 20 * GWEI, "gasUsed": 30_000_000, "gasLimit": 30_000_000}
+        self.fee_history_counts = []
+
+    async def get_block(self, block):
+        return self.head
+
+    async def fee_history(self, count, newest, percentiles):
+        self.fee_history_counts.append(count)
+        return {"reward": [[i * GWEI for i in range(1, 6)] for _ in range(count)]}
+
+class FakeW3:
+    def __init__(self):
+        self.eth = FakeEth()
+
+@pytest.mark.asyncio
+async def test_oracle_refreshes_once_per_head_and_serves_from_memory():
+    w3 = FakeW3()
+    oracle = GasOracle(priority_gwei=2, priority_percentile=None, window=5)
+    assert await oracle.refresh(w3) and not await oracle.refresh(w3)
+    assert w3.eth.fee_history_counts == [5]
+
+    assert oracle.base_fee == 22_500_000_000
+    assert oracle.fees() == (22_500_000_000 + 4 * GWEI, 2 * GWEI)
+    # Percentile mode reads the rolling distribution (50th column = 3 gwei)
+    assert oracle.priority_fee(50) == 3 * GWEI
+
+    w3.eth.head = dict(w3.eth.head, number=101)
+    assert await oracle.refresh(w3)
+    assert w3.eth.fee_history_counts == [5, 1]
+
+def test_simulator_gas_cost_uses_oracle():
+    from agent.config import Settings
+    from agent.strategies.simulator import estimate_gas_cost_wei
+
+    oracle = GasOracle(priority_gwei=1)
+    oracle.update_head({"number": 1, "baseFeePerGas": 10 * GWEI, "gasUsed": 15_000_000, "gasLimit": 30_000_000})
+    # w3 is never touched when the oracle is warm
+    assert estimate_gas_cost_wei(None, Settings(), 100_000, oracle) == 100_000 * 11 * GWEI
@@ -0,0 +1,81 @@
+import asyncio
+import json
+import pytest
+from aiohttp import web
+from agent.utils.web3_client import HedgedRPCProvider
+
+async def _serve(delay: float = 0.0, status: int = 200):
+    hits = []
+
+    async def handle(request):
+        body = await request.json()
+        hits.append(body["method"])
+        await asyncio.sleep(delay)
+        if status != 200:
+            return web.Response(status=status)
+        return web.json_response({"jsonrpc": "2.0", "id": body["id"], "result": hex(len(hits))})
+
+    app = web.Application()
+    app.router.add_post("/", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/", hits
+
+@pytest.mark.asyncio
+async def test_slow_primary_is_hedged_and_ranking_adapts():
+    slow_runner, slow, slow_hits = await _serve(delay=0.5)
+    fast_runner, fast, fast_hits = await _serve(delay=0.0)
+    provider = HedgedRPCProvider([slow, fast], default_hedge_delay=0.05)
+    try:
+        # Both unmeasured: the first listed is primary, the hedge answers first
+        resp = await provider.make_request("eth_blockNumber", [])
+        assert resp["result"] == "0x1" and fast_hits == ["eth_blockNumber"]
+        assert provider.ranked()[0].url == fast
+        # Fast endpoint is now primary and answers without a hedge
+        await provider.make_request("eth_chainId", [])
+        assert fast_hits[-1] == "eth_chainId" and len(slow_hits) == 1
+    finally:
+        await provider.close()
+        await slow_runner.cleanup()
+        await fast_runner.cleanup()
+
+@pytest.mark.asyncio
+async def test_failover_and_no_hedging_for_sends():
+    bad_runner, bad, _ = await _serve(status=503)
+    ok_runner, ok, ok_hits = await _serve(delay=0.1)
+    provider = HedgedRPCProvider([bad, ok], default_hedge_delay=0.01)
+    try:
+        resp = await provider.make_request("eth_sendRawTransaction", ["0x00"])
+        assert resp["result"] == "0x1" and ok_hits == ["eth_sendRawTransaction"]
+        assert provider.endpoints[0].error_ewma > 0
+    finally:
+        await provider.close()
+        await bad_runner.cleanup()
+        await ok_runner.cleanup()
+
+@pytest.mark.asyncio
+async def test_unanswered_requests_do_not_count_as_successes():
+    slow_runner, slow, _ = await _serve(delay=0.5)
+    fast_runner, fast, _ = await _serve(delay=0.0)
+    provider = HedgedRPCProvider([slow, fast], default_hedge_delay=0.05)
+    loser = provider.endpoints[0]
+    try:
+        loser.error_ewma = 0.4
+        await provider.make_request("eth_blockNumber", [])
+        # The hedge loser only gets a latency floor: no error decay, no percentile sample
+        assert loser.error_ewma == 0.4 and not loser.samples
+        assert loser.latency_ewma is not None and loser.latency_ewma >= 0.05
+
+        # A caller cancelled before any answer records nothing at all
+        loser.latency_ewma, provider.endpoints[1].latency_ewma = 0.001, 10.0
+        before = (loser.latency_ewma, loser.error_ewma, len(provider.endpoints[1].samples))
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(provider.make_request("eth_chainId", []), timeout=0.02)
+        assert (loser.latency_ewma, loser.error_ewma, len(provider.endpoints[1].samples)) == before
+    finally:
+        await provider.close()
+        await slow_runner.cleanup()
+        await fast_runner.cleanup()
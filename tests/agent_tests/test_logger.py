@@ -0,0 +1,49 @@
+import io
+import json
+import time
+import structlog
+from agent.utils.logger import EventSampler, QueueWriter, configure_logging, flush_logging, get_logger
+
+def _lines(stream):
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+def test_events_are_rendered_by_the_writer_thread():
+    stream = io.StringIO()
+    configure_logging(level="INFO", sample="", per_second="", stream=stream)
+    try:
+        log = get_logger("test.logger")
+        assert get_logger("test.logger") is log
+        log.debug("test.hidden")
+        log.info("test.event", n=1, payload=b"\x01")
+        flush_logging()
+        (line,) = _lines(stream)
+        assert line["event"] == "test.event" and line["level"] == "info" and line["n"] == 1
+        assert line["timestamp"].endswith("Z")
+    finally:
+        configure_logging()
+
+def test_sampling_and_rate_limit():
+    sampler = EventSampler(sample={"arb.simulation": 0.25}, per_second={"arb.gate_rejected": 3})
+    kept = {"arb.simulation": 0, "arb.gate_rejected": 0, "other": 0}
+    for _ in range(8):
+        for event in kept:
+            try:
+                sampler(None, "info", {"event": event})
+                kept[event] += 1
+            except structlog.DropEvent:
+                pass
+    assert kept == {"arb.simulation": 2, "arb.gate_rejected": 3, "other": 8}
+    # Problems are never sampled away
+    sampler(None, "warning", {"event": "arb.simulation"})
+
+def test_full_queue_drops_instead_of_blocking():
+    class Stalled(io.StringIO):
+        def write(self, s):
+            time.sleep(0.05)
+            return super().write(s)
+
+    writer = QueueWriter(Stalled(), maxsize=2)
+    for i in range(20):
+        writer.put({"event": "e", "i": i})
+    assert writer.dropped > 0
+    writer.stop()
@@ -0,0 +1,37 @@
+import aiohttp
+import pytest
+from agent.utils.metrics import Registry, start_metrics_server
+
+def test_text_exposition():
+    registry = Registry()
+    calls = registry.counter("t_calls_total", "Calls.", ("method",))
+    latency = registry.histogram("t_seconds", "Latency.", ("stage",), buckets=(0.01, 0.1))
+    calls.inc(method="eth_call")
+    calls.inc(2, method='we"ird')
+    latency.observe(0.005, stage="sim")
+    latency.observe(0.05, stage="sim")
+    latency.observe(3.0, stage="sim")
+
+    text = registry.render()
+    assert "# TYPE t_calls_total counter" in text
+    assert 't_calls_total{method="eth_call"} 1' in text
+    assert 't_calls_total{method="we\\"ird"} 2' in text
+    assert 't_seconds_bucket{stage="sim",le="0.01"} 1' in text
+    assert 't_seconds_bucket{stage="sim",le="0.1"} 2' in text
+    assert 't_seconds_bucket{stage="sim",le="+Inf"} 3' in text
+    assert 't_seconds_count{stage="sim"} 3' in text
+    assert 't_seconds_sum{stage="sim"} 3.055' in text
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint():
+    registry = Registry()
+    registry.counter("t_up", "Up.").inc()
+    runner = await start_metrics_server("127.0.0.1", 0, registry)
+    try:
+        port = runner.addresses[0][1]
+        async with aiohttp.ClientSession() as session:
+            async with session.get(f"http://127.0.0.1:{port}/metrics") as resp:
+                assert resp.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+                assert "t_up 1" in await resp.text()
+    finally:
+        await runner.cleanup()
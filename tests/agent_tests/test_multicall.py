@@ -0,0 +1,58 @@
+from types import SimpleNamespace
+from eth_abi import decode as abi_decode, encode as abi_encode
+from agent.defi.multicall import MulticallBatch
+from agent.defi.uniswap_v2 import V2Pair, V2QuoteEngine
+
+TOKEN = "0x0000000000000000000000000000000000000001"
+OWNER = "0x0000000000000000000000000000000000000002"
+PAIR = "0x00000000000000000000000000000000000000F1"
+
+class FakeMulticallEth:
+    """Answers aggregate3 by selector, recording each eth_call's block identifier."""
+
+    def __init__(self, answers, block_number=123):
+        self.answers = answers
+        self.block_number = block_number
+        self.blocks = []
+
+    def call(self, tx, block_identifier):
+        self.blocks.append(block_identifier)
+        (payload,) = abi_decode(["(address,bool,bytes)[]"], bytes(tx["data"])[4:])
+        out = []
+        for _, _, data in payload:
+            if data[:4].hex() == "42cbb15c":  # getBlockNumber()
+                out.append((True, abi_encode(["uint256"], [self.block_number])))
+            else:
+                out.append(self.answers.get(data[:4].hex(), (False, b"")))
+        return abi_encode(["(bool,bytes)[]"], [out])
+
+def test_batch_decodes_and_tolerates_failures():
+    eth = FakeMulticallEth({"70a08231": (True, abi_encode(["uint256"], [42]))})
+    batch = MulticallBatch(SimpleNamespace(eth=eth))
+    i_bal = batch.add_balance_of(TOKEN, OWNER)
+    i_allow = batch.add_allowance(TOKEN, OWNER, OWNER)  # not answered -> reverts
+    res = batch.execute()
+
+    assert res.block_number == 123
+    assert res[i_bal].success and res[i_bal].value == 42
+    assert not res[i_allow].success
+
+def test_chunks_are_pinned_to_first_block():
+    eth = FakeMulticallEth({"70a08231": (True, abi_encode(["uint256"], [1]))})
+    batch = MulticallBatch(SimpleNamespace(eth=eth), max_calls_per_request=2)
+    for _ in range(5):
+        batch.add_balance_of(TOKEN, OWNER)
+    res = batch.execute()
+
+    assert len(res) == 5 and all(r.value == 1 for r in res.results)
+    assert eth.blocks == ["latest", 123, 123]
+
+def test_engine_refreshes_reserves_in_one_call():
+    eth = FakeMulticallEth({"0902f1ac": (True, abi_encode(["uint112", "uint112", "uint32"], [7, 9, 0]))})
+    engine = V2QuoteEngine()
+    engine.upsert_pair("0x00000000000000000000000000000000000000A1", V2Pair(PAIR, TOKEN, OWNER, 1, 1))
+
+    assert engine.refresh_reserves(SimpleNamespace(eth=eth)) == 123
+    pair = engine.pair_at(PAIR)
+    assert (pair.reserve0, pair.reserve1) == (7, 9)
+    assert len(eth.blocks) == 1
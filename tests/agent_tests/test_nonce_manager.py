@@ -0,0 +1,87 @@
+import pytest
+from eth_account import Account
+from agent.config import Settings
+from agent.core.executor import TransactionExecutor
+from agent.utils.gas_estimator import GasOracle
+from agent.utils.middleware import TxMiddleware
+
+class FakeEth:
+    def __init__(self, latest: int, pending: int):
+        self.counts = {"latest": latest, "pending": pending}
+        self.calls = 0
+        self.sent = []
+
+    async def get_transaction_count(self, address, block="latest"):
+        self.calls += 1
+        return self.counts[block]
+
+    async def send_raw_transaction(self, raw):
+        self.sent.append(raw)
+        return len(self.sent).to_bytes(32, "big")
+
+class FakeW3:
+    def __init__(self, latest: int, pending: int):
+        self.eth = FakeEth(latest, pending)
+
+ACCOUNT = "0x0000000000000000000000000000000000000001"
+
+@pytest.mark.asyncio
+async def test_allocates_locally_after_one_load():
+    w3 = FakeW3(latest=5, pending=7)
+    nm = TxMiddleware(ACCOUNT)
+    assert [await nm.allocate(w3) for _ in range(3)] == [7, 8, 9]
+    assert w3.eth.calls == 1
+
+    # An unsent nonce is handed out again before new ones
+    nm.release(8)
+    assert await nm.allocate(w3) == 8
+
+@pytest.mark.asyncio
+async def test_reconcile_refills_dropped_and_skips_reserved():
+    w3 = FakeW3(latest=0, pending=0)
+    nm = TxMiddleware(ACCOUNT)
+    nonces = [await nm.allocate(w3) for _ in range(4)]
+    for n in nonces[:3]:
+        nm.mark_sent(n, f"0x{n}")
+    # Node mined 0, still has 1, lost 2; nonce 3 is reserved by a submitter mid-flight
+    w3.eth.counts = {"latest": 1, "pending": 2}
+
+    assert await nm.reconcile(w3) == [2]
+    assert nm.nonce_for("0x1") == 1 and nm.nonce_for("0x0") is None
+    assert await nm.allocate(w3) == 2
+    assert await nm.allocate(w3) == 4
+
+@pytest.mark.asyncio
+async def test_reconcile_jumps_forward_after_external_sends():
+    w3 = FakeW3(latest=3, pending=3)
+    nm = TxMiddleware(ACCOUNT)
+    assert await nm.allocate(w3) == 3
+    nm.release(3)
+    w3.eth.counts = {"latest": 10, "pending": 10}
+    await nm.reconcile(w3)
+    assert await nm.allocate(w3) == 10
+
+@pytest.mark.asyncio
+async def test_head_fills_gap_left_by_failed_send_and_drops_mined():
+    settings = Settings(DRY_RUN=False, PUBLIC_ADDRESS=Account.from_key(Settings().PRIVATE_KEY).address)
+    oracle = GasOracle()
+    oracle.update_head({"number": 1, "baseFeePerGas": 10**9, "gasUsed": 0, "gasLimit": 30_000_000})
+    w3 = FakeW3(latest=0, pending=0)
+    executor = TransactionExecutor(w3=None, settings=settings, state=None, aw3=w3, gas_oracle=oracle)
+
+    # Nonce 0's send fails after nonce 1 was broadcast: the node queues 1 behind the gap
+    failed = await executor.nonces.allocate(w3)
+    sent = await executor.submit_async({"to": ACCOUNT, "data": b"", "value": 0, "gas": 100_000})
+    executor.nonces.release(failed)
+    assert executor.nonces.nonce_for(sent) == 1 and len(w3.eth.sent) == 1
+
+    await executor.on_head(2)
+    # 1 is still in flight (queued, not dropped) and 0 went out as a self-transfer
+    assert sorted(executor.nonces.in_flight) == [0, 1] and len(w3.eth.sent) == 2
+    assert await executor.nonces.allocate(w3) == 2
+    executor.nonces.release(2)
+
+    # Both mined: the in-flight set empties on the next head
+    w3.eth.counts = {"latest": 2, "pending": 2}
+    await executor.on_head(3)
+    assert executor.nonces.in_flight == {}
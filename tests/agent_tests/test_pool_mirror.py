@@ -0,0 +1,116 @@
+from eth_abi import encode as abi_encode
+from agent.config import Settings
+from agent.defi.pool_mirror import SYNC_TOPIC, V3_MINT_TOPIC, V3_SWAP_TOPIC, PoolStateMirror
+from agent.defi.uniswap_v2 import V2Pair, V2QuoteEngine
+from agent.defi.uniswap_v3 import V3Pool
+
+PAIR = "0x00000000000000000000000000000000000000f1"
+POOL = "0x00000000000000000000000000000000000000f3"
+T0 = "0x0000000000000000000000000000000000000001"
+T1 = "0x0000000000000000000000000000000000000002"
+
+def _sync(block, block_hash, idx, r0, r1, removed=False):
+    return {
+        "address": PAIR, "blockNumber": block, "blockHash": block_hash, "logIndex": idx, "removed": removed,
+        "topics": [SYNC_TOPIC], "data": abi_encode(["uint112", "uint112"], [r0, r1]),
+    }
+
+def _mirror():
+    engine = V2QuoteEngine()
+    engine.upsert_pair("0x00000000000000000000000000000000000000A1", V2Pair(PAIR, T0, T1, 100, 200))
+    return PoolStateMirror(w3=None, settings=Settings(), v2=engine), engine
+
+def test_sync_logs_update_reserves_and_report_delta():
+    mirror, engine = _mirror()
+    delta = mirror.apply_logs([_sync(11, b"\x11" * 32, 1, 120, 180), _sync(10, b"\x10" * 32, 0, 110, 190)])
+
+    pair = engine.pair_at(PAIR)
+    assert (pair.reserve0, pair.reserve1) == (120, 180)
+    assert delta.block_number == 11 and delta.changed == {PAIR}
+
+def test_removed_log_rolls_back_block():
+    mirror, engine = _mirror()
+    mirror.apply_logs([_sync(10, b"\x10" * 32, 0, 110, 190)])
+    mirror.apply_logs([_sync(11, b"\x11" * 32, 0, 120, 180)])
+
+    delta = mirror.apply_logs([_sync(11, b"\x11" * 32, 0, 120, 180, removed=True)])
+    pair = engine.pair_at(PAIR)
+    assert (pair.reserve0, pair.reserve1) == (110, 190)
+    assert delta.rolled_back_to == 10 and mirror.last_block == 10
+
+def test_conflicting_block_hash_replaces_block():
+    mirror, engine = _mirror()
+    mirror.apply_logs([_sync(10, b"\x10" * 32, 0, 110, 190), _sync(11, b"\x11" * 32, 0, 120, 180)])
+
+    delta = mirror.apply_logs([_sync(11, b"\xaa" * 32, 0, 130, 170)])
+    pair = engine.pair_at(PAIR)
+    assert (pair.reserve0, pair.reserve1) == (130, 170)
+    assert delta.rolled_back_to == 10
+
+def test_v3_mint_and_swap_roll_back():
+    mirror, _ = _mirror()
+    pool = V3Pool(address=POOL, token0=T0, token1=T1, fee=3000, sqrt_price_x96=2**96, liquidity=0, tick=0)
+    mirror.track_v3_pool(pool)
+    mint = {
+        "address": POOL, "blockNumber": 10, "blockHash": b"\x10" * 32, "logIndex": 0,
+        "topics": [V3_MINT_TOPIC, b"\x00" * 32, abi_encode(["int24"], [-60]), abi_encode(["int24"], [60])],
+        "data": abi_encode(["address", "uint128", "uint256", "uint256"], [T0, 5000, 1, 1]),
+    }
+    swap = {
+        "address": POOL, "blockNumber": 11, "blockHash": b"\x11" * 32, "logIndex": 0,
+        "topics": [V3_SWAP_TOPIC, b"\x00" * 32, b"\x00" * 32],
+        "data": abi_encode(["int256", "int256", "uint160", "uint128", "int24"], [10, -9, 2**96 - 1, 5000, -1]),
+    }
+    mirror.apply_logs([mint, swap])
+    assert pool.liquidity == 5000 and pool.tick == -1
+    assert pool.liquidity_net == {-60: 5000, 60: -5000}
+
+    mirror.rollback_to(9)
+    assert (pool.sqrt_price_x96, pool.liquidity, pool.tick) == (2**96, 0, 0)
+    assert pool.liquidity_net == {}
+
+class _Chain:
+    """get_block / get_logs over a fixed set of block hashes."""
+
+    def __init__(self, hashes, logs):
+        self.hashes, self.logs = hashes, logs
+
+    def get_block(self, n):
+        n = max(self.hashes) if n == "latest" else n
+        return {"number": n, "hash": self.hashes[n]}
+
+    def get_logs(self, flt):
+        return [e for e in self.logs if flt["fromBlock"] <= e["blockNumber"] <= flt["toBlock"]]
+
+def test_poll_reads_off_state_and_applies_deep_reorg_separately():
+    mirror, engine = _mirror()
+    mirror.apply_logs([_sync(10, b"\x10" * 32, 0, 110, 190)])
+    mirror._journal_for(10, b"\x10" * 32)
+    mirror.last_block = 10
+    # Block 10 was replaced and nothing in the journal matches: fresh reserves, then 11's logs
+    mirror.w3 = type("W3", (), {"eth": _Chain({10: b"\xaa" * 32, 11: b"\xbb" * 32}, [_sync(11, b"\xbb" * 32, 0, 700, 800)])})()
+    engine.read_reserves = lambda w3, block, multicall: (block, {PAIR: (500, 600)})
+
+    read = mirror._read_poll()
+    pair = engine.pair_at(PAIR)
+    assert (pair.reserve0, pair.reserve1) == (110, 190) and mirror.last_block == 10
+
+    delta = mirror._apply_poll(read)
+    assert (pair.reserve0, pair.reserve1) == (700, 800)
+    assert delta.block_number == 11 and delta.rolled_back_to == 10 - mirror.reorg_depth and PAIR in delta.changed
+
+def test_deep_reorg_reloads_v3_pools_in_place(monkeypatch):
+    mirror, engine = _mirror()
+    pool = V3Pool(address=POOL, token0=T0, token1=T1, fee=3000, sqrt_price_x96=2**96, liquidity=5000, tick=0)
+    mirror.track_v3_pool(pool)
+    mirror._journal_for(10, b"\x10" * 32)
+    mirror.last_block = 10
+    mirror.w3 = type("W3", (), {"eth": _Chain({10: b"\xaa" * 32, 11: b"\xbb" * 32}, [])})()
+    engine.read_reserves = lambda w3, block, multicall: (block, {})
+    fresh = V3Pool(address=POOL, token0=T0, token1=T1, fee=3000, sqrt_price_x96=2**95, liquidity=7000, tick=-13863,
+                   liquidity_net={-13920: 7000}, liquidity_gross={-13920: 7000})
+    monkeypatch.setattr("agent.defi.pool_mirror.load_v3_pool", lambda w3, address, **kw: fresh)
+
+    delta = mirror.poll()
+    assert mirror.v3[POOL.lower()] is pool and POOL.lower() in delta.changed
+    assert (pool.sqrt_price_x96, pool.liquidity, pool.tick, pool.liquidity_net) == (2**95, 7000, -13863, {-13920: 7000})
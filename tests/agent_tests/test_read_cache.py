@@ -0,0 +1,86 @@
+import asyncio
+import pytest
+from agent.defi.read_cache import BlockReadCache
+
+def test_values_are_pinned_and_dropped_on_new_head():
+    cache = BlockReadCache()
+    reads = []
+
+    def read(block):
+        reads.append(block)
+        return len(reads)
+
+    cache.advance(100)
+    assert cache.get("k", read) == 1 and cache.get("k", read) == 1
+    assert reads == [100]
+
+    cache.advance(101)
+    assert cache.get("k", read) == 2
+    # A reorg at the same height also invalidates
+    cache.advance(101, reorg=True)
+    assert cache.get("k", read) == 3 and reads == [100, 101, 101]
+
+def test_no_head_means_no_caching():
+    cache = BlockReadCache()
+    assert cache.get("k", lambda block: block) == "latest"
+    assert cache.misses == 1 and cache.get("k", lambda block: 7) == 7
+
+@pytest.mark.asyncio
+async def test_concurrent_async_reads_share_one_request():
+    cache = BlockReadCache()
+    cache.advance(5)
+    calls = []
+
+    async def read(block):
+        calls.append(block)
+        await asyncio.sleep(0.01)
+        return "value"
+
+    results = await asyncio.gather(*(cache.get_async("k", read) for _ in range(4)))
+    assert results == ["value"] * 4 and calls == [5]
+    assert await cache.get_async("k", read) == "value" and calls == [5]
+
+@pytest.mark.asyncio
+async def test_waiters_survive_a_cancelled_first_reader():
+    cache = BlockReadCache()
+    cache.advance(100)
+    calls = []
+
+    async def read(block):
+        calls.append(block)
+        await asyncio.sleep(0.05 if len(calls) == 1 else 0)
+        return len(calls)
+
+    first = asyncio.create_task(cache.get_async("k", read))
+    await asyncio.sleep(0)
+    second = asyncio.create_task(cache.get_async("k", read))
+    await asyncio.sleep(0)
+    first.cancel()
+
+    # The waiter reads for itself instead of hanging on the abandoned request
+    assert await asyncio.wait_for(second, timeout=1) == 2
+    assert first.cancelled() and calls == [100, 100]
+    assert await cache.get_async("k", read) == 2
+
+def test_plan_builder_reuses_simulated_quote(monkeypatch, settings):
+    from agent.defi import uniswap_v2
+    from agent.strategies.plan_builder import build_uniswap_v2_cycle_plan
+    from agent.strategies.simulator import QuoteResult
+
+    def no_quote(*args, **kwargs):
+        raise AssertionError("plan builder must not re-quote")
+    monkeypatch.setattr(uniswap_v2, "quote_v2_get_amounts_out", no_quote)
+
+    sim = QuoteResult([10**18, 2_000 * 10**6, 10**18 + 10**16], 10**18 + 10**16, 5 * 10**14, 0, 10**16, 0)
+    _, info = build_uniswap_v2_cycle_plan(
+        w3=None,
+        settings=settings,
+        executor_address="0x0000000000000000000000000000000000000009",
+        token_in="0x0000000000000000000000000000000000000001",
+        mid_token="0x0000000000000000000000000000000000000002",
+        router_a="0x00000000000000000000000000000000000000A1",
+        router_b="0x00000000000000000000000000000000000000B1",
+        amount_in=10**18,
+        quote_result=sim,
+    )
+    assert info["quotes"] == {"out_mid": 2_000 * 10**6, "out_back": 10**18 + 10**16}
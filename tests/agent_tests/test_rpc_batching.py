@@ -0,0 +1,86 @@
+import asyncio
+import pytest
+from aiohttp import web
+from web3 import AsyncWeb3
+from agent.utils.web3_client import BatchingRPCProvider, HedgedRPCProvider
+
+async def _serve(batches: bool = True):
+    posts = []
+
+    def answer(req):
+        return {"jsonrpc": "2.0", "id": req["id"], "result": hex(len(req["method"]))}
+
+    async def handle(request):
+        body = await request.json()
+        posts.append(body)
+        if isinstance(body, list):
+            if not batches:
+                return web.json_response({"jsonrpc": "2.0", "id": None, "error": {"code": -32600, "message": "batch not supported"}})
+            # Out of order on purpose: responses are matched by id
+            return web.json_response([answer(r) for r in reversed(body)])
+        return web.json_response(answer(body))
+
+    app = web.Application()
+    app.router.add_post("/", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/", posts
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_share_one_post():
+    runner, url, posts = await _serve()
+    transport = HedgedRPCProvider([url])
+    provider = BatchingRPCProvider(transport)
+    try:
+        methods = ["eth_blockNumber", "eth_chainId", "eth_gasPrice", "net_version"]
+        results = await asyncio.gather(*(provider.make_request(m, []) for m in methods))
+        assert [r["result"] for r in results] == [hex(len(m)) for m in methods]
+        assert len(posts) == 1 and len(posts[0]) == 4
+
+        # Explicit batch through the context manager
+        async with provider.batch() as b:
+            block = b.add("eth_getBlockByNumber", ["latest", False])
+            count = b.add("eth_getTransactionCount", ["0x0000000000000000000000000000000000000001", "pending"])
+        assert block.result() == hex(len("eth_getBlockByNumber")) and count.result() == hex(len("eth_getTransactionCount"))
+        assert len(posts) == 2
+    finally:
+        await transport.close()
+        await runner.cleanup()
+
+@pytest.mark.asyncio
+async def test_falls_back_when_node_rejects_batches():
+    runner, url, posts = await _serve(batches=False)
+    transport = HedgedRPCProvider([url])
+    w3 = AsyncWeb3(BatchingRPCProvider(transport))
+    try:
+        a, b = await asyncio.gather(w3.eth.block_number, w3.eth.chain_id)
+        assert (a, b) == (len("eth_blockNumber"), len("eth_chainId"))
+        assert not w3.provider.batch_supported
+        await asyncio.gather(w3.eth.block_number, w3.eth.chain_id)
+        # One rejected batch, two singles, then singles only
+        assert [isinstance(p, list) for p in posts] == [True, False, False, False, False]
+    finally:
+        await transport.close()
+        await runner.cleanup()
+
+@pytest.mark.asyncio
+async def test_failed_dispatch_fails_its_callers():
+    transport = HedgedRPCProvider(["http://127.0.0.1:9/"])
+    provider = BatchingRPCProvider(transport)
+
+    async def broken(items):
+        raise RuntimeError("encoder bug")
+
+    provider._dispatch = broken
+    try:
+        results = await asyncio.wait_for(asyncio.gather(
+            provider.make_request("eth_blockNumber", []), provider.make_request("eth_chainId", []),
+            return_exceptions=True,
+        ), timeout=1)
+        assert [str(r) for r in results] == ["encoder bug", "encoder bug"]
+        assert not provider._dispatches
+    finally:
+        await transport.close()
@@ -0,0 +1,128 @@
+import asyncio
+import pytest
+from aiohttp import web
+from eth_abi import encode as abi_encode
+from web3 import Web3
+from agent.config import Settings
+from agent.defi.pool_mirror import SYNC_TOPIC, PoolStateMirror
+from agent.defi.uniswap_v2 import V2Pair, V2QuoteEngine
+from agent.utils.web3_client import build_async_web3, build_web3, rpc_tape
+
+ADDRESS = "0x0000000000000000000000000000000000000001"
+PAIR = "0x00000000000000000000000000000000000000F1"
+HEAD_HASH = "0x" + "11" * 32
+
+async def _serve():
+    node = {"head": 100, "reads": 0}
+
+    def answer(req):
+        method = req["method"]
+        if method == "eth_blockNumber":
+            result = hex(node["head"])
+        elif method == "eth_getBlockByNumber":
+            result = {"number": hex(node["head"]), "hash": HEAD_HASH}
+        elif method == "eth_getBalance":
+            # Changes on every read, so replay order matters
+            node["reads"] += 1
+            result = hex(node["head"] * 1000 + node["reads"])
+        elif method == "eth_chainId":
+            result = "0x1"
+        elif method == "eth_getLogs":
+            data = abi_encode(["uint112", "uint112"], [node["head"] * 10, node["head"] * 20])
+            result = [{"address": PAIR, "topics": [SYNC_TOPIC.hex()], "data": "0x" + data.hex(),
+                       "blockNumber": hex(node["head"]), "blockHash": HEAD_HASH, "logIndex": "0x0",
+                       "transactionHash": "0x" + "22" * 32, "transactionIndex": "0x0", "removed": False}]
+        else:
+            return {"jsonrpc": "2.0", "id": req["id"], "error": {"code": -32601, "message": "method not found"}}
+        return {"jsonrpc": "2.0", "id": req["id"], "result": result}
+
+    async def handle(request):
+        body = await request.json()
+        return web.json_response([answer(r) for r in body] if isinstance(body, list) else answer(body))
+
+    app = web.Application()
+    app.router.add_post("/", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/", node
+
+async def _session(aw3, w3, node):
+    """A fixed sequence of reads across two heads, mixing the async and sync clients."""
+    out = [await aw3.eth.block_number, await aw3.eth.get_balance(ADDRESS), await aw3.eth.get_balance(ADDRESS)]
+    out.append(await asyncio.to_thread(lambda: w3.eth.get_balance(ADDRESS)))
+    if node is not None:
+        node["head"] = 101
+    out.append((await aw3.eth.get_block("latest"))["number"])
+    out.append(await aw3.eth.get_balance(ADDRESS))
+    out.append(await aw3.eth.chain_id)
+    return out
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("suffix", [".jsonl", ".jsonl.gz"])
+async def test_replay_reproduces_recorded_session(tmp_path, suffix):
+    path = str(tmp_path / f"tape{suffix}")
+    runner, url, node = await _serve()
+    try:
+        recording = Settings(RPC_HTTP_URL=url, RPC_RECORD_FILE=path)
+        aw3 = build_async_web3(recording)
+        live = await _session(aw3, build_web3(recording), node)
+        await aw3.provider.inner.transport.close()
+        rpc_tape(recording).close()
+    finally:
+        await runner.cleanup()
+    assert live == [100, 100_001, 100_002, 100_003, 101, 101_004, 1]
+
+    # The node is gone: everything is served from the file
+    replaying = Settings(RPC_HTTP_URL=url, RPC_REPLAY_FILE=path)
+    aw3, w3 = build_async_web3(replaying), build_web3(replaying)
+    assert await _session(aw3, w3, None) == live
+
+    # Asked again at the same head: the last recorded answer sticks
+    assert await aw3.eth.get_balance(ADDRESS) == 101_004
+    # Never recorded: sends are acknowledged without a node, anything else is an RPC error
+    raw = "0x" + "02" * 40
+    assert (await aw3.eth.send_raw_transaction(raw)) == Web3.keccak(hexstr=raw)
+    with pytest.raises(ValueError):
+        await aw3.eth.get_transaction_count(ADDRESS)
+    assert rpc_tape(replaying).misses == 2
+
+async def _first_delta(settings):
+    engine = V2QuoteEngine()
+    engine.upsert_pair(ADDRESS, V2Pair(PAIR, ADDRESS, "0x0000000000000000000000000000000000000002", 1, 1))
+    mirror = PoolStateMirror(build_web3(settings), settings, engine, poll_interval=0.01)
+    subscribed = []
+
+    async def ws_stream(ws_url):
+        subscribed.append(ws_url)
+        raise ConnectionError(ws_url)
+        yield
+
+    mirror._ws_stream = ws_stream
+    stream = mirror.stream()
+    try:
+        delta = await stream.__anext__()
+    finally:
+        await stream.aclose()
+    assert subscribed == []
+    pair = engine.pair_at(PAIR)
+    return delta.block_number, (pair.reserve0, pair.reserve1)
+
+@pytest.mark.asyncio
+async def test_mirror_polls_through_tape_even_with_ws_url(tmp_path):
+    path = str(tmp_path / "tape.jsonl")
+    ws_url = "wss://mainnet.example.invalid/ws"
+    runner, url, _ = await _serve()
+    try:
+        recording = Settings(RPC_HTTP_URL=url, RPC_WS_URL=ws_url, RPC_RECORD_FILE=path)
+        live = await _first_delta(recording)
+        rpc_tape(recording).close()
+    finally:
+        await runner.cleanup()
+    assert live == (100, (1000, 2000))
+
+    # Pool state is rebuilt from the recorded eth_getLogs, not from the live subscription
+    replaying = Settings(RPC_HTTP_URL=url, RPC_WS_URL=ws_url, RPC_REPLAY_FILE=path)
+    assert await _first_delta(replaying) == live
@@ -0,0 +1,40 @@
+from agent.defi.uniswap_v2 import get_amount_out
+from agent.strategies.simulator import optimal_v2_cycle_input, optimize_input_golden
+
+# USDC -> WETH on a pool pricing WETH at 2000, then WETH -> USDC on one pricing it at 2100
+HOPS = [(2_000_000 * 10**6, 1_000 * 10**18, 30), (1_000 * 10**18, 2_100_000 * 10**6, 30)]
+
+def _profit(x, premium_bps=5):
+    out = x
+    for r_in, r_out, fee in HOPS:
+        out = get_amount_out(out, r_in, r_out, fee)
+    return out - x - (x * premium_bps) // 10_000
+
+def test_closed_form_matches_brute_force_neighbourhood():
+    res = optimal_v2_cycle_input(HOPS, premium_bps=5)
+    assert res is not None and res.profit == _profit(res.amount_in)
+    # No input within +-1% of the optimum does better
+    step = res.amount_in // 200
+    for x in range(res.amount_in - 100 * step, res.amount_in + 100 * step, step):
+        assert _profit(x) <= res.profit
+
+def test_unprofitable_and_capped():
+    balanced = [(2_000_000 * 10**6, 1_000 * 10**18, 30), (1_000 * 10**18, 2_000_000 * 10**6, 30)]
+    assert optimal_v2_cycle_input(balanced, premium_bps=5) is None
+
+    capped = optimal_v2_cycle_input(HOPS, premium_bps=5, max_amount_in=10**6)
+    assert capped is not None and capped.amount_in <= 10**6
+
+def test_golden_section_agrees_with_closed_form():
+    exact = optimal_v2_cycle_input(HOPS, premium_bps=5)
+
+    def quote(x):
+        out = x
+        for r_in, r_out, fee in HOPS:
+            out = get_amount_out(out, r_in, r_out, fee)
+        return out
+
+    res = optimize_input_golden(quote, premium_bps=5, max_amount_in=100_000 * 10**6)
+    assert res is not None
+    # Profit is flat near the optimum: the search lands within a few wei of the closed form's profit
+    assert exact.profit - res.profit <= 2
@@ -0,0 +1,61 @@
+import asyncio
+import json
+import pytest
+from agent.utils import tracing
+from agent.utils.trace_report import critical_path, missed_block, summarize, time_to_submit
+from agent.utils.tracing import RotatingFile, activate, configure_tracing, resume, span, stage, start_trace
+
+@pytest.mark.asyncio
+async def test_trace_spans_and_critical_path(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    head = {"block": 100}
+    tracer = configure_tracing(str(path), 1.0, head=lambda: head["block"])
+    try:
+        trace = start_trace("block-100", 100)
+        with activate(trace):
+            with stage("snapshot"):
+                pass
+
+        async def leg(name, delay):
+            with span(name, kind="ai"):
+                await asyncio.sleep(delay)
+
+        with resume(trace.trace_id):
+            with stage("decide"):
+                await asyncio.gather(leg("risk", 0.01), leg("decision", 0.05))
+            head["block"] = 101
+            with stage("send"):
+                pass
+            tracing.annotate(outcome="executed")
+        tracer.close()
+    finally:
+        configure_tracing(str(path), 0.0)
+
+    (record,) = [json.loads(line) for line in path.read_text().splitlines()]
+    spans = {s["name"]: s for s in record["spans"]}
+    assert spans["risk"]["parent"] == spans["decide"]["id"] == spans["decision"]["parent"]
+    assert spans["send"]["block"] == 101 and record["outcome"] == "executed"
+
+    # The slower of the concurrent calls is what held up the decision
+    names = [name for name, _ in critical_path(record)]
+    assert "decision" in names and "risk" not in names
+    assert time_to_submit(record) >= 50_000_000
+    assert missed_block(record)
+    report = summarize([record])
+    assert report["time_to_submit_ns"]["count"] == 1 and report["missed_block"] == 1
+
+def test_untraced_is_a_no_op(tmp_path):
+    configure_tracing(str(tmp_path / "t.jsonl"), 0.0)
+    assert start_trace("x", 1) is None
+    with resume(None) as trace, span("anything"):
+        assert trace is None
+    assert not (tmp_path / "t.jsonl").exists()
+
+def test_rotating_file(tmp_path):
+    f = RotatingFile(str(tmp_path / "t.jsonl"), max_bytes=20, backups=2)
+    for i in range(5):
+        f.write(f"line-{i:02d}-xxxxxxx\n")
+    f.flush()
+    assert (tmp_path / "t.jsonl").read_text() == "line-04-xxxxxxx\n"
+    assert (tmp_path / "t.jsonl.2").read_text() == "line-02-xxxxxxx\n"
+    assert not (tmp_path / "t.jsonl.3").exists()
@@ -0,0 +1,59 @@
+import pytest
+from web3 import Web3
+from agent.config import Settings
+from agent.defi.uniswap_v2 import V2Pair, V2QuoteEngine, get_amount_out
+from agent.strategies.plan_builder import build_uniswap_v2_cycle_plan
+
+WETH = "0x0000000000000000000000000000000000000001"
+USDC = "0x0000000000000000000000000000000000000002"
+ROUTER_A = "0x00000000000000000000000000000000000000A1"
+ROUTER_B = "0x00000000000000000000000000000000000000B1"
+
+def _router_math(amount_in, reserve_in, reserve_out):
+    # UniswapV2Library.getAmountOut as deployed (997/1000)
+    amount_in_with_fee = amount_in * 997
+    return (amount_in_with_fee * reserve_out) // (reserve_in * 1000 + amount_in_with_fee)
+
+@pytest.mark.parametrize("amount_in", [1, 10**6, 10**18, 123456789012345678901])
+def test_get_amount_out_matches_router_math(amount_in):
+    r_in, r_out = 5_000 * 10**18, 10_000_000 * 10**6
+    assert get_amount_out(amount_in, r_in, r_out) == _router_math(amount_in, r_in, r_out)
+
+def test_engine_quotes_both_directions_and_sync_updates():
+    engine = V2QuoteEngine()
+    engine.upsert_pair(ROUTER_A, V2Pair("0x00000000000000000000000000000000000000F1", WETH, USDC, 10**21, 2 * 10**12))
+
+    fwd = engine.get_amounts_out(ROUTER_A, 10**18, [WETH, USDC])
+    assert fwd == [10**18, _router_math(10**18, 10**21, 2 * 10**12)]
+    back = engine.get_amounts_out(ROUTER_A, fwd[-1], [USDC, WETH])
+    assert back[-1] < 10**18
+
+    assert engine.update_reserves("0x00000000000000000000000000000000000000f1", 2 * 10**21, 2 * 10**12)
+    assert engine.get_amounts_out(ROUTER_A, 10**18, [WETH, USDC])[-1] < fwd[-1]
+    assert not engine.has_path(ROUTER_B, [WETH, USDC])
+
+def test_plan_builder_uses_engine_without_rpc():
+    w3 = Web3(Web3.EthereumTesterProvider())
+    settings = Settings(
+        PRIVATE_KEY="0x" + "11" * 32,
+        PUBLIC_ADDRESS="0x0000000000000000000000000000000000000001",
+        RPC_HTTP_URL="http://localhost:8545",
+    )
+    engine = V2QuoteEngine()
+    engine.upsert_pair(ROUTER_A, V2Pair("0x00000000000000000000000000000000000000F1", WETH, USDC, 10**21, 2 * 10**12))
+    engine.upsert_pair(ROUTER_B, V2Pair("0x00000000000000000000000000000000000000F2", USDC, WETH, 2 * 10**12, 9 * 10**20))
+
+    _, info = build_uniswap_v2_cycle_plan(
+        w3=w3,
+        settings=settings,
+        executor_address="0x0000000000000000000000000000000000000009",
+        token_in=WETH,
+        mid_token=USDC,
+        router_a=ROUTER_A,
+        router_b=ROUTER_B,
+        amount_in=10**18,
+        quote_engine=engine,
+    )
+    out_mid = _router_math(10**18, 10**21, 2 * 10**12)
+    assert info["quotes"]["out_mid"] == out_mid
+    assert info["quotes"]["out_back"] == _router_math(out_mid, 2 * 10**12, 9 * 10**20)
@@ -0,0 +1,69 @@
+import math
+import os
+import pytest
+from agent.defi.uniswap_v3 import (
+    MAX_SQRT_RATIO,
+    MAX_TICK,
+    MIN_SQRT_RATIO,
+    MIN_TICK,
+    V3Pool,
+    V3StateIncomplete,
+    get_sqrt_ratio_at_tick,
+    get_tick_at_sqrt_ratio,
+)
+
+T0 = "0x0000000000000000000000000000000000000001"
+T1 = "0x0000000000000000000000000000000000000002"
+
+def test_tick_math_bounds_and_roundtrip():
+    assert get_sqrt_ratio_at_tick(MIN_TICK) == MIN_SQRT_RATIO
+    assert get_sqrt_ratio_at_tick(MAX_TICK) == MAX_SQRT_RATIO
+    for t in (-887000, -60, -1, 0, 1, 59, 123456):
+        r = get_sqrt_ratio_at_tick(t)
+        assert abs(r / (math.sqrt(1.0001**t) * 2**96) - 1) < 1e-9
+        assert get_tick_at_sqrt_ratio(r) == t
+
+def _pool() -> V3Pool:
+    # Two positions at price 1: a wide one and a narrow one that ends at tick -600
+    pool = V3Pool(T0, T0, T1, 3000, sqrt_price_x96=get_sqrt_ratio_at_tick(0), tick=0)
+    pool.apply_liquidity(-6000, 6000, 10**18)
+    pool.apply_liquidity(-600, 600, 5 * 10**18)
+    return pool
+
+def test_swap_within_range_matches_constant_product():
+    pool = _pool()
+    amount = 10**15
+    out = pool.quote_exact_input(T0, amount)
+    # Virtual reserves x = y = L at price 1
+    liquidity = 6 * 10**18
+    expected = liquidity * amount * 0.997 / (liquidity + amount * 0.997)
+    assert out < expected and out / expected > 1 - 1e-9
+
+def test_swap_crosses_ticks_and_loses_depth():
+    pool = _pool()
+    small = pool.quote_exact_input(T0, 10**15)
+    big = pool.quote_exact_input(T0, 10**18)  # crosses -600 and exits the narrow range
+    assert big < small * 1000
+    # Pool state is not mutated by quoting
+    assert pool.liquidity == 6 * 10**18 and pool.tick == 0
+    # And the other direction is symmetric at price 1
+    assert pool.quote_exact_input(T1, 10**18) == big
+
+def test_incomplete_bitmap_raises():
+    pool = _pool()
+    pool.bitmap_words = (0, 0)  # only the word holding ticks [0, 256*60)
+    with pytest.raises(V3StateIncomplete):
+        pool.quote_exact_input(T0, 10**15)
+
+@pytest.mark.skipif(not os.getenv("V3_ORACLE_RPC_URL"), reason="needs a mainnet RPC for the Quoter oracle")
+def test_matches_quoter_on_mainnet():
+    from web3 import Web3
+    from agent.defi.uniswap_v3 import load_v3_pool, quote_v3_exact_input_single
+
+    w3 = Web3(Web3.HTTPProvider(os.environ["V3_ORACLE_RPC_URL"]))
+    block = w3.eth.block_number
+    quoter = "0xb27308f9F90D607463bb33eA1BeBb41C27CE5AB6"
+    pool = load_v3_pool(w3, "0x88e6A0c2dDD26FEEb64F039a2c41296FcB3f5640", block_identifier=block)  # USDC/WETH 0.05%
+    for amount in (10**6, 10**10, 10**12):
+        oracle = quote_v3_exact_input_single(w3, quoter, pool.token0, pool.token1, pool.fee, amount)
+        assert pool.quote_exact_input(pool.token0, amount) == oracle
@@ -0,0 +1,100 @@
+import gc
+import json
+import os
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, Optional
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+FIXTURE_PATH = os.path.join(os.path.dirname(__file__), "fixtures", "pools.json")
+
+@dataclass
+class BenchResult:
+    name: str
+    ops_per_sec: float
+    ns_per_op: float
+    # Transient memory high-water mark of one call, and blocks still alive after it
+    peak_bytes_per_op: int
+    retained_blocks_per_op: float
+
+def _time_loop(fn: Callable[[], Any], n: int) -> float:
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return time.perf_counter() - start
+
+def measure(name: str, fn: Callable[[], Any], min_time: float = 0.5, repeat: int = 7) -> BenchResult:
+    """
+    timeit-style: calibrate a loop count that runs for at least min_time / repeat, keep the
+    best of `repeat` loops (least disturbed by the machine), then measure memory separately
+    under tracemalloc so tracing overhead does not leak into the timing.
+    """
+    fn()  # warm caches, as the agent does after its first candidate
+    n = 1
+    while _time_loop(fn, n) < min_time / repeat:
+        n *= 2
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        best = min(_time_loop(fn, n) for _ in range(repeat))
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    tracemalloc.start()
+    try:
+        fn()
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+        blocks_before = len(tracemalloc.take_snapshot().traces)
+        loops = min(n, 200)
+        for _ in range(loops):
+            fn()
+        blocks_after = len(tracemalloc.take_snapshot().traces)
+    finally:
+        tracemalloc.stop()
+
+    return BenchResult(
+        name=name,
+        ops_per_sec=n / best,
+        ns_per_op=best / n * 1e9,
+        peak_bytes_per_op=max(0, peak - base),
+        retained_blocks_per_op=max(0, blocks_after - blocks_before) / loops,
+    )
+
+def load_fixture() -> Dict[str, Any]:
+    with open(FIXTURE_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def load_baseline(path: str = BASELINE_PATH) -> Dict[str, Dict[str, float]]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_baseline(results: Dict[str, BenchResult], path: str = BASELINE_PATH) -> None:
+    data = {name: {k: round(v, 1) if isinstance(v, float) else v for k, v in asdict(r).items() if k != "name"}
+            for name, r in sorted(results.items())}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+        f.write("\n")
+
+def regression(result: BenchResult, baseline: Optional[Dict[str, float]], threshold: float) -> Optional[str]:
+    """A reason string if result is more than `threshold` (fraction) slower than its baseline."""
+    if not baseline:
+        return None
+    floor = baseline["ops_per_sec"] * (1.0 - threshold)
+    if result.ops_per_sec < floor:
+        return (f"{result.name}: {result.ops_per_sec:,.0f} ops/s is below the baseline "
+                f"{baseline['ops_per_sec']:,.0f} ops/s by more than {threshold:.0%}")
+    return None
+
+def format_result(result: BenchResult, baseline: Optional[Dict[str, float]] = None) -> str:
+    delta = ""
+    if baseline:
+        delta = f"  ({result.ops_per_sec / baseline['ops_per_sec'] - 1:+.1%} vs baseline)"
+    return (f"{result.name:<34} {result.ops_per_sec:>12,.0f} ops/s {result.ns_per_op:>12,.0f} ns/op "
+            f"{result.peak_bytes_per_op:>8,} B peak {result.retained_blocks_per_op:>6.2f} blk kept{delta}")
@@ -0,0 +1,44 @@
+import pytest
+from benchlib import BenchResult, format_result, load_baseline, measure, regression, save_baseline
+
+_results = {}
+
+def pytest_addoption(parser):
+    group = parser.getgroup("benchmarks")
+    group.addoption("--bench", action="store_true", help="measure the benchmarks (otherwise each runs once)")
+    group.addoption("--bench-save", action="store_true", help="write measured results to baseline.json")
+    group.addoption("--bench-threshold", type=float, default=0.25,
+                    help="fail when ops/sec drops more than this fraction below the baseline")
+    group.addoption("--tp-rate", type=float, default=20.0, help="throughput harness: pool updates offered per second")
+    group.addoption("--tp-seconds", type=float, default=5.0, help="throughput harness: generation time")
+    group.addoption("--tp-ai-latency-ms", type=float, default=100.0, help="throughput harness: stand-in AI latency per call")
+    group.addoption("--tp-concurrency", type=int, default=8, help="throughput harness: MAX_CONCURRENT_EVALUATIONS")
+    group.addoption("--tp-mode", default="sequential", help="throughput harness: AI_DECISION_MODE")
+
+@pytest.fixture(scope="session")
+def bench(request):
+    config = request.config
+    measuring = config.getoption("--bench", default=False)
+    baseline = load_baseline()
+    threshold = config.getoption("--bench-threshold", default=0.25)
+
+    def run(name, fn):
+        if not measuring:
+            # Plain test runs only check that the benchmark still works
+            fn()
+            return None
+        result = measure(name, fn)
+        _results[name] = result
+        print("\n" + format_result(result, baseline.get(name)))
+        if not config.getoption("--bench-save", default=False):
+            reason = regression(result, baseline.get(name), threshold)
+            if reason:
+                pytest.fail(reason)
+        return result
+
+    return run
+
+def pytest_sessionfinish(session):
+    if _results and session.config.getoption("--bench-save", default=False):
+        merged = {**{k: BenchResult(k, **v) for k, v in load_baseline().items()}, **_results}
+        save_baseline(merged)
@@ -0,0 +1,116 @@
+"""
+Per-candidate hot path, offline against tests/benchmarks/fixtures/pools.json.
+
+    python -m pytest tests/benchmarks --bench -s                 # measure, compare to baseline
+    python -m pytest tests/benchmarks --bench --bench-save -s    # refresh baseline.json
+
+Without --bench each case runs once as a smoke test. Baselines are machine-specific;
+refresh them on the machine that enforces the threshold.
+"""
+import pytest
+from eth_account import Account
+from benchlib import load_fixture
+from agent.config import Settings
+from agent.core.calldata import ExecuteFlashLoanEncoder
+from agent.core.flash_params import encode_flash_params
+from agent.core.transaction_builder import build_transaction
+from agent.defi.uniswap_v2 import V2Pair, V2QuoteEngine, encode_v2_swap_exact_tokens_for_tokens
+from agent.defi.uniswap_v3 import encode_v3_exact_input_single
+from agent.strategies.plan_builder import build_uniswap_v2_cycle_plan
+from agent.strategies.simulator import simulate_v2_cycle, size_v2_cycle
+from agent.utils.gas_estimator import GasOracle
+
+FIX = load_fixture()
+T = FIX["tokens"]
+ROUTERS = FIX["routers"]
+UNI, SUSHI = ROUTERS["uniswap_v2"], ROUTERS["sushiswap"]
+AMOUNT_IN = 5 * 10**18
+DEADLINE = 1_900_000_000
+
+@pytest.fixture(scope="module")
+def world():
+    base = Settings()
+    account = Account.from_key(base.PRIVATE_KEY)
+    settings = Settings(
+        EXECUTOR_ADDRESS=FIX["executor"], UNISWAP_V2_ROUTER=UNI, SUSHISWAP_V2_ROUTER=SUSHI,
+        PUBLIC_ADDRESS=account.address,
+    )
+    engine = V2QuoteEngine()
+    for p in FIX["pairs"]:
+        engine.upsert_pair(ROUTERS[p["router"]], V2Pair(p["address"], T[p["token0"]], T[p["token1"]], p["reserve0"], p["reserve1"]))
+    oracle = GasOracle(priority_gwei=settings.GAS_PRIORITY_GWEI)
+    oracle.update_head(FIX["head"], FIX["rewards"][-1])
+    return settings, account, engine, oracle
+
+def _simulate(world):
+    settings, _, engine, oracle = world
+    return simulate_v2_cycle(None, settings, UNI, SUSHI, T["WETH"], T["USDC"], AMOUNT_IN,
+                             gas_limit_hint=1_000_000, quote_engine=engine, gas_oracle=oracle)
+
+def _plan(world, sim=None):
+    settings, _, engine, _ = world
+    return build_uniswap_v2_cycle_plan(None, settings, settings.EXECUTOR_ADDRESS, T["WETH"], T["USDC"], UNI, SUSHI,
+                                       AMOUNT_IN, quote_engine=engine, quote_result=sim)
+
+def test_simulate_v2_cycle(bench, world):
+    bench("simulate_v2_cycle", lambda: _simulate(world))
+
+def test_size_v2_cycle(bench, world):
+    settings, _, engine, _ = world
+    bench("size_v2_cycle", lambda: size_v2_cycle(engine, settings, UNI, SUSHI, T["WETH"], T["DAI"]))
+
+def test_build_plan_from_simulation(bench, world):
+    sim = _simulate(world)
+    bench("build_v2_cycle_plan.simulated", lambda: _plan(world, sim))
+
+def test_build_plan_with_quotes(bench, world):
+    bench("build_v2_cycle_plan.quoted", lambda: _plan(world))
+
+def test_encode_flash_params(bench, world):
+    settings = world[0]
+    swap = encode_v2_swap_exact_tokens_for_tokens(None, UNI, AMOUNT_IN, 1, [T["WETH"], T["USDC"]], settings.EXECUTOR_ADDRESS, DEADLINE)
+    approvals = [{"token": T["WETH"], "spender": UNI, "amount": AMOUNT_IN}, {"token": T["USDC"], "spender": SUSHI, "amount": 10**10}]
+    calls = [{"target": UNI, "value": 0, "data": swap}, {"target": SUSHI, "value": 0, "data": swap}]
+    bench("encode_flash_params", lambda: encode_flash_params(
+        min_profit=1, beneficiary=settings.PUBLIC_ADDRESS, approvals=approvals, calls=calls))
+
+def test_v2_swap_encoder(bench, world):
+    recipient = world[0].EXECUTOR_ADDRESS
+    bench("encode.v2_swap", lambda: encode_v2_swap_exact_tokens_for_tokens(
+        None, UNI, AMOUNT_IN, 1, [T["WETH"], T["USDC"]], recipient, DEADLINE))
+
+def test_v3_exact_input_single_encoder(bench, world):
+    recipient = world[0].EXECUTOR_ADDRESS
+    router = "0xE592427A0AEce92De3Edee1F18E0157C05861564"
+    bench("encode.v3_exact_input_single", lambda: encode_v3_exact_input_single(
+        None, router, T["WETH"], T["USDC"], 500, recipient, DEADLINE, AMOUNT_IN, 1))
+
+def test_execute_flash_loan_encoder(bench, world):
+    params, _ = _plan(world, _simulate(world))
+    encoder = ExecuteFlashLoanEncoder(world[0].EXECUTOR_ADDRESS)
+    bench("encode.execute_flash_loan", lambda: encoder.encode(T["WETH"], AMOUNT_IN, params))
+
+def test_build_transaction(bench, world):
+    settings, _, _, oracle = world
+    template = {"to": settings.EXECUTOR_ADDRESS, "data": b"\x00" * 1000, "value": 0, "gas": 1_000_000}
+    bench("build_transaction", lambda: build_transaction(None, settings, template, nonce=7, max_gas_gwei=80, gas_oracle=oracle))
+
+def test_sign_transaction(bench, world):
+    settings, account, _, oracle = world
+    tx = build_transaction(None, settings, {"to": settings.EXECUTOR_ADDRESS, "data": b"\x00" * 1000, "gas": 1_000_000},
+                           nonce=7, gas_oracle=oracle)
+    bench("sign_transaction", lambda: account.sign_transaction(tx))
+
+def test_candidate_end_to_end(bench, world):
+    settings, account, _, oracle = world
+    encoder = ExecuteFlashLoanEncoder(settings.EXECUTOR_ADDRESS)
+
+    def candidate():
+        sim = _simulate(world)
+        params, _ = _plan(world, sim)
+        data = encoder.encode(T["WETH"], AMOUNT_IN, params)
+        tx = build_transaction(None, settings, {"to": encoder.executor, "data": data, "gas": 1_000_000},
+                               nonce=7, gas_oracle=oracle)
+        return account.sign_transaction(tx)
+
+    bench("candidate.simulate_to_signed", candidate)
@@ -0,0 +1,32 @@
+"""
+Agent-loop throughput against an in-process chain (see throughput.py).
+
+    python -m pytest tests/benchmarks/test_throughput.py --bench -s \\
+        [--tp-rate 50] [--tp-seconds 10] [--tp-ai-latency-ms 250] [--tp-concurrency 8] [--tp-mode combined]
+
+Without --bench a short run only checks that opportunities flow through to mined transactions.
+"""
+import pytest
+from throughput import HarnessConfig, run_harness
+
+@pytest.mark.asyncio
+async def test_agent_loop_throughput(request):
+    config = request.config
+    if config.getoption("--bench", default=False):
+        harness = HarnessConfig(
+            rate=config.getoption("--tp-rate"),
+            seconds=config.getoption("--tp-seconds"),
+            ai_latency_ms=config.getoption("--tp-ai-latency-ms"),
+            max_concurrent=config.getoption("--tp-concurrency"),
+            decision_mode=config.getoption("--tp-mode"),
+        )
+    else:
+        harness = HarnessConfig(rate=20.0, seconds=1.0, ai_latency_ms=5.0)
+
+    report = await run_harness(harness)
+    print("\n" + report.format())
+
+    assert report.generated == int(harness.rate * harness.seconds)
+    assert report.opportunities > 0
+    assert report.outcomes.get("executed", 0) > 0
+    assert len(report.time_to_submit_ms) == report.outcomes["executed"]
@@ -0,0 +1,317 @@
+"""
+End-to-end throughput of the agent loop against an in-process eth-tester chain.
+
+The scanner, cycle finder, arbitrator and executor are the production objects wired as in
+agent/main.py; only the edges are synthetic. Pool updates are generated as Sync logs at a
+fixed rate and applied through PoolStateMirror.apply_logs, the AI is a stand-in with a
+configurable latency, and transactions are signed and mined by py-evm.
+
+No contract bytecode ships with the repo (and there is no compiler here), so the pairs
+exist only as mirrored reserves and the executor address has no code: the chain still
+checks signature, nonce, fees and balance and mines every submission, but executeFlashLoan
+does nothing. Throughput and time-to-submit are what this measures, not execution.
+"""
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set
+from eth_abi import encode as abi_encode
+from eth_account import Account
+from web3 import AsyncWeb3, Web3
+from web3.providers.eth_tester import AsyncEthereumTesterProvider, EthereumTesterProvider
+from agent.ai.client import AIClient
+from agent.ai.providers import AIProvider
+from agent.config import Settings
+from agent.core.executor import TransactionExecutor
+from agent.core.state import AgentState
+from agent.defi.pool_mirror import SYNC_TOPIC, PoolDelta, PoolStateMirror
+from agent.defi.read_cache import BlockReadCache
+from agent.defi.uniswap_v2 import V2Pair, V2QuoteEngine
+from agent.main import _evaluate
+from agent.strategies.arbitrator import Arbitrator
+from agent.strategies.cycle_finder import CycleFinder, TokenGraph
+from agent.strategies.scanner import OpportunityScanner
+from agent.utils.gas_estimator import GasOracle
+from agent.utils.logger import configure_logging
+from agent.utils.trace_report import load_traces, time_to_submit
+from agent.utils.tracing import async_trace_middleware, configure_tracing
+
+EXECUTOR = "0x00000000000000000000000000000000000000e1"
+ROUTER_A = "0x00000000000000000000000000000000000000a1"
+ROUTER_B = "0x00000000000000000000000000000000000000b1"
+WETH_RESERVE = 2_000 * 10**18
+
+@dataclass
+class HarnessConfig:
+    rate: float = 20.0              # pool updates per second offered to the scanner
+    seconds: float = 5.0            # how long updates are generated
+    ai_latency_ms: float = 100.0    # per model call
+    ai_jitter_ms: float = 0.0       # uniform +/- around the latency
+    tokens: int = 4                 # tokens paired with WETH on both routers
+    shock_bps: tuple = (80, 300)    # size of each synthetic price move
+    queue_size: int = 64            # updates buffered ahead of the scanner before dropping
+    max_concurrent: int = 8
+    decision_mode: str = "sequential"
+    drain_seconds: float = 30.0     # grace period for in-flight evaluations after generation stops
+    seed: int = 7
+
+@dataclass
+class ThroughputReport:
+    config: HarnessConfig
+    elapsed: float
+    generated: int
+    dropped: int
+    opportunities: int
+    unfinished: int
+    outcomes: Dict[str, int] = field(default_factory=dict)
+    # Pool update generated -> last send returned, per submitted transaction
+    time_to_submit_ms: List[float] = field(default_factory=list)
+
+    @property
+    def opportunities_per_sec(self) -> float:
+        return self.opportunities / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def submitted_per_sec(self) -> float:
+        return self.outcomes.get("executed", 0) / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def drop_rate(self) -> float:
+        return self.dropped / self.generated if self.generated else 0.0
+
+    def percentile(self, q: float) -> Optional[float]:
+        values = sorted(self.time_to_submit_ms)
+        if not values:
+            return None
+        return values[min(len(values) - 1, max(0, int(round(q / 100.0 * (len(values) - 1)))))]
+
+    def format(self) -> str:
+        c = self.config
+        lines = [
+            f"offered {c.rate:g} updates/s for {c.seconds:g}s, AI {c.ai_latency_ms:g} ms, "
+            f"{c.max_concurrent} concurrent, {c.decision_mode}",
+            f"generated {self.generated}  dropped {self.dropped} ({self.drop_rate:.1%})  "
+            f"opportunities {self.opportunities}  unfinished {self.unfinished}",
+            f"outcomes {dict(sorted(self.outcomes.items()))}",
+            f"{self.opportunities_per_sec:.1f} opportunities/s  {self.submitted_per_sec:.1f} submitted/s "
+            f"over {self.elapsed:.2f}s",
+        ]
+        if self.time_to_submit_ms:
+            pct = "  ".join(f"p{q} {self.percentile(q):.1f}" for q in (50, 90, 99))
+            lines.append(f"time to submit (ms): {pct}  max {max(self.time_to_submit_ms):.1f}")
+        return "\n".join(lines)
+
+class LatencyProvider(AIProvider):
+    """Stand-in model: sleeps for the configured latency, then approves."""
+
+    name = "latency"
+    model = "stand-in"
+
+    def __init__(self, latency: float, jitter: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self._rng = random.Random(seed)
+        self.calls = 0
+
+    async def complete(self, system_prompt: str, user_input: str) -> str:
+        self.calls += 1
+        await asyncio.sleep(max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter)))
+        opp_id = str(json.loads(user_input).get("opportunity_id", "unknown"))
+        if "Risk and Execution Decision" in system_prompt:
+            return json.dumps({"opportunity_id": opp_id, "risk_score": 0.1, "risks": [], "recommendation": "proceed",
+                               "execute": True, "reason": "stand-in", "max_gas_gwei": 100})
+        if "Risk Assessment" in system_prompt:
+            return json.dumps({"opportunity_id": opp_id, "risk_score": 0.1, "risks": [], "recommendation": "proceed"})
+        if "Execution Decision" in system_prompt:
+            return json.dumps({"opportunity_id": opp_id, "execute": True, "reason": "stand-in", "max_gas_gwei": 100})
+        return json.dumps({"opportunity_id": opp_id, "paths": [], "confidence": 0.0})
+
+class NodeThreadProvider(AsyncEthereumTesterProvider):
+    """
+    eth-tester answered from one worker thread. Mining runs on every send and takes tens
+    of milliseconds; a real node does that in another process, not on the agent's loop.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._node = EthereumTesterProvider(self.ethereum_tester)
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="eth-tester")
+
+    async def make_request(self, method, params):
+        return await asyncio.get_running_loop().run_in_executor(self._pool, self._node.make_request, method, params)
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=True)
+
+class SyntheticMarket(PoolStateMirror):
+    """
+    Mirror fed by generated Sync logs instead of a node. Each update moves one pair's price
+    by a random shock around its base reserves, so cycles open against the other router.
+    """
+
+    def __init__(self, settings: Settings, v2: V2QuoteEngine, config: HarnessConfig, head):
+        super().__init__(w3=None, settings=settings, v2=v2)
+        self.config = config
+        self.head = head
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=config.queue_size)
+        self.generated = 0
+        self.dropped = 0
+        # monotonic_ns at which the update behind the most recently yielded delta was generated
+        self.current_generated_ns: Optional[int] = None
+        self._rng = random.Random(config.seed)
+        self._base: Dict[str, tuple] = {p.address: (p.reserve0, p.reserve1) for p in v2.pairs()}
+        self._log_index = 0
+
+    def _sync_log(self) -> Dict[str, Any]:
+        pair = self._rng.choice(self.v2.pairs())
+        r0, r1 = self._base[pair.address]
+        lo, hi = self.config.shock_bps
+        move = 1 + self._rng.choice((-1, 1)) * self._rng.uniform(lo, hi) / 10_000
+        self._log_index += 1
+        return {
+            "address": pair.address,
+            "topics": [SYNC_TOPIC],
+            # Constant-product move: price shifts by ~move^2, k unchanged
+            "data": abi_encode(["uint112", "uint112"], [int(r0 * move), int(r1 / move)]),
+            "blockNumber": self.head() or 0,
+            "logIndex": self._log_index,
+        }
+
+    async def generate(self) -> None:
+        """Offers updates at config.rate on a fixed schedule; a full queue drops the update."""
+        interval = 1.0 / self.config.rate
+        start = time.monotonic()
+        for i in range(int(self.config.rate * self.config.seconds)):
+            delay = start + i * interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self.generated += 1
+            try:
+                self.queue.put_nowait((time.monotonic_ns(), self._sync_log()))
+            except asyncio.QueueFull:
+                self.dropped += 1
+
+    async def stream(self):
+        while True:
+            generated_ns, entry = await self.queue.get()
+            delta: PoolDelta = self.apply_logs([entry])
+            self.current_generated_ns = generated_ns
+            if delta.changed:
+                yield delta
+
+def _token(i: int) -> str:
+    return Web3.to_checksum_address(Web3.keccak(text=f"throughput-token-{i}")[-20:])
+
+def build_market(config: HarnessConfig, read_cache: Optional[BlockReadCache] = None) -> V2QuoteEngine:
+    """WETH against `tokens` tokens on two routers, the same base price on both."""
+    rng = random.Random(config.seed)
+    engine = V2QuoteEngine(read_cache=read_cache)
+    weth = _token(0)
+    for i in range(1, config.tokens + 1):
+        token = _token(i)
+        other = int(WETH_RESERVE * rng.uniform(0.5, 3000))
+        token0, token1 = sorted((weth, token), key=str.lower)
+        r0, r1 = (WETH_RESERVE, other) if token0 == weth else (other, WETH_RESERVE)
+        for router in (ROUTER_A, ROUTER_B):
+            address = Web3.to_checksum_address(Web3.keccak(text=f"{router}-{token}")[-20:])
+            engine.upsert_pair(router, V2Pair(address, token0, token1, r0, r1))
+    return engine
+
+async def run_harness(config: HarnessConfig, trace_path: Optional[str] = None) -> ThroughputReport:
+    """One run; the enable flag and (unless `trace_path` is given) the traces live in a temp dir removed afterwards."""
+    with tempfile.TemporaryDirectory(prefix="flagent-throughput-") as workdir:
+        return await _run_harness(config, workdir, trace_path)
+
+async def _run_harness(config: HarnessConfig, workdir: str, trace_path: Optional[str]) -> ThroughputReport:
+    provider = NodeThreadProvider()
+    aw3 = AsyncWeb3(provider)
+    aw3.middleware_onion.add(async_trace_middleware, "trace")
+
+    base = Settings()
+    account = Account.from_key(base.PRIVATE_KEY)
+    funder = (await aw3.eth.accounts)[0]
+    await aw3.eth.send_transaction({"from": funder, "to": account.address, "value": 10**23})
+    settings = Settings(
+        CHAIN_ID=await aw3.eth.chain_id, PUBLIC_ADDRESS=account.address, DRY_RUN=False,
+        EXECUTOR_ADDRESS=EXECUTOR, UNISWAP_V2_ROUTER=ROUTER_A, SUSHISWAP_V2_ROUTER=ROUTER_B,
+        MAX_CONCURRENT_EVALUATIONS=config.max_concurrent, AI_DECISION_MODE=config.decision_mode,
+        AGENT_ENABLE_FILE=os.path.join(workdir, "agent_enabled.flag"),
+    )
+
+    gas_oracle = GasOracle(priority_gwei=settings.GAS_PRIORITY_GWEI)
+    await gas_oracle.refresh(aw3)
+    gas_task = asyncio.create_task(gas_oracle.run(aw3, 0.05))
+    # Every opportunity is traced: the spans give time-to-submit and the outcome
+    trace_path = trace_path or os.path.join(workdir, "traces.jsonl")
+    configure_tracing(trace_path, 1.0, max_bytes=0, head=lambda: gas_oracle.block_number)
+    # Logging stays on (its cost is part of the loop) but is rendered to nowhere
+    devnull = open(os.devnull, "w")
+    configure_logging(level=settings.LOG_LEVEL, stream=devnull)
+
+    read_cache = BlockReadCache()
+    engine = build_market(config, read_cache)
+    market = SyntheticMarket(settings, engine, config, head=lambda: gas_oracle.block_number)
+    scanner = OpportunityScanner(
+        w3=None, settings=settings, mirror=market,
+        cycle_finder=CycleFinder(TokenGraph.from_pools(engine)), read_cache=read_cache,
+    )
+    ai = AIClient(settings, provider=LatencyProvider(
+        config.ai_latency_ms / 1000.0, config.ai_jitter_ms / 1000.0, seed=config.seed,
+    ))
+    executor = TransactionExecutor(w3=None, settings=settings, state=AgentState(w3=None, settings=settings),
+                                   aw3=aw3, gas_oracle=gas_oracle)
+    arbitrator = Arbitrator(w3=None, settings=settings, ai_client=ai, executor=executor, quote_engine=engine, aw3=aw3)
+
+    # The agent loop as in agent.main, plus bookkeeping of when each opportunity was generated
+    generated_at: Dict[str, int] = {}
+    slots = asyncio.Semaphore(settings.MAX_CONCURRENT_EVALUATIONS)
+    tasks: Set[asyncio.Task] = set()
+    opportunities = 0
+
+    async def consume() -> None:
+        nonlocal opportunities
+        async for opp in scanner.scan_loop():
+            opportunities += 1
+            generated_at[opp["trace_id"]] = market.current_generated_ns
+            await slots.acquire()
+            task = asyncio.create_task(_evaluate(arbitrator, opp, slots))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+    start = time.monotonic()
+    consumer = asyncio.create_task(consume())
+    try:
+        await market.generate()
+        deadline = time.monotonic() + config.drain_seconds
+        while (market.queue.qsize() or tasks) and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        elapsed = time.monotonic() - start
+    finally:
+        consumer.cancel()
+        gas_task.cancel()
+        unfinished = len(tasks) + market.queue.qsize()
+        for task in list(tasks):
+            task.cancel()
+        await asyncio.gather(consumer, gas_task, *tasks, return_exceptions=True)
+        configure_tracing(trace_path, 0.0)
+        configure_logging()
+        devnull.close()
+        provider.close()
+
+    outcomes: Dict[str, int] = {}
+    tts: List[float] = []
+    for trace in load_traces([trace_path]):
+        outcomes[trace.get("outcome", "unknown")] = outcomes.get(trace.get("outcome", "unknown"), 0) + 1
+        sent = time_to_submit(trace)
+        generated = generated_at.get(trace["trace_id"])
+        if sent is not None and generated is not None:
+            tts.append((trace["start_ns"] + sent - generated) / 1e6)
+    return ThroughputReport(
+        config=config, elapsed=elapsed, generated=market.generated, dropped=market.dropped,
+        opportunities=opportunities, unfinished=unfinished, outcomes=outcomes, time_to_submit_ms=tts,
+    )